@@ -1,8 +1,8 @@
 from django.contrib import admin
 from .models import (
-    User, Evidence, Petition,
+    User, Evidence, EvidenceBlob, Petition, Support,
     ConsultationSlot, ConsultationBooking,
-    Deposition, DepositionEvidence, AuditLog
+    Deposition, DepositionEvidence, AuditLog, AuditArchive, AuditRollup, Job
 )
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 
@@ -20,6 +20,14 @@ class EvidenceAdmin(admin.ModelAdmin):
     list_display = ("title", "uploader", "file_type", "uploaded_at", "verification_status")
     list_filter = ("verification_status", "file_type")
     search_fields = ("title", "uploader__username")
+    raw_id_fields = ("blob",)
+
+
+@admin.register(EvidenceBlob)
+class EvidenceBlobAdmin(admin.ModelAdmin):
+    list_display = ("sha256", "size_bytes", "ref_count", "created_at")
+    search_fields = ("sha256",)
+    readonly_fields = ("sha256", "file", "size_bytes", "ref_count", "created_at")
 
 
 @admin.register(Petition)
@@ -29,6 +37,12 @@ class PetitionAdmin(admin.ModelAdmin):
     search_fields = ("title", "creator__username")
 
 
+@admin.register(Support)
+class SupportAdmin(admin.ModelAdmin):
+    list_display = ("petition", "user", "created_at")
+    raw_id_fields = ("petition", "user")
+
+
 @admin.register(ConsultationSlot)
 class ConsultationSlotAdmin(admin.ModelAdmin):
     list_display = ("lawyer", "start_time", "duration_minutes", "is_booked")
@@ -53,5 +67,47 @@ class DepositionEvidenceAdmin(admin.ModelAdmin):
 
 @admin.register(AuditLog)
 class AuditLogAdmin(admin.ModelAdmin):
+    """
+    Recent events only; older months are in AuditArchive and come out through
+    the audit export. Search matches a username or an action exactly, so it
+    can use the (user, timestamp) and (action, timestamp) indexes.
+    """
     list_display = ("user", "action", "timestamp")
-    search_fields = ("user__username", "action")
+    list_select_related = ("user",)
+    search_fields = ("action",)
+    search_help_text = "Exact username or action, e.g. petition.join"
+    date_hierarchy = "timestamp"
+    raw_id_fields = ("user",)
+    show_full_result_count = False
+
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        user_ids = list(User.objects.filter(username=term).values_list("id", flat=True))
+        if user_ids:
+            return queryset.filter(user_id__in=user_ids), False
+        return queryset.filter(action=term), False
+
+
+@admin.register(AuditArchive)
+class AuditArchiveAdmin(admin.ModelAdmin):
+    list_display = ("month", "chunk", "count", "first_timestamp", "last_timestamp", "created_at")
+    exclude = ("data",)
+    readonly_fields = ("month", "chunk", "count", "first_timestamp", "last_timestamp", "created_at")
+
+
+@admin.register(AuditRollup)
+class AuditRollupAdmin(admin.ModelAdmin):
+    list_display = ("period", "bucket", "user", "action", "count")
+    list_filter = ("period",)
+    list_select_related = ("user",)
+    date_hierarchy = "bucket"
+    raw_id_fields = ("user",)
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ("name", "status", "priority", "run_at", "attempts", "locked_by", "created_at")
+    list_filter = ("status", "name")
+    search_fields = ("name", "last_error")
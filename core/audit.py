@@ -0,0 +1,162 @@
+"""
+Buffered audit trail.
+
+``record`` appends an unsaved ``AuditLog`` row to an in-process buffer and
+returns immediately, so a request does not wait for an audit INSERT. The
+buffer is written with one ``bulk_create`` when it holds
+``AUDIT_BUFFER_SIZE`` events, or after ``AUDIT_FLUSH_INTERVAL`` seconds by a
+background thread, whichever comes first. An ``atexit`` hook stops that
+thread, waits for a write it has in progress, and then flushes what is left
+when the process exits cleanly (gunicorn and ``runserver`` reloads,
+management commands, job workers). A process that is killed outright loses at
+most the last interval's events.
+
+Views opt in with ``@audited("action")``. Anything else can call ``record``
+directly.
+"""
+import atexit
+import functools
+import logging
+import os
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from .models import AuditLog
+
+logger = logging.getLogger(__name__)
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+# Longest an exiting process waits for the flusher thread's current write.
+SHUTDOWN_TIMEOUT = 10
+
+_lock = threading.Lock()
+_buffer = []
+_pid = None
+_flusher = None
+_stop = threading.Event()
+_wakeup = threading.Event()
+
+
+def buffer_size():
+    return getattr(settings, "AUDIT_BUFFER_SIZE", 200)
+
+
+def flush_interval():
+    return getattr(settings, "AUDIT_FLUSH_INTERVAL", 2.0)
+
+
+def _ensure_flusher():
+    # Called with _lock held. A forked worker inherits the parent's buffer but
+    # not its thread, so both are reset the first time a new pid records.
+    global _pid, _flusher, _stop
+    if _pid == os.getpid():
+        return
+    _pid = os.getpid()
+    _buffer.clear()
+    _stop = threading.Event()
+    _flusher = threading.Thread(target=_flush_periodically, args=(_stop,), name="audit-flush", daemon=True)
+    _flusher.start()
+
+
+def _flush_periodically(stop):
+    while not stop.is_set():
+        _wakeup.wait(flush_interval())
+        _wakeup.clear()
+        flush()
+        close_old_connections()
+
+
+def shutdown():
+    """
+    Stop the flusher thread, wait for its current write, then flush the rest.
+
+    The thread is stopped under the buffer lock, and ``_pid`` is left set so
+    a ``record`` racing the exit only buffers its event for the final flush
+    instead of starting another thread. The thread is joined after the lock
+    is released because its own flush needs the lock.
+    """
+    global _flusher
+    with _lock:
+        flusher, _flusher = _flusher, None
+        _stop.set()
+    if flusher is not None and flusher is not threading.current_thread():
+        _wakeup.set()
+        flusher.join(SHUTDOWN_TIMEOUT)
+    return flush()
+
+
+def record(action, user=None, **meta):
+    """
+    Queue an audit event. ``user`` may be a user, a user id or None.
+    """
+    user_id = getattr(user, "pk", user)
+    entry = AuditLog(user_id=user_id, action=action, timestamp=timezone.now(), meta=meta or None)
+    with _lock:
+        _ensure_flusher()
+        _buffer.append(entry)
+        full = len(_buffer) >= buffer_size()
+    if full:
+        # Let the flusher thread do the write rather than this request.
+        _wakeup.set()
+
+
+def pending():
+    with _lock:
+        return len(_buffer)
+
+
+def flush():
+    """
+    Write every buffered event. Returns how many were written. If the write
+    fails the events go back on the buffer, up to ten buffers' worth.
+    """
+    with _lock:
+        entries = _buffer[:]
+        _buffer.clear()
+    if not entries:
+        return 0
+    try:
+        AuditLog.objects.bulk_create(entries, batch_size=buffer_size())
+    except Exception:
+        logger.exception("Could not write %d audit events.", len(entries))
+        with _lock:
+            _buffer[:0] = entries
+            overflow = len(_buffer) - 10 * buffer_size()
+            if overflow > 0:
+                logger.error("Dropping %d audit events.", overflow)
+                del _buffer[:overflow]
+        return 0
+    return len(entries)
+
+
+atexit.register(shutdown)
+
+
+def audited(action):
+    """
+    Record ``action`` for each successful non-safe request to the decorated
+    view, with the URL arguments and the response status. Put it under
+    ``@api_view`` so DRF has already authenticated ``request.user``. Class
+    views use ``method_decorator(audited(...), name="create")``.
+    """
+
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = view(request, *args, **kwargs)
+            if request.method not in SAFE_METHODS and response.status_code < 400:
+                meta = {name: value if isinstance(value, int) else str(value) for name, value in kwargs.items()}
+                meta["status"] = response.status_code
+                data = getattr(response, "data", None)
+                if isinstance(data, dict) and "id" in data:
+                    meta["object"] = data["id"]
+                user = request.user if request.user.is_authenticated else None
+                record(action, user, **meta)
+            return response
+
+        return wrapper
+
+    return decorator
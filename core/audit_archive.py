@@ -0,0 +1,228 @@
+"""
+Audit log retention: rollups, monthly archive chunks and streaming export.
+
+``AuditLog`` only holds the last ``AUDIT_HOT_MONTHS`` months. ``compact``
+moves each older month into ``AuditArchive`` rows of up to
+``AUDIT_ARCHIVE_CHUNK_SIZE`` events, stored as zlib-compressed NDJSON in
+timestamp order, and deletes the originals. ``rollup`` keeps hourly and daily
+``AuditRollup`` counts per user and action. It runs before every compaction,
+so the counts survive the move. Both run from ``manage.py compact_audit_log``.
+
+``iter_events`` walks any time range month by month. For each month it reads
+the archive chunks one at a time and then the hot rows through a database
+iterator, which is a server-side cursor on PostgreSQL. Memory use therefore
+stays at about one chunk however long the range is.
+``export_ndjson`` and ``export_csv`` turn that into response bodies.
+"""
+import csv
+import json
+import zlib
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Count, Max, Min, Sum
+from django.db.models.functions import TruncDay, TruncHour
+from django.utils import timezone
+
+from .models import AuditArchive, AuditLog, AuditRollup
+
+# Buffered events reach the table a few seconds after they happen
+# (core/audit.py); an hour is only rolled up once it is this far behind us.
+ROLLUP_DELAY = timedelta(minutes=5)
+DELETE_BATCH_SIZE = 500
+EXPORT_CHUNK_SIZE = 2000
+FIELDS = ("id", "timestamp", "user_id", "username", "action", "meta")
+
+
+def hot_months():
+    return getattr(settings, "AUDIT_HOT_MONTHS", 3)
+
+
+def chunk_size():
+    return getattr(settings, "AUDIT_ARCHIVE_CHUNK_SIZE", 50000)
+
+
+def month_start(moment):
+    local = timezone.localtime(moment)
+    return local.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def next_month(start):
+    return timezone.make_aware(datetime(start.year + start.month // 12, start.month % 12 + 1, 1))
+
+
+def _day_start(moment):
+    return timezone.localtime(moment).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def rollup(now=None):
+    """
+    Count events per user and action for every complete hour and day not yet
+    rolled up. Returns the number of rollup rows written.
+    """
+    settled = timezone.localtime((now or timezone.now()) - ROLLUP_DELAY).replace(minute=0, second=0, microsecond=0)
+    last_hour = AuditRollup.objects.filter(period="hour").aggregate(last=Max("bucket"))["last"]
+    if last_hour is None:
+        first = AuditLog.objects.aggregate(first=Min("timestamp"))["first"]
+        start = timezone.localtime(first).replace(minute=0, second=0, microsecond=0) if first else settled
+    else:
+        start = last_hour + timedelta(hours=1)
+
+    written = 0
+    with transaction.atomic():
+        if start < settled:
+            hours = (
+                AuditLog.objects.filter(timestamp__gte=start, timestamp__lt=settled)
+                .annotate(hour=TruncHour("timestamp"))
+                .order_by()
+                .values("hour", "user", "action")
+                .annotate(n=Count("id"))
+            )
+            created = AuditRollup.objects.bulk_create(
+                [AuditRollup(period="hour", bucket=row["hour"], user_id=row["user"], action=row["action"], count=row["n"])
+                 for row in hours],
+                batch_size=DELETE_BATCH_SIZE,
+            )
+            written += len(created)
+
+        # Days are built from the hourly rows, so they need only complete days.
+        last_day = AuditRollup.objects.filter(period="day").aggregate(last=Max("bucket"))["last"]
+        if last_day is None:
+            first_hour = AuditRollup.objects.filter(period="hour").aggregate(first=Min("bucket"))["first"]
+            day_from = _day_start(first_hour) if first_hour else None
+        else:
+            day_from = last_day + timedelta(days=1)
+        day_to = _day_start(settled)
+        if day_from is not None and day_from < day_to:
+            days = (
+                AuditRollup.objects.filter(period="hour", bucket__gte=day_from, bucket__lt=day_to)
+                .annotate(day=TruncDay("bucket"))
+                .order_by()
+                .values("day", "user", "action")
+                .annotate(n=Sum("count"))
+            )
+            created = AuditRollup.objects.bulk_create(
+                [AuditRollup(period="day", bucket=row["day"], user_id=row["user"], action=row["action"], count=row["n"])
+                 for row in days],
+                batch_size=DELETE_BATCH_SIZE,
+            )
+            written += len(created)
+    return written
+
+
+def _pack(rows):
+    lines = (json.dumps(row, separators=(",", ":")) for row in rows)
+    return zlib.compress("\n".join(lines).encode())
+
+
+def _unpack(data):
+    for line in zlib.decompress(bytes(data)).decode().splitlines():
+        yield json.loads(line)
+
+
+def _hot_events(queryset, limit=None):
+    rows = queryset.order_by("timestamp", "id").values_list(
+        "id", "timestamp", "user_id", "user__username", "action", "meta"
+    )[:limit]
+    for row in rows.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        event = dict(zip(FIELDS, row))
+        event["timestamp"] = event["timestamp"].isoformat()
+        yield event
+
+
+def compact_month(start):
+    """
+    Move the hot events of the month starting at ``start`` into archive
+    chunks. Returns how many events were moved.
+    """
+    end = next_month(start)
+    month = start.date()
+    chunk = (AuditArchive.objects.filter(month=month).aggregate(last=Max("chunk"))["last"] or 0) + 1
+    events = AuditLog.objects.filter(timestamp__gte=start, timestamp__lt=end)
+    moved = 0
+    while True:
+        rows = list(_hot_events(events, chunk_size()))
+        if not rows:
+            return moved
+        with transaction.atomic():
+            AuditArchive.objects.create(
+                month=month,
+                chunk=chunk,
+                first_timestamp=datetime.fromisoformat(rows[0]["timestamp"]),
+                last_timestamp=datetime.fromisoformat(rows[-1]["timestamp"]),
+                count=len(rows),
+                data=_pack(rows),
+            )
+            ids = [row["id"] for row in rows]
+            for i in range(0, len(ids), DELETE_BATCH_SIZE):
+                AuditLog.objects.filter(pk__in=ids[i:i + DELETE_BATCH_SIZE]).delete()
+        moved += len(rows)
+        chunk += 1
+
+
+def compact(now=None):
+    """
+    Roll up, then archive every month older than ``AUDIT_HOT_MONTHS``.
+    Returns how many events were moved.
+    """
+    now = now or timezone.now()
+    rollup(now)
+    cutoff = month_start(now)
+    for _ in range(hot_months()):
+        cutoff = month_start(cutoff - timedelta(days=1))
+    moved = 0
+    while True:
+        oldest = AuditLog.objects.filter(timestamp__lt=cutoff).aggregate(first=Min("timestamp"))["first"]
+        if oldest is None:
+            return moved
+        moved += compact_month(month_start(oldest))
+
+
+def iter_events(start, end, user_id=None, action=None):
+    """
+    Yield audit events in ``[start, end)`` as dicts with ``FIELDS``, month by
+    month, archived events first.
+    """
+    month = month_start(start)
+    while month < end:
+        following = next_month(month)
+        chunks = AuditArchive.objects.filter(
+            month=month.date(), last_timestamp__gte=start, first_timestamp__lt=end
+        ).order_by("chunk")
+        for data in chunks.values_list("data", flat=True).iterator(chunk_size=1):
+            for row in _unpack(data):
+                moment = datetime.fromisoformat(row["timestamp"])
+                if not (start <= moment < end):
+                    continue
+                if (user_id is not None and row["user_id"] != user_id) or (action and row["action"] != action):
+                    continue
+                yield row
+
+        hot = AuditLog.objects.filter(timestamp__gte=max(start, month), timestamp__lt=min(end, following))
+        if user_id is not None:
+            hot = hot.filter(user_id=user_id)
+        if action:
+            hot = hot.filter(action=action)
+        yield from _hot_events(hot)
+        month = following
+
+
+def export_ndjson(events):
+    for event in events:
+        yield json.dumps(event, cls=DjangoJSONEncoder) + "\n"
+
+
+class _Line:
+    # csv.writer target that hands back each formatted row.
+    def write(self, value):
+        return value
+
+
+def export_csv(events):
+    writer = csv.writer(_Line())
+    yield writer.writerow(FIELDS)
+    for event in events:
+        meta = json.dumps(event["meta"], cls=DjangoJSONEncoder) if event["meta"] is not None else ""
+        yield writer.writerow([event[field] for field in FIELDS[:-1]] + [meta])
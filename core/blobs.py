@@ -0,0 +1,203 @@
+"""
+Content-addressed evidence storage.
+
+Every distinct evidence file is stored once, as an ``EvidenceBlob`` named
+after its SHA-256 digest, and ``Evidence`` rows point at the shared blob.
+Digests are computed while the upload streams in (see the upload handlers
+below and ``core.uploads``), so nothing is read back from disk to hash or
+size it.
+
+Blobs are reference counted. Deleting an ``Evidence`` releases its blob,
+and :func:`collect_garbage` removes blobs nobody references any more.
+:func:`verify` re-hashes a blob to check it has not been altered on disk.
+"""
+import hashlib
+import logging
+import os
+
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.files.uploadhandler import MemoryFileUploadHandler, TemporaryFileUploadHandler
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Evidence, EvidenceBlob
+
+logger = logging.getLogger(__name__)
+
+READ_BLOCK_SIZE = 64 * 1024
+
+
+class _HashingMixin:
+    """
+    Compute the SHA-256 of an uploaded file as Django streams it in, and
+    expose it as ``uploaded_file.sha256``.
+    """
+
+    def new_file(self, *args, **kwargs):
+        self.sha256 = hashlib.sha256()
+        super().new_file(*args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        remaining = super().receive_data_chunk(raw_data, start)
+        if remaining is None:
+            # This handler kept the data, so it is part of its file.
+            self.sha256.update(raw_data)
+        return remaining
+
+    def file_complete(self, file_size):
+        uploaded = super().file_complete(file_size)
+        if uploaded is not None:
+            uploaded.sha256 = self.sha256.hexdigest()
+        return uploaded
+
+
+class HashingMemoryFileUploadHandler(_HashingMixin, MemoryFileUploadHandler):
+    pass
+
+
+class HashingTemporaryFileUploadHandler(_HashingMixin, TemporaryFileUploadHandler):
+    pass
+
+
+def hash_file(fileobj):
+    """
+    SHA-256 of a file object read from its current position, for files that
+    did not come through the hashing upload handlers.
+    """
+    hasher = hashlib.sha256()
+    for chunk in iter(lambda: fileobj.read(READ_BLOCK_SIZE), b""):
+        hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def blob_name(digest, extension=""):
+    return f"evidence/blobs/{digest[:2]}/{digest[2:4]}/{digest}{extension.lower()}"
+
+
+def _acquire(digest):
+    with transaction.atomic():
+        if EvidenceBlob.objects.filter(sha256=digest).update(ref_count=F("ref_count") + 1):
+            return EvidenceBlob.objects.get(sha256=digest)
+    return None
+
+
+def store(content, digest, size, filename=""):
+    """
+    Return the blob for ``content`` with one more reference taken on it.
+
+    Content that is already stored is not written again. New content is saved
+    under its digest; ``FileSystemStorage`` renames files that expose
+    ``temporary_file_path()`` instead of copying them.
+    """
+    blob = _acquire(digest)
+    if blob is not None:
+        return blob
+
+    extension = os.path.splitext(filename)[1][:16]
+    name = default_storage.save(blob_name(digest, extension), content)
+    try:
+        with transaction.atomic():
+            return EvidenceBlob.objects.create(sha256=digest, file=name, size_bytes=size, ref_count=1)
+    except IntegrityError:
+        # A concurrent upload of the same content won; use its blob.
+        default_storage.delete(name)
+        blob = _acquire(digest)
+        if blob is None:
+            raise
+        return blob
+
+
+def store_upload(uploaded_file):
+    """
+    Store a Django ``UploadedFile`` (from a multipart request) as a blob.
+    """
+    digest = getattr(uploaded_file, "sha256", None)
+    if digest is None:
+        uploaded_file.seek(0)
+        digest = hash_file(uploaded_file)
+        uploaded_file.seek(0)
+    return store(uploaded_file, digest, uploaded_file.size, uploaded_file.name)
+
+
+def attach(evidence, blob):
+    """
+    Point an unsaved ``Evidence`` at ``blob``.
+    """
+    evidence.blob = blob
+    evidence.file.name = blob.file.name
+    evidence.size_bytes = blob.size_bytes
+
+
+def release(blob_id):
+    EvidenceBlob.objects.filter(pk=blob_id, ref_count__gt=0).update(ref_count=F("ref_count") - 1)
+
+
+def recount():
+    """
+    Reset every ``ref_count`` to the number of evidences using the blob.
+    Returns how many blobs were corrected.
+    """
+    actual = Coalesce(
+        Subquery(
+            Evidence.objects.filter(blob=OuterRef("pk")).values("blob").annotate(n=Count("id")).values("n")
+        ),
+        0,
+    )
+    return EvidenceBlob.objects.annotate(actual=actual).exclude(ref_count=F("actual")).update(ref_count=actual)
+
+
+def collect_garbage():
+    """
+    Delete blobs with no references, and their files. Each row is removed with
+    a conditional DELETE, so a blob that gains a reference in the meantime
+    survives. Files go only after that commits.
+    """
+    table = EvidenceBlob._meta.db_table
+    removed = 0
+    for blob_id, name in EvidenceBlob.objects.filter(ref_count=0).values_list("id", "file").iterator():
+        with transaction.atomic():
+            if Evidence.objects.filter(blob_id=blob_id).exists():
+                continue  # ref_count drifted; recount() repairs it.
+            with connection.cursor() as cursor:
+                cursor.execute(f"DELETE FROM {table} WHERE id = %s AND ref_count = 0", [blob_id])
+                deleted = cursor.rowcount
+            if deleted:
+                transaction.on_commit(lambda name=name: default_storage.delete(name))
+                removed += 1
+    return removed
+
+
+def verify(blob):
+    """
+    Re-hash a blob's file. Returns True if it still matches its digest.
+    """
+    try:
+        with default_storage.open(blob.file.name, "rb") as fh:
+            return hash_file(fh) == blob.sha256
+    except FileNotFoundError:
+        return False
+
+
+def backfill(evidence):
+    """
+    Move a pre-existing ``Evidence`` file into blob storage. Returns the blob,
+    or None if the file is missing.
+    """
+    name = evidence.file.name
+    try:
+        with default_storage.open(name, "rb") as fh:
+            digest = hash_file(fh)
+            size = fh.tell()
+    except FileNotFoundError:
+        logger.warning("Evidence %s file %s is missing; skipped", evidence.pk, name)
+        return None
+
+    with default_storage.open(name, "rb") as fh:
+        blob = store(File(fh), digest, size, name)
+    attach(evidence, blob)
+    evidence.save(update_fields=["blob", "file", "size_bytes"])
+    if name != blob.file.name:
+        default_storage.delete(name)
+    return blob
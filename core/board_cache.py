@@ -0,0 +1,133 @@
+"""
+Response cache for the anonymous public board (``justice_index``).
+
+Pages are cached per query string (search terms and cursor) under a
+generation number. Invalidation simply bumps the generation, which orphans
+every cached page at once; they then age out via the cache timeout. The
+generation is bumped when a petition is published, a published petition is
+edited or deleted, or flushed supporter counts have drifted by more than
+``BOARD_CACHE_SUPPORTER_THRESHOLD`` since the last invalidation.
+
+The generation and the drift live in the ``BoardCacheState`` row, so a bump
+from any process (another gunicorn worker, the ``run_jobs`` worker, a
+management command) reaches every process on its next board request, at the
+cost of one primary-key read. The pages themselves go in the ``board`` cache
+alias, which can be local memory (one cache per process) or file based
+(shared by every worker on the box); see ``settings.CACHES``.
+"""
+import hashlib
+from functools import wraps
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import F
+from django.http import HttpResponse
+
+from .models import BoardCacheState
+
+CACHE_ALIAS = "board"
+
+STATE_ID = 1
+STAT_KEYS = {
+    "hits": "board:stats:hits",
+    "misses": "board:stats:misses",
+    "invalidations": "board:stats:invalidations",
+}
+
+
+def _cache():
+    return caches[CACHE_ALIAS]
+
+
+def _incr(key, delta=1):
+    cache = _cache()
+    try:
+        return cache.incr(key, delta)
+    except ValueError:
+        cache.add(key, 0, None)
+        return cache.incr(key, delta)
+
+
+def _update_state(**changes):
+    if not BoardCacheState.objects.filter(pk=STATE_ID).update(**changes):
+        BoardCacheState.objects.get_or_create(pk=STATE_ID)
+        BoardCacheState.objects.filter(pk=STATE_ID).update(**changes)
+
+
+def generation():
+    value = BoardCacheState.objects.filter(pk=STATE_ID).values_list("generation", flat=True).first()
+    return value or 1
+
+
+def page_key(request):
+    query = urlencode(sorted((k, v) for k, values in request.GET.lists() for v in values))
+    digest = hashlib.md5(query.encode(), usedforsecurity=False).hexdigest()
+    return f"board:page:{generation()}:{digest}"
+
+
+def invalidate():
+    _update_state(generation=F("generation") + 1, supporter_drift=0)
+    _incr(STAT_KEYS["invalidations"])
+
+
+def record_supporter_changes(changes):
+    """
+    Invalidate once accumulated supporter count changes reach the threshold.
+
+    ``changes`` is the ``{petition_id: delta}`` dict returned by
+    ``counters.flush()``.
+    """
+    drift = sum(abs(delta) for delta in changes.values())
+    if not drift:
+        return
+    threshold = getattr(settings, "BOARD_CACHE_SUPPORTER_THRESHOLD", 25)
+    with transaction.atomic():
+        _update_state(supporter_drift=F("supporter_drift") + drift)
+        total = BoardCacheState.objects.values_list("supporter_drift", flat=True).get(pk=STATE_ID)
+        if total >= threshold:
+            invalidate()
+
+
+def stats():
+    cache = _cache()
+    values = {name: cache.get(key, 0) for name, key in STAT_KEYS.items()}
+    lookups = values["hits"] + values["misses"]
+    values["hit_ratio"] = round(values["hits"] / lookups, 4) if lookups else None
+    values["generation"] = generation()
+    return values
+
+
+def cache_board_page(view):
+    """
+    Serve anonymous GETs of ``view`` from the board cache.
+
+    Logged-in users always get a fresh render because the page shows their
+    name and support buttons. Supporter counts reach cached pages through
+    the flush job, which invalidates them once the drift threshold is crossed.
+    """
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method != "GET" or request.user.is_authenticated or "messages" in request.COOKIES:
+            return view(request, *args, **kwargs)
+
+        cache = _cache()
+        key = page_key(request)
+        cached = cache.get(key)
+        if cached is not None:
+            _incr(STAT_KEYS["hits"])
+            content, content_type = cached
+            response = HttpResponse(content, content_type=content_type)
+            response["X-Board-Cache"] = "hit"
+            return response
+
+        _incr(STAT_KEYS["misses"])
+        response = view(request, *args, **kwargs)
+        if response.status_code == 200 and not response.streaming:
+            cache.set(key, (response.content, response["Content-Type"]))
+            response["X-Board-Cache"] = "miss"
+        return response
+
+    return wrapper
@@ -0,0 +1,147 @@
+"""
+Booking consultation slots.
+
+Booking happens in two steps. ``hold`` claims a free slot for the citizen,
+and ``confirm`` turns the hold into a confirmed booking. The claim is a
+conditional UPDATE (free → held by this user, or else held with an expired
+hold → held by this user), so when hundreds of citizens click at once
+exactly one of them gets the row and everyone else gets ``SlotUnavailable``.
+No row is read before that UPDATE, so nothing can change between a check and
+the write. Claiming a free slot, freeing one and releasing expired holds
+also move the lawyer's dashboard counts (core/summary.py).
+
+A hold lasts ``CONSULTATION_HOLD_SECONDS``. An abandoned checkout needs no
+cleanup to free its slot, because an expired hold can simply be claimed by
+the next citizen. A ``release_expired_holds`` job tidies up the leftover
+rows so listings read correctly. One is kept queued for the earliest hold
+to run out: a hold queues it unless one is already waiting, and each run
+queues the next.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import jobs, summary
+from .db import retry_on_busy
+from .models import ConsultationBooking, ConsultationSlot, Job
+
+RELEASE_JOB = "release_expired_holds"
+
+
+class SlotUnavailable(Exception):
+    pass
+
+
+class HoldExpired(Exception):
+    pass
+
+
+def hold_seconds():
+    return getattr(settings, "CONSULTATION_HOLD_SECONDS", 600)
+
+
+def claimable(now=None):
+    """
+    Slots that can be booked right now, as two separate filters: free ones,
+    and held ones whose hold expired. Every slot matches at most one of
+    them, and each has its own index, which an OR of the two would lose.
+    Confirmed bookings have no ``held_until`` and match neither.
+    """
+    now = now or timezone.now()
+    return Q(is_booked=False), Q(held_until__lt=now)
+
+
+def _count_booking(slot_id, is_booked):
+    lawyer_id, start = ConsultationSlot.objects.values_list("lawyer_id", "start_time").get(pk=slot_id)
+    summary.slots_changed(before=[(lawyer_id, start, not is_booked)], after=[(lawyer_id, start, is_booked)])
+
+
+@retry_on_busy
+def hold(slot_id, user):
+    """
+    Claim ``slot_id`` for ``user`` and create an unconfirmed booking.
+    Raises ``SlotUnavailable`` if someone else has it.
+    """
+    now = timezone.now()
+    slot = ConsultationSlot.objects.filter(pk=slot_id, start_time__gt=now)
+    held = {"is_booked": True, "held_by": user, "held_until": now + timedelta(seconds=hold_seconds())}
+    with transaction.atomic():
+        # Taking over an expired hold leaves the slot booked, so only a free
+        # slot changes the counts.
+        if slot.filter(is_booked=False).update(**held):
+            _count_booking(slot_id, True)
+        elif not slot.filter(held_until__lt=now).update(**held):
+            raise SlotUnavailable("This slot is no longer available.")
+        # The unconfirmed booking of an expired hold we just took over.
+        ConsultationBooking.objects.filter(slot_id=slot_id, confirmed=False).delete()
+        booking = ConsultationBooking.objects.create(slot_id=slot_id, user=user)
+        schedule_release()
+    return booking
+
+
+def confirm(booking):
+    """
+    Confirm a held booking. Raises ``HoldExpired`` if the hold ran out (and
+    the slot may have gone to someone else).
+    """
+    if booking.confirmed:
+        return booking
+    with transaction.atomic():
+        kept = ConsultationSlot.objects.filter(
+            pk=booking.slot_id, held_by=booking.user_id, held_until__gte=timezone.now()
+        ).update(held_until=None)
+        if not kept:
+            raise HoldExpired("Your hold on this slot has expired.")
+        ConsultationBooking.objects.filter(pk=booking.pk).update(confirmed=True)
+    booking.confirmed = True
+    return booking
+
+
+def cancel(booking):
+    """
+    Drop a booking (held or confirmed) and free its slot.
+    """
+    with transaction.atomic():
+        if ConsultationSlot.objects.filter(pk=booking.slot_id, held_by=booking.user_id).update(
+            is_booked=False, held_by=None, held_until=None
+        ):
+            _count_booking(booking.slot_id, False)
+        booking.delete()
+
+
+def schedule_release():
+    """
+    Queue a release job for just after the earliest hold runs out, unless one
+    is already waiting or nothing is held.
+    """
+    if Job.objects.filter(name=RELEASE_JOB, status="queued").exists():
+        return
+    first = (
+        ConsultationSlot.objects.filter(held_until__isnull=False)
+        .order_by("held_until")
+        .values_list("held_until", flat=True)
+        .first()
+    )
+    if first is not None:
+        jobs.enqueue(RELEASE_JOB, run_at=first + timedelta(seconds=1))
+
+
+def release_expired_holds():
+    """
+    Free slots whose hold expired and delete their unconfirmed bookings.
+    Returns how many slots were released.
+    """
+    expired = ConsultationSlot.objects.filter(held_until__lt=timezone.now())
+    with transaction.atomic():
+        states = list(expired.values_list("lawyer_id", "start_time"))
+        released = expired.update(is_booked=False, held_by=None, held_until=None)
+        summary.slots_changed(
+            before=[(lawyer_id, start, True) for lawyer_id, start in states],
+            after=[(lawyer_id, start, False) for lawyer_id, start in states],
+        )
+        # A slot held again after the update is booked, so its new hold survives.
+        ConsultationBooking.objects.filter(confirmed=False, slot__is_booked=False).delete()
+    return released
@@ -0,0 +1,167 @@
+"""
+Write-behind supporter counters.
+
+Joins and un-joins never touch the ``Petition`` row. They add +1/-1 to one
+of ``SUPPORTER_COUNT_SHARDS`` shard rows for the petition, and
+:func:`flush` periodically folds the shards into ``Petition.supporter_count``.
+
+Reads never write. Pages and the API show :func:`with_live_counts`, the
+stored count plus the unflushed shard deltas (at most
+``SUPPORTER_COUNT_SHARDS`` indexed rows per petition), so a join shows up
+at once even when no job worker is running. Every increment also queues a
+flush job (one at a time) that runs ``SUPPORTER_COUNT_MAX_LAG`` seconds
+later and keeps the shard tables small. The ``flush_supporter_counts``
+command flushes on a fixed interval, and ``reconcile_supporter_counts``
+rebuilds every count from the ``Support`` table.
+"""
+import random
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Case, Count, F, IntegerField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, Greatest
+from django.dispatch import Signal
+
+from . import jobs
+from .db import retry_on_busy
+from .models import Job, Petition, Support, SupporterCountShard
+
+FLUSH_BATCH_SIZE = 500
+FLUSH_JOB = "flush_supporter_counts"
+
+# Sent after a flush changed at least one count, with ``changes`` as the
+# ``{petition_id: delta}`` dict that flush() returns.
+supporter_counts_flushed = Signal()
+
+
+def shard_count():
+    return getattr(settings, "SUPPORTER_COUNT_SHARDS", 8)
+
+
+def max_lag():
+    return getattr(settings, "SUPPORTER_COUNT_MAX_LAG", 5)
+
+
+def increment(petition_id, delta=1):
+    """
+    Add ``delta`` to a random shard of ``petition_id``.
+    """
+    table = SupporterCountShard._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} (petition_id, shard, delta) VALUES (%s, %s, %s) "
+            f"ON CONFLICT (petition_id, shard) DO UPDATE SET delta = {table}.delta + excluded.delta",
+            [petition_id, random.randrange(shard_count()), delta],
+        )
+    schedule_flush()
+
+
+def schedule_flush():
+    """
+    Queue a flush ``max_lag()`` seconds from now, unless one is already waiting.
+    """
+    if not Job.objects.filter(name=FLUSH_JOB, status="queued").exists():
+        jobs.enqueue(FLUSH_JOB, delay=max_lag())
+
+
+def with_live_counts(queryset):
+    """
+    Annotate each petition in ``queryset`` with ``live_supporter_count``: the
+    stored count plus its pending shard deltas, as a subquery.
+    """
+    pending = (
+        SupporterCountShard.objects.filter(petition=OuterRef("pk"))
+        .values("petition")
+        .annotate(total=Sum("delta"))
+        .values("total")
+    )
+    return queryset.annotate(
+        live_supporter_count=Greatest(F("supporter_count") + Coalesce(Subquery(pending), 0), Value(0))
+    )
+
+
+def live_count(petition_id):
+    """
+    Canonical count plus any pending shard deltas, in one query.
+    """
+    return (
+        with_live_counts(Petition.objects.filter(pk=petition_id))
+        .values_list("live_supporter_count", flat=True)
+        .get()
+    )
+
+
+@retry_on_busy
+def flush(petition_ids=None):
+    """
+    Fold pending shard deltas into ``Petition.supporter_count``.
+
+    Each shard is decremented by exactly the amount that was folded rather
+    than reset, so increments that land while the flush runs are kept for
+    the next one. Returns a ``{petition_id: delta}`` dict of what changed.
+    """
+    shards = SupporterCountShard.objects.exclude(delta=0)
+    if petition_ids is not None:
+        shards = shards.filter(petition_id__in=petition_ids)
+
+    totals = defaultdict(int)
+    with transaction.atomic():
+        rows = list(shards.values_list("id", "petition_id", "delta"))
+        for start in range(0, len(rows), FLUSH_BATCH_SIZE):
+            batch = rows[start:start + FLUSH_BATCH_SIZE]
+            SupporterCountShard.objects.filter(pk__in=[r[0] for r in batch]).update(
+                delta=F("delta") - Case(
+                    *[When(pk=pk, then=Value(delta)) for pk, _, delta in batch],
+                    output_field=IntegerField(),
+                )
+            )
+            for _, petition_id, delta in batch:
+                totals[petition_id] += delta
+
+        changed = [(pid, total) for pid, total in totals.items() if total]
+        for start in range(0, len(changed), FLUSH_BATCH_SIZE):
+            batch = changed[start:start + FLUSH_BATCH_SIZE]
+            Petition.objects.filter(pk__in=[pid for pid, _ in batch]).update(
+                supporter_count=Greatest(
+                    F("supporter_count") + Case(
+                        *[When(pk=pid, then=Value(total)) for pid, total in batch],
+                        output_field=IntegerField(),
+                    ),
+                    Value(0),
+                )
+            )
+
+        if rows:
+            SupporterCountShard.objects.filter(pk__in=[r[0] for r in rows], delta=0).delete()
+
+    changes = dict(changed)
+    if changes:
+        supporter_counts_flushed.send(sender=Petition, changes=changes)
+    return changes
+
+
+def reconcile():
+    """
+    Recompute every ``supporter_count`` from the ``Support`` table and drop
+    all pending shards. Returns the number of petitions that were corrected.
+
+    Run it in a quiet period on databases that allow concurrent writers;
+    a join that commits mid-reconcile can be counted twice until the next run.
+    """
+    actual = Coalesce(
+        Subquery(
+            Support.objects.filter(petition=OuterRef("pk"))
+            .values("petition")
+            .annotate(n=Count("id"))
+            .values("n")
+        ),
+        0,
+    )
+    with transaction.atomic():
+        SupporterCountShard.objects.all().delete()
+        return (
+            Petition.objects.annotate(actual=actual)
+            .exclude(supporter_count=F("actual"))
+            .update(supporter_count=actual)
+        )
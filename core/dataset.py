@@ -0,0 +1,333 @@
+"""
+Deterministic bulk dataset generation for performance work.
+
+Every generated row has an explicit primary key, ``id_offset + n + 1`` for
+the n-th row of its kind. Its contents depend only on the seed and on which
+batch it falls in, so a run produces the same data however the batches are
+spread over the worker processes. Rows are written with ``bulk_create(...,
+ignore_conflicts=True)``. A second run with the same settings therefore
+writes nothing new, and a run with bigger volumes only adds the missing
+rows. Nothing is ever deleted.
+
+SQLite gives a new row the id after the highest one in its table, so after
+a run the app would carry on numbering inside the generated range.
+:func:`reserve_ids` therefore moves each table's AUTOINCREMENT counter to
+``id_offset + id_range``. Data created through the app stays outside
+``(id_offset, id_offset + id_range]``: below it if it predates the first
+run, above it otherwise.
+
+The shape of the data:
+
+* users: 1 in 1000 is an admin, 1 in 100 a lawyer, the rest citizens, all
+  sharing one password (hashed once)
+* petitions: mostly published, some pending, draft or rejected, with a
+  category mix and creation dates over the last two years; a few citizens
+  write most of them
+* supports: a Pareto share of ``supports`` per published petition, so a few
+  petitions collect most of the supporters and most get a handful; each
+  petition's supporters are distinct citizens, so no two links collide
+* evidence: a mix of file types and verification states, about 30% attached
+  to a petition (the files themselves are not created)
+* slots: ``slots_per_lawyer`` per lawyer in business hours over the weeks
+  after the anchor date, a quarter of them booked
+"""
+import functools
+import math
+import multiprocessing
+import random
+from array import array
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
+from datetime import datetime, time, timedelta
+
+import django
+from django.db import connection
+from django.utils import timezone
+
+from .db import retry_on_busy
+from .models import ConsultationSlot, Evidence, Petition, Support, User
+
+PHASES = (("users",), ("petitions", "evidence", "slots"), ("supports", "attachments"))
+
+STATUSES = (("published", 0.55), ("pending", 0.15), ("draft", 0.20), ("rejected", 0.10))
+CATEGORIES = ("general", "legal", "welfare", "environment", "policy")
+CATEGORY_WEIGHTS = (0.30, 0.25, 0.20, 0.15, 0.10)
+FILE_TYPES = ("image", "pdf", "video", "doc", "other")
+FILE_TYPE_WEIGHTS = (0.35, 0.35, 0.10, 0.15, 0.05)
+VERIFICATION = ("pending", "verified", "rejected")
+VERIFICATION_WEIGHTS = (0.50, 0.40, 0.10)
+TOPICS = (
+    "water", "school", "road", "health", "justice", "housing", "pension", "police",
+    "electricity", "hospital", "sanitation", "transport", "land", "forest", "wages",
+)
+PLACES = ("district", "village", "ward", "city", "block", "taluka", "municipality")
+PETITION_HISTORY = timedelta(days=730)
+SLOTS_PER_DAY = 8
+# Pareto shape of supporters per petition; lower is more skewed.
+SUPPORT_TAIL = 1.2
+SUPPORTER_STRIDE = 1_000_003
+
+
+def unit(n, salt):
+    """
+    A fixed pseudo-random number in [0, 1) for row ``n``, for attributes other
+    kinds of rows need to know without generating the row (a petition's
+    status, say).
+    """
+    h = (n * 0x9E3779B1 + salt * 0x85EBCA77 + 0x165667B1) & 0xFFFFFFFF
+    h ^= h >> 15
+    h = (h * 0x2C1B3C6D) & 0xFFFFFFFF
+    h ^= h >> 12
+    h = (h * 0x297A2D39) & 0xFFFFFFFF
+    h ^= h >> 15
+    return h / 2 ** 32
+
+
+def role_of(n):
+    if n % 1000 == 0:
+        return "admin"
+    if n % 100 == 50:
+        return "lawyer"
+    return "citizen"
+
+
+def citizen_near(n, users):
+    # The neighbour of an admin or lawyer index is always a citizen.
+    if role_of(n) == "citizen":
+        return n
+    return n + 1 if n + 1 < users else n - 1
+
+
+def lawyer_count(users):
+    return max(0, (users - 50 + 99) // 100)
+
+
+def status_of(n):
+    point = unit(n, 1)
+    for status, share in STATUSES:
+        if point < share:
+            return status
+        point -= share
+    return STATUSES[-1][0]
+
+
+def skewed(rng, size, exponent):
+    # Index in [0, size) with low indexes far more likely (power law).
+    return min(size - 1, int(size * rng.random() ** exponent))
+
+
+@functools.lru_cache(maxsize=1)
+def support_layout(petitions, supports, users):
+    """
+    ``starts[p]`` is the index of petition ``p``'s first support link and
+    ``starts[petitions]`` the total, which comes out a little under
+    ``supports`` because shares are rounded down. Each worker builds it once.
+    """
+    weights = array(
+        "d",
+        ((1 - unit(p, 5)) ** (-1 / SUPPORT_TAIL) if status_of(p) == "published" else 0.0 for p in range(petitions)),
+    )
+    scale = supports / (sum(weights) or 1)
+    starts, total = array("q", [0]), 0
+    for weight in weights:
+        total += min(int(weight * scale), users)
+        starts.append(total)
+    return starts
+
+
+def totals(spec):
+    return {
+        "users": spec["users"],
+        "petitions": spec["petitions"] if spec["users"] > 1 else 0,
+        "evidence": spec["evidence"] if spec["users"] > 1 else 0,
+        "slots": lawyer_count(spec["users"]) * spec["slots_per_lawyer"],
+        "supports": (
+            support_layout(spec["petitions"], spec["supports"], spec["users"])[-1] if spec["users"] > 1 else 0
+        ),
+        "attachments": spec["petitions"] if spec["evidence"] else 0,
+    }
+
+
+def _pk(spec, n):
+    return spec["id_offset"] + n + 1
+
+
+def _user(spec, n, rng):
+    role = role_of(n)
+    return User(
+        id=_pk(spec, n),
+        username=f"{role}-{n}",
+        email=f"{role}-{n}@example.com",
+        password=spec["password_hash"],
+        role=role,
+        is_staff=role == "admin",
+    )
+
+
+def _petition(spec, n, rng):
+    created = spec["anchor"] - PETITION_HISTORY * rng.random()
+    status = status_of(n)
+    topic, place = rng.choice(TOPICS), rng.choice(PLACES)
+    return Petition(
+        id=_pk(spec, n),
+        creator_id=_pk(spec, citizen_near(skewed(rng, spec["users"], 2.0), spec["users"])),
+        title=f"{topic.capitalize()} for our {place} #{n}",
+        description=(
+            f"We the residents ask the authorities to act on {topic} in our {place}. "
+            + " ".join(rng.choices(TOPICS, k=rng.randint(20, 120)))
+        ),
+        category=rng.choices(CATEGORIES, CATEGORY_WEIGHTS)[0],
+        visibility="private" if unit(n, 2) < 0.1 else "public",
+        status=status,
+        created_at=created,
+        published_at=created + timedelta(days=rng.randint(1, 30)) if status == "published" else None,
+    )
+
+
+def _evidence(spec, n, rng):
+    file_type = rng.choices(FILE_TYPES, FILE_TYPE_WEIGHTS)[0]
+    return Evidence(
+        id=_pk(spec, n),
+        uploader_id=_pk(spec, citizen_near(skewed(rng, spec["users"], 2.0), spec["users"])),
+        file=f"evidence/generated/{n}.{file_type}",
+        title=f"{rng.choice(TOPICS).capitalize()} exhibit {n}",
+        file_type=file_type,
+        uploaded_at=spec["anchor"] - PETITION_HISTORY * rng.random(),
+        size_bytes=min(int(rng.lognormvariate(13, 1.5)), 2 ** 31 - 1),
+        verification_status=rng.choices(VERIFICATION, VERIFICATION_WEIGHTS)[0],
+    )
+
+
+def _slot(spec, n, rng):
+    lawyer, number = divmod(n, spec["slots_per_lawyer"])
+    business_day, hour = divmod(number, SLOTS_PER_DAY)
+    day = spec["anchor"].date() + timedelta(days=business_day + 2 * (business_day // 5) + 1)
+    start = timezone.make_aware(datetime.combine(day, time(9 + hour)))
+    return ConsultationSlot(
+        id=_pk(spec, n),
+        lawyer_id=_pk(spec, 100 * lawyer + 50),
+        start_time=start,
+        duration_minutes=rng.choice((30, 30, 45, 60)),
+        is_booked=unit(n, 4) < 0.25,
+    )
+
+
+def _support(spec, n, rng):
+    users = spec["users"]
+    starts = support_layout(spec["petitions"], spec["supports"], users)
+    petition = bisect_right(starts, n) - 1
+    # A stride coprime with ``users`` visits every user once, so the j-th
+    # supporters of one petition are all different people.
+    stride = SUPPORTER_STRIDE if math.gcd(SUPPORTER_STRIDE, users) == 1 else 1
+    user = (int(unit(petition, 6) * users) + (n - starts[petition]) * stride) % users
+    if role_of(user) != "citizen":
+        return None
+    return Support(
+        id=_pk(spec, n),
+        petition_id=_pk(spec, petition),
+        user_id=_pk(spec, user),
+        created_at=spec["anchor"] - PETITION_HISTORY * rng.random(),
+    )
+
+
+def _attachment(spec, n, rng):
+    if unit(n, 3) >= 0.3:
+        return None
+    return Petition.evidences.through(
+        id=_pk(spec, n), petition_id=_pk(spec, n), evidence_id=_pk(spec, n % spec["evidence"])
+    )
+
+
+BUILDERS = {
+    "users": (User, _user),
+    "petitions": (Petition, _petition),
+    "evidence": (Evidence, _evidence),
+    "slots": (ConsultationSlot, _slot),
+    "supports": (Support, _support),
+    "attachments": (Petition.evidences.through, _attachment),
+}
+
+
+@contextmanager
+def _explicit_timestamps():
+    # auto_now_add would overwrite the generated dates; only the generator
+    # process is affected, and only for the duration of the insert.
+    fields = [
+        Petition._meta.get_field("created_at"),
+        Evidence._meta.get_field("uploaded_at"),
+        Support._meta.get_field("created_at"),
+    ]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+@retry_on_busy
+def _insert(model, rows):
+    model.objects.bulk_create(rows, ignore_conflicts=True)
+
+
+def run_batch(kind, index, spec):
+    """
+    Build and insert batch ``index`` of ``kind``. Returns ``(kind, rows)``.
+    """
+    start = index * spec["batch_size"]
+    stop = min(start + spec["batch_size"], totals(spec)[kind])
+    rng = random.Random(f"{spec['seed']}:{kind}:{index}")
+    model, build = BUILDERS[kind]
+    rows = [row for row in (build(spec, n, rng) for n in range(start, stop)) if row is not None]
+    with _explicit_timestamps():
+        _insert(model, rows)
+    return kind, len(rows)
+
+
+def reserve_ids(spec):
+    """
+    Make rows created through the app get ids above the generated range.
+    """
+    top = spec["id_offset"] + spec["id_range"]
+    with connection.cursor() as cursor:
+        for model, _ in BUILDERS.values():
+            cursor.execute(
+                "UPDATE sqlite_sequence SET seq = %s WHERE name = %s AND seq < %s",
+                [top, model._meta.db_table, top],
+            )
+
+
+def generate(spec, workers=0, progress=None):
+    """
+    Generate the dataset described by ``spec`` (see the ``generate_dataset``
+    command). With ``workers``, batches run in that many processes. Calls
+    ``progress(kind, rows)`` after each batch.
+    """
+    sizes = totals(spec)
+    pool = None
+    if workers:
+        pool = ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("spawn"), initializer=django.setup
+        )
+    try:
+        for phase in PHASES:
+            # Later phases point at rows from earlier ones, so each phase finishes first.
+            batches = [
+                (kind, index)
+                for kind in phase
+                for index in range(math.ceil(sizes[kind] / spec["batch_size"]))
+            ]
+            if pool is None:
+                results = (run_batch(kind, index, spec) for kind, index in batches)
+            else:
+                futures = [pool.submit(run_batch, kind, index, spec) for kind, index in batches]
+                results = (future.result() for future in as_completed(futures))
+            for kind, rows in results:
+                if progress:
+                    progress(kind, rows)
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+    reserve_ids(spec)
@@ -0,0 +1,68 @@
+"""
+Database routing and lock handling for SQLite production mode.
+
+With ``DJANGO_DB_MODE=sqlite-wal`` (see settings.py) the database file is
+opened through two aliases. ``default`` takes writes and starts transactions
+with ``BEGIN IMMEDIATE``. ``replica`` is a read-only connection to the same
+file. Under WAL, readers see the last committed state without waiting for a
+writer, so sending reads to ``replica`` keeps page views moving while
+``join_petition`` and friends hold the write lock.
+
+Reads made inside a transaction on ``default`` stay on ``default``, so code
+that writes and then reads in one ``atomic`` block sees its own changes.
+
+``retry_on_busy`` retries a write that still found the database locked after
+``busy_timeout``. It only retries outside any transaction. Inside one, the
+error goes to whoever owns the outer ``atomic`` block.
+"""
+import functools
+import random
+import time
+
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections
+
+READ_ALIAS = "replica"
+BUSY_MESSAGES = ("database is locked", "database is busy", "database table is locked")
+
+
+class ReadWriteRouter:
+    def db_for_read(self, model, **hints):
+        if READ_ALIAS not in connections.settings or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return READ_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases are the same database.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+def is_busy(exc):
+    return any(message in str(exc) for message in BUSY_MESSAGES)
+
+
+def retry_on_busy(func=None, *, attempts=5, delay=0.05):
+    """
+    Call the decorated function again, with jittered exponential backoff,
+    when it fails because the database is locked.
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            for attempt in range(1, attempts + 1):
+                try:
+                    return func(*args, **kwargs)
+                except OperationalError as exc:
+                    if attempt == attempts or not is_busy(exc) or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+                        raise
+                    time.sleep(delay * 2 ** (attempt - 1) * random.uniform(0.5, 1.5))
+
+        return wrapper
+
+    return decorator(func) if func is not None else decorator
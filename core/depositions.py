@@ -0,0 +1,179 @@
+"""
+Compiling and exporting depositions.
+
+A compiled deposition is a title page, the lawyer's narrative
+(``Deposition.content``), and one exhibit section per ``DepositionEvidence``
+row in ``order``. Each section is rendered once into an ``EvidenceFragment``
+keyed by evidence and a hash of everything the section shows, and
+``compile_deposition`` only renders rows whose hash changed. Exhibit numbers
+are added while
+streaming, so reordering rows never re-renders anything, and the same
+evidence in several depositions shares one fragment.
+
+``stream_html`` yields the document piece by piece from a database
+iterator, so it never holds the whole document. ``export_pdf`` spools that
+stream to a temporary file for xhtml2pdf, which still parses the whole
+document, but the PDF goes back to the caller as a file rather than as
+bytes in memory.
+"""
+import hashlib
+import json
+import tempfile
+
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.template.loader import render_to_string
+from django.urls import reverse
+
+from .models import DepositionEvidence, Evidence, EvidenceFragment
+
+# Bump when deposition_exhibit.html changes so every fragment is re-rendered.
+FRAGMENT_VERSION = 1
+EXHIBIT_MARKER = "<!--exhibits-->"
+STREAM_CHUNK_SIZE = 100
+SPOOL_MAX_SIZE = 8 * 1024 * 1024
+
+
+def content_hash(evidence):
+    """
+    Hash of the evidence fields an exhibit section renders.
+    """
+    metadata = evidence.metadata or {}
+    parts = {
+        "version": FRAGMENT_VERSION,
+        "title": evidence.title,
+        "file_type": evidence.file_type,
+        "case_tag": evidence.case_tag,
+        "status": evidence.verification_status,
+        "uploaded_at": evidence.uploaded_at.isoformat() if evidence.uploaded_at else None,
+        "size": evidence.size_bytes,
+        "digest": evidence.blob.sha256 if evidence.blob_id else evidence.file.name,
+        "preview": evidence.preview.name,
+        "metadata": {key: metadata.get(key) for key in ("width", "height", "pages", "duration")},
+    }
+    encoded = json.dumps(parts, sort_keys=True, default=str).encode()
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def render_fragment(evidence):
+    return render_to_string("deposition_exhibit.html", {"e": evidence})
+
+
+def compile_deposition(deposition):
+    """
+    Bring every exhibit fragment of ``deposition`` up to date. Returns the
+    number of sections that had to be rendered.
+    """
+    rows = (
+        DepositionEvidence.objects.filter(deposition=deposition)
+        .select_related("evidence__blob", "fragment")
+        .defer("fragment__html")
+    )
+    stale = []
+    for row in rows:
+        digest = content_hash(row.evidence)
+        if row.fragment is None or row.fragment.content_hash != digest:
+            stale.append((row, digest))
+    if not stale:
+        return 0
+
+    evidence_ids = {row.evidence_id for row, _ in stale}
+    digests = {digest for _, digest in stale}
+
+    def cached():
+        fragments = EvidenceFragment.objects.filter(evidence__in=evidence_ids, content_hash__in=digests)
+        return {
+            (fragment.evidence_id, fragment.content_hash): fragment
+            for fragment in fragments.only("id", "evidence_id", "content_hash")
+        }
+
+    existing = cached()
+    missing = {}
+    for row, digest in stale:
+        key = (row.evidence_id, digest)
+        if key not in existing and key not in missing:
+            missing[key] = EvidenceFragment(
+                evidence_id=row.evidence_id, content_hash=digest, html=render_fragment(row.evidence)
+            )
+
+    with transaction.atomic():
+        if missing:
+            # Another compile may have rendered the same fragment meanwhile.
+            EvidenceFragment.objects.bulk_create(missing.values(), ignore_conflicts=True)
+            existing = cached()
+        replaced = {row.fragment_id for row, _ in stale if row.fragment_id}
+        for row, digest in stale:
+            row.fragment = existing[(row.evidence_id, digest)]
+        DepositionEvidence.objects.bulk_update([row for row, _ in stale], ["fragment"])
+        # Fragments that no deposition uses any more.
+        EvidenceFragment.objects.filter(pk__in=replaced, placements__isnull=True).delete()
+    rendered = len(missing)
+    return rendered
+
+
+def _exhibits(deposition):
+    rows = (
+        DepositionEvidence.objects.filter(deposition=deposition)
+        .order_by("order", "id")
+        .values_list("evidence_id", "fragment__html")
+    )
+    number = 0
+    for evidence_id, html in rows.iterator(chunk_size=STREAM_CHUNK_SIZE):
+        if html is None:
+            # Placed, or its fragment dropped by another compile, after ours ran.
+            evidence = Evidence.objects.select_related("blob").filter(pk=evidence_id).first()
+            if evidence is None:
+                continue
+            html = render_fragment(evidence)
+        number += 1
+        yield f'<section class="exhibit" id="exhibit-{number}">\n<h2>Exhibit {number}</h2>\n{html}</section>\n'
+
+
+def stream_html(deposition):
+    """
+    Compile ``deposition`` and yield its HTML export in pieces.
+    """
+    compile_deposition(deposition)
+    page = render_to_string(
+        "deposition_export.html", {"deposition": deposition, "exhibits": EXHIBIT_MARKER}
+    )
+    head, _, tail = page.partition(EXHIBIT_MARKER)
+    yield head
+    yield from _exhibits(deposition)
+    yield tail
+
+
+def _preview_paths(deposition):
+    # xhtml2pdf fetches <img> sources itself; point preview URLs at the files.
+    paths = {}
+    rows = DepositionEvidence.objects.filter(deposition=deposition).exclude(evidence__preview="")
+    for evidence_id, name in rows.values_list("evidence_id", "evidence__preview").iterator():
+        paths[reverse("evidence_preview", args=[evidence_id])] = default_storage.path(name)
+    return paths
+
+
+def export_pdf(deposition):
+    """
+    Render ``deposition`` to PDF. Returns an open temporary file positioned
+    at the start; the caller closes it.
+    """
+    from xhtml2pdf import pisa
+
+    source = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE, mode="w+b")
+    for piece in stream_html(deposition):
+        source.write(piece.encode())
+    source.seek(0)
+
+    previews = _preview_paths(deposition)
+    output = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE, mode="w+b")
+    try:
+        result = pisa.CreatePDF(
+            source, dest=output, encoding="utf-8", link_callback=lambda uri, rel: previews.get(uri, uri)
+        )
+    finally:
+        source.close()
+    if result.err:
+        output.close()
+        raise ValueError(f"PDF rendering failed with {result.err} error(s).")
+    output.seek(0)
+    return output
@@ -0,0 +1,206 @@
+"""
+Serving evidence files.
+
+Evidence is never exposed as public media. ``visible_evidence`` decides who
+may see a file; ``serve`` answers conditional requests from the blob digest
+(``ETag`` / ``If-None-Match``) and honours single ``Range`` requests, so
+video can be scrubbed without downloading it all again.
+
+The bytes themselves are sent by whatever is cheapest:
+
+* ``EVIDENCE_SENDFILE_BACKEND = "x-accel-redirect"`` hands the file to nginx
+  through an internal location at ``EVIDENCE_ACCEL_REDIRECT_PREFIX``.
+* ``"x-sendfile"`` does the same for Apache/lighttpd with an absolute path.
+* Otherwise a ``FileResponse`` streams it. The file object keeps
+  ``fileno()``, so servers with a ``wsgi.file_wrapper`` (gunicorn) copy it
+  with ``os.sendfile`` rather than through Python.
+"""
+import mimetypes
+import os
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db.models import Q
+from django.http import FileResponse, HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.text import slugify
+
+from .models import Evidence
+
+SENDFILE_HEADERS = {
+    "x-sendfile": "X-Sendfile",
+    "x-accel-redirect": "X-Accel-Redirect",
+}
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def visible_evidence(user):
+    """
+    Evidence ``user`` may download: their own, anything attached to their
+    petitions or to a published public petition, and anything in a
+    deposition they compiled. Admins see everything.
+    """
+    if user.is_superuser or user.is_admin():
+        return Evidence.objects.all()
+    return Evidence.objects.filter(
+        Q(uploader=user)
+        | Q(petitions__creator=user)
+        | Q(petitions__status="published", petitions__visibility="public")
+        | Q(deposition__created_by=user)
+    ).distinct()
+
+
+def etag_for(evidence):
+    if evidence.blob_id:
+        return f'"{evidence.blob.sha256}"'
+    # Files stored before blobs existed have no digest; see evidence_blobs backfill.
+    return f'W/"{evidence.pk}-{evidence.size_bytes}"'
+
+
+def parse_range(header, size):
+    """
+    Parse a ``Range`` header into an inclusive ``(start, end)`` pair.
+
+    Returns None when the whole file should be sent: no header, a unit other
+    than bytes, several ranges, or a malformed value (which RFC 9110 says to
+    ignore). Raises ``RangeNotSatisfiable`` for a range outside the file.
+    """
+    if not header:
+        return None
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, sep, last = spec.strip().partition("-")
+    if not sep or not (first or last) or not (first.isdigit() or not first) or not (last.isdigit() or not last):
+        return None
+
+    if not first:
+        # Suffix range: the last N bytes.
+        length = int(last)
+        if length == 0 or size == 0:
+            raise RangeNotSatisfiable
+        return max(size - length, 0), size - 1
+
+    start = int(first)
+    end = int(last) if last else size - 1
+    if last and end < start:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable
+    return start, min(end, size - 1)
+
+
+class _RangeFile:
+    """
+    Read at most ``length`` bytes of ``fh`` from its current position.
+    ``fileno()`` is passed through for ``os.sendfile``; servers using it
+    stop at the ``Content-Length`` we set.
+    """
+
+    def __init__(self, fh, length):
+        self._fh = fh
+        self.remaining = length
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b""
+        if size is None or size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self._fh.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self._fh.fileno()
+
+    def close(self):
+        self._fh.close()
+
+
+def _download_name(evidence):
+    extension = os.path.splitext(evidence.file.name)[1]
+    return f"{slugify(evidence.title) or 'evidence'}{extension}"
+
+
+def _finish(response, request, etag, filename):
+    response["ETag"] = etag
+    response["Accept-Ranges"] = "bytes"
+    disposition = "attachment" if request.GET.get("download") else "inline"
+    response["Content-Disposition"] = f"{disposition}; filename*=UTF-8''{quote(filename)}"
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def serve_preview(request, evidence):
+    """
+    The JPEG preview made by ``core.processing``. Previews are named after
+    the content digest and never change, so browsers may keep them.
+    """
+    name = evidence.preview.name
+    etag = f'"{os.path.splitext(os.path.basename(name))[0]}-preview"'
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = FileResponse(default_storage.open(name, "rb"), content_type="image/jpeg")
+    response["ETag"] = etag
+    patch_cache_control(response, private=True, max_age=86400)
+    return response
+
+
+def serve(request, evidence):
+    """
+    Response for a GET or HEAD of ``evidence``'s file. The caller checks
+    access (see ``visible_evidence``).
+    """
+    etag = etag_for(evidence)
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        return _finish(not_modified, request, etag, _download_name(evidence))
+
+    name = evidence.file.name
+    filename = _download_name(evidence)
+    content_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+
+    backend = getattr(settings, "EVIDENCE_SENDFILE_BACKEND", "")
+    if backend in SENDFILE_HEADERS:
+        # The proxy does Range and Content-Length itself.
+        response = HttpResponse(content_type=content_type)
+        if backend == "x-accel-redirect":
+            prefix = getattr(settings, "EVIDENCE_ACCEL_REDIRECT_PREFIX", "/protected-media/")
+            response[SENDFILE_HEADERS[backend]] = prefix.rstrip("/") + "/" + quote(name)
+        else:
+            response[SENDFILE_HEADERS[backend]] = default_storage.path(name)
+        return _finish(response, request, etag, filename)
+
+    size = evidence.size_bytes
+    if size is None:
+        size = default_storage.size(name)
+
+    byte_range = None
+    if_range = request.headers.get("If-Range")
+    # If-Range needs a strong validator; a weak one always gets the full file.
+    if not if_range or (if_range == etag and not etag.startswith("W/")):
+        try:
+            byte_range = parse_range(request.headers.get("Range"), size)
+        except RangeNotSatisfiable:
+            response = HttpResponse(status=416)
+            response["Content-Range"] = f"bytes */{size}"
+            return _finish(response, request, etag, filename)
+
+    start, end = byte_range or (0, size - 1)
+    length = end - start + 1 if size else 0
+
+    if request.method == "HEAD":
+        response = HttpResponse(content_type=content_type)
+    else:
+        fh = default_storage.open(name, "rb")
+        fh.seek(start)
+        response = FileResponse(_RangeFile(fh, length), content_type=content_type)
+    response["Content-Length"] = length
+    if byte_range:
+        response.status_code = 206
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+    return _finish(response, request, etag, filename)
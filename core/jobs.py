@@ -0,0 +1,216 @@
+"""
+Database-backed job queue.
+
+Jobs are rows in the ``Job`` table. ``enqueue`` inserts one inside the
+caller's transaction, so a job never runs for data that was rolled back.
+Worker processes started by the ``run_jobs`` command claim jobs with a
+conditional UPDATE. When several workers race for the same row, exactly one
+update matches, so no broker is needed.
+
+Handlers are plain functions registered with ``@jobs.handler("name")`` (see
+``core.tasks``) and called with the payload as keyword arguments. A handler
+that raises is retried with exponential backoff until ``max_attempts``. After
+that the job is left ``dead`` with its traceback for inspection. Jobs whose
+worker died mid-run are put back after ``JOB_LOCK_TIMEOUT`` seconds, which
+therefore has to exceed the longest job.
+"""
+import logging
+import os
+import random
+import socket
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Count, F, Min
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+CLAIM_CANDIDATES = 10
+BACKOFF_BASE = 5
+BACKOFF_CAP = 3600
+HOUSEKEEPING_INTERVAL = 60
+STALE_ERROR = "Worker stopped responding; job was requeued."
+
+# name -> (function, default max_attempts)
+_handlers = {}
+
+
+def handler(name, max_attempts=5):
+    """
+    Register the decorated function as the handler for jobs called ``name``.
+    """
+
+    def register(func):
+        _handlers[name] = (func, max_attempts)
+        return func
+
+    return register
+
+
+def poll_interval():
+    return getattr(settings, "JOB_POLL_INTERVAL", 1.0)
+
+
+def lock_timeout():
+    return getattr(settings, "JOB_LOCK_TIMEOUT", 600)
+
+
+def retention():
+    return getattr(settings, "JOB_RETENTION", 7 * 24 * 3600)
+
+
+def worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"[:64]
+
+
+def enqueue(name, payload=None, priority=0, run_at=None, delay=0, max_attempts=None):
+    """
+    Queue a job. It runs no earlier than ``run_at`` (or ``delay`` seconds from
+    now) and, among ready jobs, higher ``priority`` runs first.
+    """
+    if max_attempts is None:
+        max_attempts = _handlers.get(name, (None, 5))[1]
+    return Job.objects.create(
+        name=name,
+        payload=payload or {},
+        priority=priority,
+        run_at=run_at or timezone.now() + timedelta(seconds=delay),
+        max_attempts=max_attempts,
+    )
+
+
+def claim(worker):
+    """
+    Lock the next ready job for ``worker`` and return it, or None.
+    """
+    now = timezone.now()
+    candidates = (
+        Job.objects.filter(status="queued", run_at__lte=now)
+        .order_by("-priority", "run_at", "id")
+        .values_list("id", flat=True)[:CLAIM_CANDIDATES]
+    )
+    for job_id in list(candidates):
+        claimed = Job.objects.filter(pk=job_id, status="queued").update(
+            status="running", locked_by=worker, locked_at=now, attempts=F("attempts") + 1
+        )
+        if claimed:
+            return Job.objects.get(pk=job_id)
+    return None
+
+
+def backoff(attempts):
+    """
+    Seconds to wait before retry number ``attempts``, with jitter so failed
+    jobs do not all come back at once.
+    """
+    delay = min(BACKOFF_BASE * 2 ** (attempts - 1), BACKOFF_CAP)
+    return delay * random.uniform(0.8, 1.2)
+
+
+def _owned(job):
+    # A job requeued as stale may already belong to another worker.
+    return Job.objects.filter(pk=job.pk, status="running", locked_by=job.locked_by)
+
+
+def run(job):
+    """
+    Run a claimed job and record the outcome. Returns True on success.
+    """
+    func, _ = _handlers.get(job.name, (None, None))
+    try:
+        if func is None:
+            raise LookupError(f"No handler registered for job {job.name!r}.")
+        func(**job.payload)
+    except Exception as exc:
+        error = "".join(traceback.format_exception(exc))[-4000:]
+        now = timezone.now()
+        if func is None or job.attempts >= job.max_attempts:
+            logger.error("Job %s (%s) is dead: %s", job.pk, job.name, exc)
+            _owned(job).update(status="dead", last_error=error, finished_at=now)
+        else:
+            logger.warning("Job %s (%s) failed, will retry: %s", job.pk, job.name, exc)
+            _owned(job).update(
+                status="queued",
+                last_error=error,
+                locked_by="",
+                run_at=now + timedelta(seconds=backoff(job.attempts)),
+            )
+        return False
+    _owned(job).update(status="done", finished_at=timezone.now())
+    return True
+
+
+def requeue_stale():
+    """
+    Put back jobs whose worker has held them for longer than
+    ``JOB_LOCK_TIMEOUT``, or bury them if they are out of attempts.
+    """
+    now = timezone.now()
+    stale = Job.objects.filter(status="running", locked_at__lt=now - timedelta(seconds=lock_timeout()))
+    stale.filter(attempts__gte=F("max_attempts")).update(
+        status="dead", last_error=STALE_ERROR, finished_at=now
+    )
+    return stale.update(status="queued", last_error=STALE_ERROR, locked_by="", run_at=now)
+
+
+def purge_finished(max_age=None):
+    """
+    Delete jobs that finished successfully more than ``JOB_RETENTION`` seconds
+    ago. Dead jobs are kept until someone deals with them.
+    """
+    cutoff = timezone.now() - timedelta(seconds=max_age or retention())
+    deleted, _ = Job.objects.filter(status="done", finished_at__lt=cutoff).delete()
+    return deleted
+
+
+def work(stop, burst=False):
+    """
+    Claim and run jobs until the ``stop`` event is set. With ``burst``, return
+    as soon as no job is ready.
+    """
+    worker = worker_id()
+    next_housekeeping = 0.0
+    while not stop.is_set():
+        close_old_connections()
+        if time.monotonic() >= next_housekeeping:
+            requeue_stale()
+            purge_finished()
+            next_housekeeping = time.monotonic() + HOUSEKEEPING_INTERVAL
+
+        job = claim(worker)
+        if job is None:
+            if burst:
+                return
+            stop.wait(poll_interval())
+            continue
+        run(job)
+
+
+def metrics(window=300):
+    """
+    Queue depth, lag and throughput. ``lag_seconds`` is how long the oldest
+    ready job has been waiting; throughput counts jobs finished in the last
+    ``window`` seconds.
+    """
+    now = timezone.now()
+    ready = Job.objects.filter(status="queued", run_at__lte=now)
+    oldest = ready.aggregate(oldest=Min("run_at"))["oldest"]
+    recent = Job.objects.filter(finished_at__gte=now - timedelta(seconds=window))
+    by_status = dict(Job.objects.order_by().values_list("status").annotate(n=Count("id")))
+    finished = dict(recent.order_by().values_list("status").annotate(n=Count("id")))
+    ready_by_name = dict(ready.order_by().values_list("name").annotate(n=Count("id")))
+    return {
+        "by_status": {status: by_status.get(status, 0) for status, _ in Job.STATUS_CHOICES},
+        "ready": sum(ready_by_name.values()),
+        "ready_by_name": ready_by_name,
+        "lag_seconds": round((now - oldest).total_seconds(), 3) if oldest else 0.0,
+        "window_seconds": window,
+        "done_per_minute": round(finished.get("done", 0) * 60 / window, 2),
+        "dead_in_window": finished.get("dead", 0),
+    }
@@ -0,0 +1,167 @@
+import json
+import random
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from core.models import Petition, Support, SupporterCountShard
+
+PROFILES = ("baseline", "sqlite-wal")
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure read throughput under concurrent writes on a copy of the database, "
+        "with the plain SQLite setup and with DJANGO_DB_MODE=sqlite-wal. Runs the "
+        "board and join SQL on raw sqlite3 connections, so it measures the database "
+        "driver and settings only, not the ORM or the read/write router."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seconds", type=float, default=10, help="How long each profile runs (default: 10).")
+        parser.add_argument("--readers", type=int, default=8, help="Reader threads (default: 8).")
+        parser.add_argument("--writers", type=int, default=2, help="Writer threads (default: 2).")
+        parser.add_argument("--json", action="store_true", help="Print results as JSON.")
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite":
+            raise CommandError("bench_sqlite only runs against SQLite databases.")
+        source = Path(settings.DATABASES["default"]["NAME"])
+
+        # The board query the public pages and API run most.
+        board = Petition.objects.filter(status="published", visibility="public").order_by("-created_at")[:20]
+        read_sql, read_params = board.query.sql_with_params()
+        read_sql = read_sql.replace("%s", "?")
+        petition_ids = list(Petition.objects.values_list("id", flat=True)[:10000])
+        if not petition_ids:
+            self.stderr.write("No petitions in the database; writes will only touch the counter shards.")
+            petition_ids = [0]
+
+        results = {}
+        with tempfile.TemporaryDirectory() as tmp:
+            for profile in PROFILES:
+                path = Path(tmp) / f"{profile}.sqlite3"
+                shutil.copyfile(source, path)
+                results[profile] = self.run_profile(
+                    profile, path, read_sql, read_params, petition_ids, options
+                )
+
+        if options["json"]:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        self.stdout.write(
+            f"{'profile':<12} {'reads/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+            f"{'writes/s':>9} {'read err':>9} {'write err':>10}"
+        )
+        for profile, r in results.items():
+            self.stdout.write(
+                f"{profile:<12} {r['reads_per_second']:>9.1f} {r['read_p50_ms']:>8.2f} {r['read_p95_ms']:>8.2f} "
+                f"{r['read_p99_ms']:>8.2f} {r['writes_per_second']:>9.1f} {r['read_errors']:>9} {r['write_errors']:>10}"
+            )
+
+    def connect(self, profile, path, read_only=False):
+        # Mirrors what DJANGO_DB_MODE=sqlite-wal configures for the "default"
+        # and "replica" aliases (SQLITE_PRAGMAS, query_only, BEGIN IMMEDIATE),
+        # but without Django's connection handling in the timings.
+        conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        if profile == "sqlite-wal":
+            for name, value in settings.SQLITE_PRAGMAS.items():
+                conn.execute(f"PRAGMA {name}={value}")
+            if read_only:
+                conn.execute("PRAGMA query_only=1")
+        else:
+            conn.execute("PRAGMA journal_mode=DELETE")
+        return conn
+
+    def run_profile(self, profile, path, read_sql, read_params, petition_ids, options):
+        begin = "BEGIN IMMEDIATE" if profile == "sqlite-wal" else "BEGIN"
+        support, shards = Support._meta.db_table, SupporterCountShard._meta.db_table
+        petitions = Petition._meta.db_table
+        # What supporters.add_support and counters.increment run for a join.
+        join_sql = (
+            f"INSERT INTO {support} (petition_id, user_id, created_at) "
+            f"SELECT id, ?, ? FROM {petitions} WHERE id = ? ON CONFLICT (petition_id, user_id) DO NOTHING"
+        )
+        shard_sql = (
+            f"INSERT INTO {shards} (petition_id, shard, delta) VALUES (?, ?, 1) "
+            f"ON CONFLICT (petition_id, shard) DO UPDATE SET delta = {shards}.delta + excluded.delta"
+        )
+        self.connect(profile, path).close()  # switch the journal mode before the threads start
+
+        stop = threading.Event()
+        lock = threading.Lock()
+        stats = {"read_latencies": [], "writes": 0, "read_errors": 0, "write_errors": 0}
+
+        def reader():
+            conn = self.connect(profile, path, read_only=True)
+            latencies, errors = [], 0
+            while not stop.is_set():
+                started = time.perf_counter()
+                try:
+                    conn.execute(read_sql, read_params).fetchall()
+                except sqlite3.OperationalError:
+                    errors += 1
+                    continue
+                latencies.append(time.perf_counter() - started)
+            conn.close()
+            with lock:
+                stats["read_latencies"].extend(latencies)
+                stats["read_errors"] += errors
+
+        def writer(seed):
+            conn = self.connect(profile, path)
+            rng = random.Random(seed)
+            writes, errors = 0, 0
+            while not stop.is_set():
+                petition_id = rng.choice(petition_ids)
+                try:
+                    conn.execute(begin)
+                    conn.execute(join_sql, [rng.randrange(1 << 40), timezone.now().isoformat(), petition_id])
+                    conn.execute(shard_sql, [petition_id, rng.randrange(8)])
+                    conn.execute("COMMIT")
+                    writes += 1
+                except sqlite3.OperationalError:
+                    if conn.in_transaction:
+                        conn.execute("ROLLBACK")
+                    errors += 1
+            conn.close()
+            with lock:
+                stats["writes"] += writes
+                stats["write_errors"] += errors
+
+        threads = [threading.Thread(target=reader) for _ in range(options["readers"])]
+        threads += [threading.Thread(target=writer, args=(i,)) for i in range(options["writers"])]
+        for thread in threads:
+            thread.start()
+        time.sleep(options["seconds"])
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+        latencies = stats["read_latencies"]
+        seconds = options["seconds"]
+        return {
+            "reads_per_second": round(len(latencies) / seconds, 1),
+            "read_p50_ms": round(statistics.median(latencies) * 1000, 3) if latencies else 0.0,
+            "read_p95_ms": round(_percentile(latencies, 95) * 1000, 3),
+            "read_p99_ms": round(_percentile(latencies, 99) * 1000, 3),
+            "writes_per_second": round(stats["writes"] / seconds, 1),
+            "read_errors": stats["read_errors"],
+            "write_errors": stats["write_errors"],
+        }
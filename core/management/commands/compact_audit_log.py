@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from core import audit_archive
+
+
+class Command(BaseCommand):
+    help = "Roll up audit counts and archive audit months older than AUDIT_HOT_MONTHS (see core/audit_archive.py)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rollup-only",
+            action="store_true",
+            help="Only bring the hourly and daily rollups up to date.",
+        )
+
+    def handle(self, *args, **options):
+        if options["rollup_only"]:
+            written = audit_archive.rollup()
+            self.stdout.write(f"Wrote {written} rollup row(s).")
+            return
+        moved = audit_archive.compact()
+        self.stdout.write(f"Archived {moved} audit event(s).")
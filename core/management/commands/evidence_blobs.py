@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+
+from core import blobs
+from core.models import Evidence, EvidenceBlob
+
+
+class Command(BaseCommand):
+    help = "Maintain content-addressed evidence blobs."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "action",
+            choices=("backfill", "gc", "verify", "recount"),
+            help=(
+                "backfill: move evidence stored before blobs existed into blob storage; "
+                "gc: delete unreferenced blobs; "
+                "verify: re-hash blobs and reject evidence whose file changed; "
+                "recount: repair reference counts."
+            ),
+        )
+
+    def handle(self, *args, **options):
+        getattr(self, "do_" + options["action"])()
+
+    def do_backfill(self):
+        moved = 0
+        for evidence in Evidence.objects.filter(blob__isnull=True).exclude(file="").iterator():
+            if blobs.backfill(evidence) is not None:
+                moved += 1
+        self.stdout.write(f"Moved {moved} evidence file(s) into blob storage.")
+
+    def do_gc(self):
+        self.stdout.write(f"Deleted {blobs.collect_garbage()} unreferenced blob(s).")
+
+    def do_verify(self):
+        bad = [blob.pk for blob in EvidenceBlob.objects.iterator() if not blobs.verify(blob)]
+        rejected = Evidence.objects.filter(blob_id__in=bad).update(verification_status="rejected")
+        for pk in bad:
+            self.stderr.write(f"Blob {pk} does not match its digest.")
+        self.stdout.write(f"{len(bad)} corrupt blob(s); rejected {rejected} evidence item(s).")
+
+    def do_recount(self):
+        self.stdout.write(f"Corrected {blobs.recount()} blob reference count(s).")
@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core import counters
+
+
+class Command(BaseCommand):
+    help = "Fold pending supporter count shards into Petition.supporter_count."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=0,
+            help="Keep running and flush every N seconds (default: flush once and exit).",
+        )
+
+    def handle(self, *args, **options):
+        interval = options["interval"]
+        while True:
+            changed = counters.flush()
+            if changed or not interval:
+                self.stdout.write(f"Flushed supporter counts for {len(changed)} petition(s).")
+            if not interval:
+                return
+            time.sleep(interval)
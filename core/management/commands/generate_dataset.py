@@ -0,0 +1,103 @@
+import os
+import time
+from collections import Counter
+from datetime import date, datetime
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core import counters, dataset, summary
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate a large deterministic dataset for performance work (see core/dataset.py). "
+        "Re-running with the same options adds nothing; nothing is deleted."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=10000, help="Users (default: 10000).")
+        parser.add_argument("--petitions", type=int, default=50000, help="Petitions (default: 50000).")
+        parser.add_argument("--supports", type=int, default=500000, help="Support links (default: 500000).")
+        parser.add_argument("--evidence", type=int, default=20000, help="Evidence records (default: 20000).")
+        parser.add_argument(
+            "--slots-per-lawyer", type=int, default=40, help="Consultation slots per lawyer (default: 40)."
+        )
+        parser.add_argument("--seed", type=int, default=42, help="Random seed (default: 42).")
+        parser.add_argument(
+            "--anchor",
+            type=date.fromisoformat,
+            default=timezone.localdate(),
+            help="Date the data is generated around, YYYY-MM-DD (default: today). "
+            "Pass the same date to regenerate identical rows later.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=min(os.cpu_count() or 1, 8),
+            help="Worker processes; 0 runs everything in this process (default: CPU count, at most 8).",
+        )
+        parser.add_argument("--batch-size", type=int, default=10000, help="Rows per batch (default: 10000).")
+        parser.add_argument(
+            "--id-offset",
+            type=int,
+            default=10_000_000,
+            help="Generated primary keys start after this (default: 10000000).",
+        )
+        parser.add_argument(
+            "--id-range",
+            type=int,
+            default=10_000_000,
+            help="Ids reserved for generated rows of each kind, after --id-offset; rows created "
+            "through the app afterwards get ids above them (default: 10000000).",
+        )
+        parser.add_argument(
+            "--password", default="loadtest123", help="Password of every generated user (default: loadtest123)."
+        )
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be at least 1.")
+        if min(options["users"], options["petitions"], options["supports"], options["evidence"]) < 0:
+            raise CommandError("Volumes can't be negative.")
+        spec = {
+            "users": options["users"],
+            "petitions": options["petitions"],
+            "supports": options["supports"],
+            "evidence": options["evidence"],
+            "slots_per_lawyer": max(options["slots_per_lawyer"], 0),
+            "seed": options["seed"],
+            "anchor": timezone.make_aware(datetime.combine(options["anchor"], datetime.min.time())),
+            "batch_size": options["batch_size"],
+            "id_offset": options["id_offset"],
+            "id_range": options["id_range"],
+            "password_hash": make_password(options["password"]),
+        }
+        sizes = dataset.totals(spec)
+        if max(sizes.values()) > spec["id_range"]:
+            raise CommandError(f"--id-range must be at least {max(sizes.values())} for these volumes.")
+        done = Counter()
+        verbosity = options["verbosity"]
+        started = time.monotonic()
+
+        def progress(kind, rows):
+            done[kind] += rows
+            if verbosity > 1:
+                self.stdout.write(f"{kind}: {done[kind]} / {sizes[kind]}")
+
+        dataset.generate(spec, workers=max(options["workers"], 0), progress=progress)
+        corrected = counters.reconcile()
+        # Bulk inserts skip the signals that keep the dashboard counters.
+        summary.reconcile()
+        elapsed = time.monotonic() - started
+
+        for kind, (model, _) in dataset.BUILDERS.items():
+            stored = model.objects.filter(
+                pk__gt=spec["id_offset"], pk__lte=spec["id_offset"] + sizes[kind]
+            ).count()
+            self.stdout.write(f"{kind:<12} {stored:>10} row(s) in the generated id range")
+        self.stdout.write(
+            f"Processed {sum(done.values())} row(s) in {elapsed:.1f}s; "
+            f"corrected {corrected} supporter count(s)."
+        )
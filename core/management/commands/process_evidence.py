@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from core import processing
+from core.models import Evidence
+
+
+class Command(BaseCommand):
+    help = "Sniff types, extract metadata and render previews for evidence files."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--all", action="store_true", help="Reprocess evidence that was already processed.")
+        parser.add_argument("--inline", action="store_true", help="Process in this process instead of the worker pool.")
+
+    def handle(self, *args, **options):
+        evidences = Evidence.objects.exclude(file="")
+        if not options["all"]:
+            evidences = evidences.filter(processed_at__isnull=True)
+        ids = list(evidences.values_list("id", flat=True))
+
+        if options["inline"]:
+            results = map(processing.process_evidence, ids)
+        else:
+            results = processing.executor().map(processing.process_evidence, ids)
+        done = sum(1 for result in results if result is not None)
+        self.stdout.write(f"Processed {done} evidence file(s).")
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from core import uploads
+
+
+class Command(BaseCommand):
+    help = "Delete unfinished evidence upload sessions that have been idle too long."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--max-age", type=int, default=None, help="Idle time in seconds (default: EVIDENCE_UPLOAD_SESSION_TTL).")
+
+    def handle(self, *args, **options):
+        purged = uploads.purge_expired(options["max_age"])
+        self.stdout.write(f"Purged {purged} upload session(s).")
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from core import search
+
+
+class Command(BaseCommand):
+    help = "Rebuild the petition full-text search index from the petition table."
+
+    def handle(self, *args, **options):
+        if not search.is_supported():
+            self.stdout.write("Full-text index is only used on SQLite; nothing to do.")
+            return
+        search.install(rebuild=True)
+        self.stdout.write(self.style.SUCCESS("Petition search index rebuilt."))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from core import summary
+
+
+class Command(BaseCommand):
+    help = "Rebuild the dashboard counters from the petition, evidence and slot tables."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--schedule",
+            action="store_true",
+            help="Also queue the recurring reconcile job (every DASHBOARD_RECONCILE_INTERVAL seconds).",
+        )
+
+    def handle(self, *args, **options):
+        fixed = summary.reconcile()
+        self.stdout.write(self.style.SUCCESS(f"Reconciled dashboard counters; {fixed} counter(s) corrected."))
+        if options["schedule"]:
+            summary.schedule_reconcile()
+            self.stdout.write(f"Next reconcile in {summary.reconcile_interval()}s.")
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from core import counters
+
+
+class Command(BaseCommand):
+    help = "Recompute every Petition.supporter_count from the Support table."
+
+    def handle(self, *args, **options):
+        fixed = counters.reconcile()
+        self.stdout.write(self.style.SUCCESS(f"Reconciled supporter counts; {fixed} petition(s) corrected."))
@@ -0,0 +1,68 @@
+import multiprocessing
+import signal
+import threading
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+def _worker(stop, burst):
+    # Spawned workers start from scratch; the parent handles Ctrl-C and
+    # tells them to stop after their current job.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    django.setup()
+    from core import audit, jobs
+
+    try:
+        jobs.work(stop, burst)
+    finally:
+        # multiprocessing children skip atexit hooks.
+        audit.flush()
+
+
+class Command(BaseCommand):
+    help = "Run background job workers (see core/jobs.py)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=getattr(settings, "JOB_WORKERS", 2),
+            help="Number of worker processes (default: JOB_WORKERS).",
+        )
+        parser.add_argument("--burst", action="store_true", help="Exit once no job is ready.")
+
+    def handle(self, *args, **options):
+        from core import jobs, summary
+
+        # Recurring jobs queue their next run when they finish; make sure the
+        # dashboard reconcile is in the queue on a fresh database too.
+        summary.schedule_reconcile()
+        workers = max(options["workers"], 1)
+        if workers == 1:
+            stop = threading.Event()
+            self._on_signal(stop)
+            jobs.work(stop, options["burst"])
+            return
+
+        context = multiprocessing.get_context("spawn")
+        stop = context.Event()
+        processes = [
+            context.Process(target=_worker, args=(stop, options["burst"]), name=f"job-worker-{n}")
+            for n in range(workers)
+        ]
+        for process in processes:
+            process.start()
+        self._on_signal(stop)
+        self.stdout.write(f"Started {workers} job worker(s).")
+        for process in processes:
+            process.join()
+
+    def _on_signal(self, stop):
+        def request_stop(signum, frame):
+            self.stdout.write("Stopping after current jobs...")
+            stop.set()
+
+        signal.signal(signal.SIGINT, request_stop)
+        signal.signal(signal.SIGTERM, request_stop)
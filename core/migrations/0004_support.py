@@ -0,0 +1,61 @@
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def copy_supporters(apps, schema_editor):
+    Petition = apps.get_model("core", "Petition")
+    Support = apps.get_model("core", "Support")
+    Through = Petition.supporters.through
+    now = django.utils.timezone.now()
+    batch = []
+    for row in Through.objects.values("petition_id", "user_id").iterator():
+        batch.append(Support(petition_id=row["petition_id"], user_id=row["user_id"], created_at=now))
+        if len(batch) >= 1000:
+            Support.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    Support.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def copy_supports_back(apps, schema_editor):
+    Petition = apps.get_model("core", "Petition")
+    Support = apps.get_model("core", "Support")
+    Through = Petition.supporters.through
+    Through.objects.bulk_create(
+        [Through(petition_id=s["petition_id"], user_id=s["user_id"]) for s in Support.objects.values("petition_id", "user_id")],
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_alter_petition_category'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Support',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('petition', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='supports', to='core.petition')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='supports', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('petition', 'user'), name='unique_petition_supporter')],
+            },
+        ),
+        migrations.RunPython(copy_supporters, copy_supports_back),
+        # Django cannot add through= to an existing M2M, so swap the field.
+        migrations.RemoveField(
+            model_name='petition',
+            name='supporters',
+        ),
+        migrations.AddField(
+            model_name='petition',
+            name='supporters',
+            field=models.ManyToManyField(blank=True, related_name='supported_petitions', through='core.Support', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_support'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SupporterCountShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shard', models.PositiveSmallIntegerField()),
+                ('delta', models.IntegerField(default=0)),
+                ('petition', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='count_shards', to='core.petition')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('petition', 'shard'), name='unique_petition_count_shard')],
+            },
+        ),
+    ]
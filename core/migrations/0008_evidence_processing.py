@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_evidenceblob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='evidence',
+            name='metadata',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='evidence',
+            name='preview',
+            field=models.ImageField(blank=True, max_length=255, upload_to='evidence/previews/'),
+        ),
+        migrations.AddField(
+            model_name='evidence',
+            name='processed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EvidenceFragment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(max_length=64)),
+                ('html', models.TextField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('evidence', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fragments', to='core.evidence')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='depositionevidence',
+            name='fragment',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='placements', to='core.evidencefragment'),
+        ),
+        migrations.AddConstraint(
+            model_name='evidencefragment',
+            constraint=models.UniqueConstraint(fields=('evidence', 'content_hash'), name='unique_evidence_fragment'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:28
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_evidencefragment'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='deposition',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='DepositionRevision',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveIntegerField()),
+                ('delta', models.BinaryField(blank=True, null=True)),
+                ('snapshot', models.BinaryField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('author', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+                ('deposition', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='revisions', to='core.deposition')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('deposition', 'version'), name='unique_deposition_revision')],
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:30
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_deposition_revisions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='consultationslot',
+            name='held_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='held_slots', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='consultationslot',
+            name='held_until',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
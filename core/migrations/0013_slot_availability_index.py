@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_slot_holds'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='consultationslot',
+            index=models.Index(fields=['is_booked', 'start_time', 'lawyer'], name='core_slot_availability_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='consultationslot',
+            index=models.Index(condition=models.Q(('held_until__isnull', False)), fields=['held_until'], name='core_slot_hold_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_audit_archive_and_rollups'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='consultationslot',
+            index=models.Index(fields=['lawyer', 'start_time'], name='core_slot_lawyer_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='evidence',
+            index=models.Index(fields=['uploader', 'uploaded_at'], name='core_evidence_uploader_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='petition',
+            index=models.Index(fields=['status', 'created_at'], name='core_petition_status_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='petition',
+            index=models.Index(fields=['creator', 'created_at'], name='core_petition_creator_idx'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+from django.db import migrations
+
+# core.processing.EXIF_TAGS when this migration was written.
+EXIF_TAGS = {
+    "Make", "Model", "LensMake", "LensModel", "Software", "Orientation",
+    "DateTime", "DateTimeOriginal", "DateTimeDigitized", "OffsetTimeOriginal",
+    "ExposureTime", "FNumber", "ISOSpeedRatings", "FocalLength", "Flash",
+    "ExifImageWidth", "ExifImageHeight", "ColorSpace", "XResolution", "YResolution",
+}
+
+
+def scrub_exif(apps, schema_editor):
+    # Drop GPS position, serial numbers and other identifying tags stored
+    # before processing kept descriptive EXIF only.
+    Evidence = apps.get_model("core", "Evidence")
+    batch = []
+    for evidence in Evidence.objects.filter(metadata__has_key="exif").only("id", "metadata").iterator():
+        exif = evidence.metadata.get("exif") or {}
+        kept = {name: value for name, value in exif.items() if name in EXIF_TAGS}
+        if kept != exif:
+            evidence.metadata["exif"] = kept
+            batch.append(evidence)
+        if len(batch) >= 500:
+            Evidence.objects.bulk_update(batch, ["metadata"])
+            batch = []
+    Evidence.objects.bulk_update(batch, ["metadata"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_dashboard_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(scrub_exif, migrations.RunPython.noop),
+    ]
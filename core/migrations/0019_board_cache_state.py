@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_scrub_evidence_exif'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BoardCacheState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('generation', models.PositiveBigIntegerField(default=1)),
+                ('supporter_drift', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:20
+
+import core.search
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0019_board_cache_state'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PetitionSearchEntry',
+            fields=[
+                ('petition', models.OneToOneField(db_column='rowid', on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_entry', serialize=False, to='core.petition')),
+                ('document', core.search.FullTextField(db_column='core_petition_fts')),
+            ],
+            options={
+                'db_table': 'core_petition_fts',
+                'managed': False,
+            },
+        ),
+    ]
@@ -1,8 +1,12 @@
 # core/models.py
+import uuid
+
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.utils import timezone
 
+from .search import FTS_TABLE, FullTextField
+
 class User(AbstractUser):
     ROLE_CHOICES = (("admin","Admin"), ("lawyer","Lawyer"), ("citizen","Citizen"))
     role = models.CharField(max_length=20, choices=ROLE_CHOICES, default="citizen")
@@ -13,6 +17,20 @@ class User(AbstractUser):
     def is_admin(self):
         return self.role == "admin"
 
+class EvidenceBlob(models.Model):
+    """
+    One stored evidence file, shared by every Evidence with the same content
+    (see core/blobs.py).
+    """
+    sha256 = models.CharField(max_length=64, unique=True)
+    file = models.FileField(upload_to="evidence/blobs/", max_length=255)
+    size_bytes = models.PositiveBigIntegerField()
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.sha256
+
 class Evidence(models.Model):
     FILE_TYPES = (
         ("image","Image"),
@@ -29,15 +47,55 @@ class Evidence(models.Model):
     size_bytes = models.PositiveIntegerField(null=True, blank=True)
     case_tag = models.CharField(max_length=128, blank=True)
     verification_status = models.CharField(max_length=20, choices=(("pending","Pending"),("verified","Verified"),("rejected","Rejected")), default="pending")
+    blob = models.ForeignKey(EvidenceBlob, on_delete=models.PROTECT, null=True, blank=True, related_name="evidences")
+    # Filled in by the background processing stage (core/processing.py).
+    metadata = models.JSONField(default=dict, blank=True)
+    preview = models.ImageField(upload_to="evidence/previews/", max_length=255, blank=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Evidence listings on the dashboards, newest first.
+            models.Index(fields=["uploader", "uploaded_at"], name="core_evidence_uploader_idx"),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored state so signal handlers can see verification changes.
+        instance._loaded_verification_status = dict(zip(field_names, values)).get("verification_status")
+        return instance
 
     def save(self, *args, **kwargs):
-        if self.file:
+        # Only stat the file when the size is unknown or a new file was attached.
+        if self.file and (self.size_bytes is None or not self.file._committed):
             try:
                 self.size_bytes = self.file.size
             except Exception:
                 pass
         super().save(*args, **kwargs)
 
+class UploadSession(models.Model):
+    """
+    A resumable, chunked evidence upload in progress (see core/uploads.py).
+    ``evidence`` is set once the upload has been finalized.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    uploader = models.ForeignKey(User, on_delete=models.CASCADE, related_name="upload_sessions")
+    title = models.CharField(max_length=255)
+    file_type = models.CharField(max_length=20, choices=Evidence.FILE_TYPES, default="other")
+    case_tag = models.CharField(max_length=128, blank=True)
+    filename = models.CharField(max_length=255)
+    total_size = models.PositiveBigIntegerField()
+    offset = models.PositiveBigIntegerField(default=0)
+    sha256 = models.CharField(max_length=64, blank=True)
+    evidence = models.OneToOneField(Evidence, on_delete=models.SET_NULL, null=True, blank=True, related_name="upload_session")
+    # The request currently writing a chunk or finalizing, until claimed_until.
+    claim = models.UUIDField(null=True, blank=True, editable=False)
+    claimed_until = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
 class Petition(models.Model):
     creator = models.ForeignKey(User, on_delete=models.CASCADE, related_name="petitions")
     title = models.CharField(max_length=255)
@@ -61,23 +119,145 @@ class Petition(models.Model):
         default="draft",
     )
     evidences = models.ManyToManyField("Evidence", related_name="petitions", blank=True)
-    supporters = models.ManyToManyField("User", related_name="supported_petitions", blank=True)  # ✅ add this
+    supporters = models.ManyToManyField("User", through="Support", related_name="supported_petitions", blank=True)
     supporter_count = models.PositiveIntegerField(default=0)  # ✅ optional, for fast counting
     created_at = models.DateTimeField(auto_now_add=True)
     published_at = models.DateTimeField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            # Public board, the API and the moderation queue. Pages come off
+            # the index already in (created_at, id) order (the rowid ends
+            # every entry), so no page sorts the rows matching its status.
+            models.Index(fields=["status", "created_at"], name="core_petition_status_time_idx"),
+            # A citizen's own petitions, newest first.
+            models.Index(fields=["creator", "created_at"], name="core_petition_creator_idx"),
+        ]
+
     def __str__(self):
         return self.title
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored status so signal handlers can see transitions.
+        instance._loaded_status = dict(zip(field_names, values)).get("status")
+        return instance
+
+class PetitionSearchEntry(models.Model):
+    """
+    A row of the FTS5 index over petitions (core/search.py), which the
+    search installs and keeps in sync itself. Mapped only so searches can
+    join it with ``search_entry__document__match``.
+    """
+    petition = models.OneToOneField(
+        Petition, on_delete=models.DO_NOTHING, primary_key=True, db_column="rowid", related_name="search_entry"
+    )
+    document = FullTextField(db_column=FTS_TABLE)
+
+    class Meta:
+        managed = False
+        db_table = FTS_TABLE
+
+class Support(models.Model):
+    """
+    One citizen supporting one petition. The unique constraint lets joins be
+    a single insert-or-ignore (see core/supporters.py).
+    """
+    petition = models.ForeignKey(Petition, on_delete=models.CASCADE, related_name="supports")
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="supports")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["petition", "user"], name="unique_petition_supporter"),
+        ]
+
+class SupporterCountShard(models.Model):
+    """
+    Pending supporter count changes for a petition, spread over a few shard
+    rows so hot petitions don't serialize on one counter. ``core.counters``
+    folds them into ``Petition.supporter_count``.
+    """
+    petition = models.ForeignKey(Petition, on_delete=models.CASCADE, related_name="count_shards")
+    shard = models.PositiveSmallIntegerField()
+    delta = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["petition", "shard"], name="unique_petition_count_shard"),
+        ]
+
+class BoardCacheState(models.Model):
+    """
+    The board cache's generation and the supporter count drift since it was
+    last bumped (see core/board_cache.py). One row, shared by every process.
+    """
+    generation = models.PositiveBigIntegerField(default=1)
+    supporter_drift = models.PositiveBigIntegerField(default=0)
+
+class DashboardCounter(models.Model):
+    """
+    A materialized dashboard number, kept up to date as petitions, evidence
+    and slots change (see core/summary.py). ``user`` is the owner, or null
+    for the site-wide total.
+    """
+    # No database constraint: deleting a user cascades to their petitions,
+    # whose delete signals still adjust this user's counters. Rows left for
+    # deleted users are dropped by the next reconcile.
+    user = models.ForeignKey(
+        User,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        null=True,
+        blank=True,
+        related_name="dashboard_counters",
+    )
+    key = models.CharField(max_length=64)
+    value = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "key"], name="unique_user_dashboard_counter"),
+            models.UniqueConstraint(
+                fields=["key"], condition=models.Q(user__isnull=True), name="unique_site_dashboard_counter"
+            ),
+        ]
+
 class ConsultationSlot(models.Model):
     lawyer = models.ForeignKey(User, on_delete=models.CASCADE, limit_choices_to={"role":"lawyer"})
     start_time = models.DateTimeField()
     duration_minutes = models.PositiveIntegerField(default=30)
     is_booked = models.BooleanField(default=False)
+    # Set while a citizen is checking out; the slot frees itself once
+    # held_until passes without a confirmation (see core/bookings.py).
+    held_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name="held_slots")
+    held_until = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Availability search: free slots in a time range (core/slots.py).
+            models.Index(fields=["is_booked", "start_time", "lawyer"], name="core_slot_availability_idx"),
+            # A lawyer's own slots in time order.
+            models.Index(fields=["lawyer", "start_time"], name="core_slot_lawyer_time_idx"),
+            # Held slots only: expired holds for availability and cleanup.
+            models.Index(
+                fields=["held_until"], condition=models.Q(held_until__isnull=False), name="core_slot_hold_idx"
+            ),
+        ]
 
     def __str__(self):
         return f"{self.lawyer.username} - {self.start_time}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored state so signal handlers can move dashboard counts.
+        loaded = dict(zip(field_names, values))
+        if {"lawyer_id", "start_time", "is_booked"} <= loaded.keys():
+            instance._loaded_slot = (loaded["lawyer_id"], loaded["start_time"], loaded["is_booked"])
+        return instance
+
 class ConsultationBooking(models.Model):
     slot = models.ForeignKey(ConsultationSlot, on_delete=models.CASCADE, related_name="bookings")
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="bookings")
@@ -89,16 +269,134 @@ class Deposition(models.Model):
     title = models.CharField(max_length=255)
     content = models.TextField(blank=True)  # compiled narrative (HTML or plain)
     evidences = models.ManyToManyField(Evidence, through="DepositionEvidence", blank=True)
+    version = models.PositiveIntegerField(default=0)  # bumped by every autosave (core/revisions.py)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+class DepositionRevision(models.Model):
+    """
+    One autosave of a deposition's content: the zlib-compressed edit that
+    produced ``version``, plus a compressed full snapshot every few versions
+    so old versions can be rebuilt quickly (see core/revisions.py).
+    """
+    deposition = models.ForeignKey(Deposition, on_delete=models.CASCADE, related_name="revisions")
+    version = models.PositiveIntegerField()
+    delta = models.BinaryField(null=True, blank=True)
+    snapshot = models.BinaryField(null=True, blank=True)
+    author = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["deposition", "version"], name="unique_deposition_revision"),
+        ]
+
+class EvidenceFragment(models.Model):
+    """
+    The rendered exhibit section for one evidence item, cached under a hash
+    of everything that goes into it (see core/depositions.py).
+    """
+    evidence = models.ForeignKey(Evidence, on_delete=models.CASCADE, related_name="fragments")
+    content_hash = models.CharField(max_length=64)
+    html = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["evidence", "content_hash"], name="unique_evidence_fragment"),
+        ]
+
 class DepositionEvidence(models.Model):
     deposition = models.ForeignKey(Deposition, on_delete=models.CASCADE)
     evidence = models.ForeignKey(Evidence, on_delete=models.CASCADE)
     order = models.PositiveIntegerField(default=0)
+    fragment = models.ForeignKey(EvidenceFragment, on_delete=models.SET_NULL, null=True, blank=True, related_name="placements")
 
 class AuditLog(models.Model):
+    """
+    Recent audit events. Months older than ``AUDIT_HOT_MONTHS`` are moved
+    into ``AuditArchive`` chunks by ``compact_audit_log``
+    (see core/audit_archive.py).
+    """
     user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
     action = models.CharField(max_length=255)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Set when the event is recorded, not when the buffer is written (core/audit.py).
+    timestamp = models.DateTimeField(default=timezone.now)
     meta = models.JSONField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["timestamp"], name="core_audit_time_idx"),
+            models.Index(fields=["user", "timestamp"], name="core_audit_user_time_idx"),
+            models.Index(fields=["action", "timestamp"], name="core_audit_action_time_idx"),
+        ]
+
+class AuditArchive(models.Model):
+    """
+    A compacted run of audit events from one month: up to
+    ``AUDIT_ARCHIVE_CHUNK_SIZE`` rows as zlib-compressed NDJSON, in
+    timestamp order.
+    """
+    month = models.DateField()
+    chunk = models.PositiveIntegerField()
+    first_timestamp = models.DateTimeField()
+    last_timestamp = models.DateTimeField()
+    count = models.PositiveIntegerField()
+    data = models.BinaryField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["month", "chunk"], name="unique_audit_archive_chunk"),
+        ]
+
+class AuditRollup(models.Model):
+    """
+    Number of audit events per user and action in one hour or day.
+    """
+    PERIOD_CHOICES = (
+        ("hour", "Hour"),
+        ("day", "Day"),
+    )
+    period = models.CharField(max_length=4, choices=PERIOD_CHOICES)
+    bucket = models.DateTimeField()
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    action = models.CharField(max_length=255)
+    count = models.PositiveIntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["period", "bucket"], name="core_audit_rollup_idx"),
+        ]
+
+class Job(models.Model):
+    """
+    A unit of deferred work, run by the ``run_jobs`` workers (see core/jobs.py).
+    Higher ``priority`` runs first; nothing runs before ``run_at``.
+    """
+    STATUS_CHOICES = (
+        ("queued", "Queued"),
+        ("running", "Running"),
+        ("done", "Done"),
+        ("dead", "Dead"),
+    )
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="queued")
+    priority = models.SmallIntegerField(default=0)
+    run_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    locked_by = models.CharField(max_length=64, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "-priority", "run_at"], name="core_job_claim_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
@@ -0,0 +1,68 @@
+"""
+Moderating the petition queue.
+
+``moderate`` approves or rejects pending petitions in bulk, either a list of
+ids or every pending petition matching a filter. The move is one conditional
+UPDATE (pending → published or rejected), so when two admins work the same
+queue each petition is moved by exactly one of them. The other admin gets
+``skipped`` for it, with the status it already has. Approving also sets
+``published_at``.
+
+``QuerySet.update()`` sends no model signals, so the side effects of a save
+are done once per batch here instead of once per row:
+
+- the public board cache is invalidated if anything was published
+- the creators' dashboard counts move (core/summary.py)
+
+The calling view records one audit event for the whole batch.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from . import board_cache, summary
+from .db import retry_on_busy
+from .models import Petition
+
+ACTIONS = {"approve": "published", "reject": "rejected"}
+MAX_IDS = 1000
+
+
+@retry_on_busy
+def moderate(action, ids=None, filters=None):
+    """
+    Move the pending petitions in ``ids``, or those matching ``filters`` (a
+    dict of ``Petition`` lookups), to the status for ``action``. Returns
+    ``(moved_ids, outcomes)``. With ``ids``, ``outcomes`` maps every
+    requested id to ``"approved"`` / ``"rejected"``, ``"skipped"`` with the
+    petition's current status, or ``"not_found"``. With ``filters`` it is
+    None.
+    """
+    new_status = ACTIONS[action]
+    changes = {"status": new_status}
+    if new_status == "published":
+        changes["published_at"] = timezone.now()
+    target = Petition.objects.filter(status="pending")
+    target = target.filter(pk__in=ids) if ids is not None else target.filter(**(filters or {}))
+
+    with transaction.atomic():
+        # Locks the rows where the database can, so the creators read here
+        # are exactly the rows the UPDATE moves.
+        moving = list(target.select_for_update().values_list("pk", "creator_id"))
+        if moving:
+            target.update(**changes)
+            summary.petitions_moved([(creator_id, "pending") for _, creator_id in moving], new_status)
+            if new_status == "published":
+                transaction.on_commit(board_cache.invalidate)
+        moved_ids = sorted(pk for pk, _ in moving)
+        if ids is None:
+            return moved_ids, None
+
+        outcome = "approved" if action == "approve" else "rejected"
+        outcomes = dict.fromkeys(moved_ids, {"outcome": outcome})
+        rest = set(ids) - set(moved_ids)
+        if rest:
+            for pk, current in Petition.objects.filter(pk__in=rest).values_list("pk", "status"):
+                outcomes[pk] = {"outcome": "skipped", "status": current}
+        for pk in rest - outcomes.keys():
+            outcomes[pk] = {"outcome": "not_found"}
+    return moved_ids, outcomes
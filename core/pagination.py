@@ -0,0 +1,196 @@
+"""
+Keyset (cursor) pagination shared by the HTML listings and the REST API.
+
+Pages are addressed by the sort key of the last row shown, e.g.
+``(created_at, id)``, instead of an offset. Fetching the next page is an
+index seek no matter how deep the reader goes, and rows inserted while a
+reader is paging never shift or duplicate what they see.
+"""
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+from . import search
+
+DEFAULT_ORDERING = ("-created_at", "-id")
+DEFAULT_PAGE_SIZE = 25
+MAX_PAGE_SIZE = 100
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(values):
+    raw = json.dumps([v.isoformat() if hasattr(v, "isoformat") else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+    except (ValueError, TypeError) as exc:
+        raise InvalidCursor(cursor) from exc
+    if not isinstance(values, list):
+        raise InvalidCursor(cursor)
+    return values
+
+
+def _seek(queryset, ordering, values):
+    """
+    Filter to rows strictly after ``values`` in ``ordering``.
+
+    For ``("-created_at", "-id")`` this is
+    ``created_at < c OR (created_at = c AND id < i)``.
+    """
+    if len(values) != len(ordering):
+        raise InvalidCursor(values)
+
+    parsed = []
+    for field, value in zip(ordering, values):
+        try:
+            parsed.append(queryset.model._meta.get_field(field.lstrip("-")).to_python(value))
+        except (ValidationError, TypeError, ValueError) as exc:
+            raise InvalidCursor(values) from exc
+
+    condition = None
+    for i, field in enumerate(ordering):
+        name = field.lstrip("-")
+        lookup = "lt" if field.startswith("-") else "gt"
+        clause = {f"{name}__{lookup}": parsed[i]}
+        clause.update({f.lstrip("-"): parsed[j] for j, f in enumerate(ordering[:i])})
+        condition = Q(**clause) if condition is None else condition | Q(**clause)
+    return queryset.filter(condition)
+
+
+def _position(obj, ordering):
+    return [getattr(obj, field.lstrip("-")) for field in ordering]
+
+
+class KeysetPage:
+    def __init__(self, object_list, next_cursor, page_size):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.page_size = page_size
+        self.next_url = None
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+
+def paginate(queryset, cursor=None, page_size=DEFAULT_PAGE_SIZE, ordering=DEFAULT_ORDERING):
+    """
+    Return one :class:`KeysetPage` of ``queryset`` starting after ``cursor``.
+
+    Ranked search results (see :mod:`core.search`) are paged by relevance
+    instead of ``ordering``. Raises :class:`InvalidCursor` for a cursor that
+    was not produced by this function.
+    """
+    if search.is_ranked(queryset):
+        ordering = search.RANK_ORDERING
+        if cursor:
+            try:
+                queryset = search.seek(queryset, decode_cursor(cursor))
+            except (TypeError, ValueError, IndexError) as exc:
+                raise InvalidCursor(cursor) from exc
+    else:
+        queryset = queryset.order_by(*ordering)
+        if cursor:
+            queryset = _seek(queryset, ordering, decode_cursor(cursor))
+
+    # One extra row tells us whether a next page exists without a COUNT(*).
+    rows = list(queryset[: page_size + 1])
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = encode_cursor(_position(rows[-1], ordering))
+    return KeysetPage(rows, next_cursor, page_size)
+
+
+def paginate_request(request, queryset, ordering=DEFAULT_ORDERING, param="cursor", page_size=DEFAULT_PAGE_SIZE):
+    """
+    Paginate for an HTML view, reading the cursor from ``request.GET[param]``.
+
+    A malformed cursor falls back to the first page. ``page.next_url`` keeps
+    the rest of the query string (search terms, other cursors) intact.
+    """
+    try:
+        page = paginate(queryset, request.GET.get(param), page_size, ordering)
+    except InvalidCursor:
+        page = paginate(queryset, None, page_size, ordering)
+    if page.has_next:
+        params = request.GET.copy()
+        params[param] = page.next_cursor
+        page.next_url = f"?{params.urlencode()}"
+    return page
+
+
+class KeysetCursorPagination(BasePagination):
+    """
+    DRF pagination backed by :func:`paginate`.
+
+    Views may set ``keyset_ordering``; the default is newest first by
+    ``(created_at, id)``. Clients follow ``next`` until it is ``null``.
+    """
+
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        ordering = getattr(view, "keyset_ordering", DEFAULT_ORDERING)
+        try:
+            self.page = paginate(
+                queryset,
+                request.query_params.get(self.cursor_query_param),
+                self.get_page_size(request),
+                ordering,
+            )
+        except InvalidCursor:
+            raise NotFound("Invalid cursor")
+        return self.page.object_list
+
+    def get_page_size(self, request):
+        default = api_settings.PAGE_SIZE or DEFAULT_PAGE_SIZE
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, default))
+        except (TypeError, ValueError):
+            return default
+        return max(1, min(size, MAX_PAGE_SIZE))
+
+    def get_next_link(self):
+        if not self.page.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.page.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({"next": self.get_next_link(), "results": data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
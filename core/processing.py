@@ -0,0 +1,369 @@
+"""
+Background processing of uploaded evidence.
+
+``schedule`` queues a ``process_evidence`` job for an upload (see
+``core.jobs``), so the request thread never waits for images to decode or
+PDFs to render. The job:
+
+* sniffs the real type from the file's magic bytes and corrects ``file_type``;
+* extracts metadata (dimensions, EXIF, page count, duration) into
+  ``Evidence.metadata``. Only descriptive EXIF tags are kept (``EXIF_TAGS``),
+  never GPS position or serial numbers;
+* renders a small JPEG preview. Images are thumbnailed with Pillow. The first
+  PDF page is rendered with ``pdftoppm``, and a video frame with ``ffmpeg``,
+  when those tools are installed.
+
+Previews are cached on disk under the content digest, so identical files
+(see ``core.blobs``) are only rendered once. List pages link the preview
+instead of the original.
+
+The ``process_evidence`` command catches up on old files with a pool of
+worker processes. The pool is spawned rather than forked, so workers don't
+share the parent's database connections and threads. Like ``core.uploads``,
+this needs a storage backend with local paths.
+"""
+import logging
+import multiprocessing
+import os
+import shutil
+import struct
+import subprocess
+import tempfile
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.utils import timezone
+
+from . import jobs
+from .models import Evidence
+
+logger = logging.getLogger(__name__)
+
+PREVIEW_DIR = "evidence/previews"
+SNIFF_BYTES = 64
+MAX_EXIF_STRING = 256
+TOOL_TIMEOUT = 60
+
+# (offset, signature, mime type, Evidence.file_type)
+SIGNATURES = (
+    (0, b"\xff\xd8\xff", "image/jpeg", "image"),
+    (0, b"\x89PNG\r\n\x1a\n", "image/png", "image"),
+    (0, b"GIF87a", "image/gif", "image"),
+    (0, b"GIF89a", "image/gif", "image"),
+    (0, b"II*\x00", "image/tiff", "image"),
+    (0, b"MM\x00*", "image/tiff", "image"),
+    (0, b"%PDF-", "application/pdf", "pdf"),
+    (0, b"\x1aE\xdf\xa3", "video/webm", "video"),
+    (0, b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1", "application/msword", "doc"),
+    (0, b"{\\rtf", "application/rtf", "doc"),
+    (8, b"WEBP", "image/webp", "image"),
+    (8, b"AVI ", "video/x-msvideo", "video"),
+)
+
+# ISO base media brands (bytes 8-12 after "ftyp") that are not plain MP4 video.
+FTYP_BRANDS = {
+    b"qt  ": ("video/quicktime", "video"),
+    b"heic": ("image/heic", "image"),
+    b"heix": ("image/heic", "image"),
+    b"mif1": ("image/heif", "image"),
+    b"avif": ("image/avif", "image"),
+    b"M4A ": ("audio/mp4", "other"),
+}
+
+# EXIF tags kept in Evidence.metadata. Everything else is dropped: GPS
+# position, serial numbers, owner names and free-form comments can identify
+# the person who took the photo.
+EXIF_TAGS = frozenset({
+    "Make", "Model", "LensMake", "LensModel", "Software", "Orientation",
+    "DateTime", "DateTimeOriginal", "DateTimeDigitized", "OffsetTimeOriginal",
+    "ExposureTime", "FNumber", "ISOSpeedRatings", "FocalLength", "Flash",
+    "ExifImageWidth", "ExifImageHeight", "ColorSpace", "XResolution", "YResolution",
+})
+
+# Directory prefixes inside a zip that identify office documents.
+OFFICE_PREFIXES = ("word/", "xl/", "ppt/")
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def worker_count():
+    return getattr(settings, "EVIDENCE_PROCESSING_WORKERS", 2)
+
+
+def preview_size():
+    return getattr(settings, "EVIDENCE_PREVIEW_SIZE", 320)
+
+
+def sniff(head, path=None):
+    """
+    Return ``(mime, file_type)`` for a file starting with ``head``, or
+    ``(None, None)`` if the signature is not recognised.
+    """
+    for offset, signature, mime, file_type in SIGNATURES:
+        if head[offset:offset + len(signature)] == signature:
+            return mime, file_type
+    if head[4:8] == b"ftyp":
+        return FTYP_BRANDS.get(head[8:12], ("video/mp4", "video"))
+    if head.startswith(b"PK\x03\x04") and path is not None:
+        try:
+            with zipfile.ZipFile(path) as archive:
+                names = archive.namelist()
+        except zipfile.BadZipFile:
+            return None, None
+        if any(name.startswith(OFFICE_PREFIXES) for name in names) or "mimetype" in names:
+            return "application/vnd.openxmlformats-officedocument", "doc"
+        return "application/zip", "other"
+    return None, None
+
+
+def _scratch_dir(preview_path):
+    # Temporary output goes next to the preview so publishing is a rename.
+    directory = os.path.dirname(preview_path)
+    os.makedirs(directory, exist_ok=True)
+    return directory
+
+
+def _publish(source, preview_path):
+    # Rename into place so a concurrent reader never sees half a JPEG.
+    os.replace(source, preview_path)
+
+
+def _save_jpeg(img, preview_path):
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+    fd, tmp = tempfile.mkstemp(suffix=".jpg", dir=_scratch_dir(preview_path))
+    with os.fdopen(fd, "wb") as fh:
+        img.save(fh, "JPEG", quality=80, optimize=True)
+    _publish(tmp, preview_path)
+
+
+def _json_value(value):
+    from PIL.TiffImagePlugin import IFDRational
+
+    if isinstance(value, IFDRational):
+        return float(value) if value.denominator else None
+    if isinstance(value, (bool, int, float)):
+        return value
+    if isinstance(value, str):
+        return value.strip("\x00 ")[:MAX_EXIF_STRING] or None
+    if isinstance(value, tuple):
+        items = [_json_value(item) for item in value]
+        return items if None not in items else None
+    return None  # raw bytes such as MakerNote
+
+
+def _exif(img):
+    from PIL import ExifTags
+
+    exif = img.getexif()
+    tags = dict(exif)
+    tags.update(exif.get_ifd(ExifTags.IFD.Exif))
+    result = {}
+    for tag, value in tags.items():
+        name = ExifTags.TAGS.get(tag)
+        if name not in EXIF_TAGS:
+            continue
+        value = _json_value(value)
+        if value is not None:
+            result[name] = value
+    return result
+
+
+def _image_info(path, mime, preview_path):
+    from PIL import Image, ImageOps
+
+    with Image.open(path) as img:
+        info = {"width": img.width, "height": img.height, "format": img.format}
+        if getattr(img, "n_frames", 1) > 1:
+            info["frames"] = img.n_frames
+        exif = _exif(img)
+        if exif:
+            info["exif"] = exif
+        if preview_path:
+            size = preview_size()
+            # Lets JPEG decode straight to a reduced scale.
+            img.draft("RGB", (size, size))
+            thumb = ImageOps.exif_transpose(img)
+            thumb.thumbnail((size, size))
+            _save_jpeg(thumb, preview_path)
+    return info
+
+
+def _pdf_page_count(path):
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        PdfReader = None
+    if PdfReader is not None:
+        return len(PdfReader(path).pages)
+    if shutil.which("pdfinfo"):
+        result = subprocess.run(
+            ["pdfinfo", path], capture_output=True, text=True, timeout=TOOL_TIMEOUT, check=True
+        )
+        for line in result.stdout.splitlines():
+            if line.startswith("Pages:"):
+                return int(line.split(":", 1)[1])
+    return None
+
+
+def _pdf_info(path, mime, preview_path):
+    info = {}
+    pages = _pdf_page_count(path)
+    if pages is not None:
+        info["pages"] = pages
+    if preview_path and shutil.which("pdftoppm"):
+        with tempfile.TemporaryDirectory(dir=_scratch_dir(preview_path)) as tmp:
+            out = os.path.join(tmp, "page")
+            subprocess.run(
+                ["pdftoppm", "-f", "1", "-l", "1", "-singlefile", "-jpeg",
+                 "-scale-to", str(preview_size()), path, out],
+                capture_output=True, timeout=TOOL_TIMEOUT, check=True,
+            )
+            _publish(out + ".jpg", preview_path)
+    return info
+
+
+def _boxes(fh, end):
+    """
+    Yield ``(type, body_start, box_end)`` for ISO base media boxes up to ``end``.
+    """
+    while fh.tell() + 8 <= end:
+        start = fh.tell()
+        size, kind = struct.unpack(">I4s", fh.read(8))
+        header = 8
+        if size == 1:
+            size = struct.unpack(">Q", fh.read(8))[0]
+            header = 16
+        elif size == 0:
+            size = end - start
+        if size < header:
+            return
+        yield kind, start + header, start + size
+        fh.seek(start + size)
+
+
+def _mp4_info(path):
+    info = {}
+    with open(path, "rb") as fh:
+        end = os.fstat(fh.fileno()).st_size
+        # moov is often at the end; walking the top level only reads headers.
+        for kind, body, moov_end in _boxes(fh, end):
+            if kind != b"moov":
+                continue
+            fh.seek(body)
+            for child, body, box_end in _boxes(fh, moov_end):
+                if child == b"mvhd":
+                    fh.seek(body)
+                    version = fh.read(1)[0]
+                    if version == 1:
+                        fh.seek(body + 20)
+                        timescale, duration = struct.unpack(">IQ", fh.read(12))
+                    else:
+                        fh.seek(body + 12)
+                        timescale, duration = struct.unpack(">II", fh.read(8))
+                    if timescale:
+                        info["duration"] = round(duration / timescale, 3)
+                elif child == b"trak" and "width" not in info:
+                    fh.seek(body)
+                    for track_kind, _, track_end in _boxes(fh, box_end):
+                        if track_kind == b"tkhd":
+                            # Width and height close the box as 16.16 fixed point.
+                            fh.seek(track_end - 8)
+                            width, height = struct.unpack(">II", fh.read(8))
+                            if width and height:
+                                info["width"], info["height"] = width >> 16, height >> 16
+                            break
+            break
+    return info
+
+
+def _video_info(path, mime, preview_path):
+    info = _mp4_info(path) if mime in ("video/mp4", "video/quicktime") else {}
+    if preview_path and shutil.which("ffmpeg"):
+        fd, tmp = tempfile.mkstemp(suffix=".jpg", dir=_scratch_dir(preview_path))
+        os.close(fd)
+        try:
+            subprocess.run(
+                ["ffmpeg", "-v", "error", "-y", "-i", path, "-frames:v", "1",
+                 "-vf", f"scale={preview_size()}:-2", tmp],
+                capture_output=True, timeout=TOOL_TIMEOUT, check=True,
+            )
+            if os.path.getsize(tmp):
+                _publish(tmp, preview_path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+    return info
+
+
+EXTRACTORS = {
+    "image": _image_info,
+    "pdf": _pdf_info,
+    "video": _video_info,
+}
+
+
+def preview_name(evidence):
+    key = evidence.blob.sha256 if evidence.blob_id else f"evidence-{evidence.pk}"
+    return f"{PREVIEW_DIR}/{key[:2]}/{key}.jpg"
+
+
+def process_evidence(evidence_id):
+    """
+    Inspect one evidence file and store what was found. Runs as a job or in
+    the command's pool, but can be called directly too. Returns the updated
+    fields, or None if the evidence has gone.
+    """
+    evidence = Evidence.objects.select_related("blob").filter(pk=evidence_id).first()
+    if evidence is None or not evidence.file:
+        return None
+
+    path = default_storage.path(evidence.file.name)
+    with open(path, "rb") as fh:
+        head = fh.read(SNIFF_BYTES)
+    mime, file_type = sniff(head, path)
+
+    metadata = {"mime": mime} if mime else {}
+    name = preview_name(evidence)
+    preview_path = default_storage.path(name)
+    extractor = EXTRACTORS.get(file_type)
+    if extractor is not None:
+        try:
+            # An existing preview for this digest is reused as is.
+            metadata.update(extractor(path, mime, None if os.path.exists(preview_path) else preview_path))
+        except Exception as exc:
+            logger.warning("Could not process evidence %s: %s", evidence.pk, exc)
+            metadata["error"] = str(exc)[:MAX_EXIF_STRING]
+
+    fields = {"metadata": metadata, "processed_at": timezone.now()}
+    if file_type and file_type != evidence.file_type:
+        fields["file_type"] = file_type
+    if os.path.exists(preview_path):
+        fields["preview"] = name
+    Evidence.objects.filter(pk=evidence.pk).update(**fields)
+    return fields
+
+
+def executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=worker_count(),
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=django.setup,
+            )
+        return _executor
+
+
+def schedule(evidence_id):
+    """
+    Queue ``evidence_id`` for processing. The job row is written in the
+    caller's transaction, so it only runs if the upload commits.
+    """
+    jobs.enqueue("process_evidence", {"evidence_id": evidence_id})
@@ -0,0 +1,154 @@
+"""
+Delta autosave and version history for deposition content.
+
+The editor sends only its edits, as a list of ``[position, delete, insert]``
+splices applied in order (positions count Unicode code points), together
+with the version it started from. ``autosave`` applies them and bumps
+``Deposition.version`` with a conditional UPDATE, so two tabs editing the
+same deposition cannot silently overwrite each other. The loser gets an
+``EditConflict`` carrying the current version and has to reload.
+
+Every version is kept as a ``DepositionRevision`` holding the compressed
+splices, plus a full compressed snapshot every ``DEPOSITION_SNAPSHOT_INTERVAL``
+versions. ``rebuild`` starts from the nearest snapshot, so no version is more
+than an interval's worth of deltas away. Content saved any other way (the
+admin, say) bypasses the history.
+"""
+import json
+import zlib
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, IntegerField, Value, When
+from django.utils import timezone
+
+from .models import Deposition, DepositionEvidence, DepositionRevision
+
+MAX_OPS = 1000
+
+
+class DeltaError(ValueError):
+    pass
+
+
+class EditConflict(Exception):
+    def __init__(self, version):
+        super().__init__(f"The deposition was changed elsewhere; it is now at version {version}.")
+        self.version = version
+
+
+def snapshot_interval():
+    return getattr(settings, "DEPOSITION_SNAPSHOT_INTERVAL", 50)
+
+
+def _pack(value):
+    return zlib.compress(json.dumps(value, separators=(",", ":")).encode())
+
+
+def _unpack(data):
+    return json.loads(zlib.decompress(bytes(data)))
+
+
+def apply_ops(text, ops):
+    """
+    Apply ``[position, delete, insert]`` splices to ``text`` in order.
+    """
+    if not isinstance(ops, list) or len(ops) > MAX_OPS:
+        raise DeltaError(f"ops must be a list of at most {MAX_OPS} splices.")
+    for op in ops:
+        try:
+            position, delete, insert = op
+        except (TypeError, ValueError):
+            raise DeltaError("Each op must be [position, delete, insert].") from None
+        if not (isinstance(position, int) and isinstance(delete, int) and isinstance(insert, str)):
+            raise DeltaError("Each op must be [int, int, str].")
+        if position < 0 or delete < 0 or position + delete > len(text):
+            raise DeltaError(f"Op {op!r} is outside the text ({len(text)} characters).")
+        text = text[:position] + insert + text[position + delete:]
+    return text
+
+
+def autosave(deposition_id, base_version, ops, author=None):
+    """
+    Apply ``ops`` to the content at ``base_version`` and return the new
+    version. Raises ``EditConflict`` if the deposition has moved on.
+    """
+    with transaction.atomic():
+        current = Deposition.objects.filter(pk=deposition_id).values_list("content", "version").get()
+        content, version = current
+        if version != base_version:
+            raise EditConflict(version)
+        new_content = apply_ops(content, ops)
+        new_version = version + 1
+
+        updated = Deposition.objects.filter(pk=deposition_id, version=base_version).update(
+            content=new_content, version=new_version, updated_at=timezone.now()
+        )
+        if not updated:
+            raise EditConflict(Deposition.objects.values_list("version", flat=True).get(pk=deposition_id))
+
+        revisions = []
+        if not DepositionRevision.objects.filter(deposition_id=deposition_id).exists():
+            # First autosave: keep what was there before as the root snapshot.
+            revisions.append(DepositionRevision(
+                deposition_id=deposition_id, version=version, snapshot=_pack(content), author=author
+            ))
+        revisions.append(DepositionRevision(
+            deposition_id=deposition_id,
+            version=new_version,
+            delta=_pack(ops),
+            snapshot=_pack(new_content) if new_version % snapshot_interval() == 0 else None,
+            author=author,
+        ))
+        DepositionRevision.objects.bulk_create(revisions)
+    return new_version
+
+
+def rebuild(deposition_id, version):
+    """
+    Content of ``deposition_id`` as it was at ``version``.
+    """
+    base = (
+        DepositionRevision.objects.filter(deposition_id=deposition_id, version__lte=version, snapshot__isnull=False)
+        .order_by("-version")
+        .values_list("version", "snapshot")
+        .first()
+    )
+    if base is None:
+        raise DepositionRevision.DoesNotExist(f"No history for version {version}.")
+    base_version, snapshot = base
+    text = _unpack(snapshot)
+    deltas = (
+        DepositionRevision.objects.filter(
+            deposition_id=deposition_id, version__gt=base_version, version__lte=version
+        )
+        .order_by("version")
+        .values_list("version", "delta")
+    )
+    expected = base_version + 1
+    for number, delta in deltas:
+        if number != expected:
+            raise DepositionRevision.DoesNotExist(f"Revision {expected} is missing.")
+        text = apply_ops(text, _unpack(delta))
+        expected += 1
+    if expected != version + 1:
+        raise DepositionRevision.DoesNotExist(f"Revision {expected} is missing.")
+    return text
+
+
+def reorder_exhibits(deposition, evidence_ids):
+    """
+    Set exhibit order to the position of each evidence id in ``evidence_ids``
+    with a single UPDATE. The ids must be exactly the deposition's evidence.
+    """
+    placed = set(DepositionEvidence.objects.filter(deposition=deposition).values_list("evidence_id", flat=True))
+    if len(evidence_ids) != len(placed) or set(evidence_ids) != placed:
+        raise ValueError("The new order must list every exhibit of the deposition exactly once.")
+    if not evidence_ids:
+        return 0
+    return DepositionEvidence.objects.filter(deposition=deposition).update(
+        order=Case(
+            *[When(evidence_id=evidence_id, then=Value(position)) for position, evidence_id in enumerate(evidence_ids)],
+            output_field=IntegerField(),
+        )
+    )
@@ -0,0 +1,190 @@
+"""
+Full-text search over petitions.
+
+On SQLite the petition table is mirrored into an FTS5 index
+(``core_petition_fts``) that is kept in sync by triggers, so every write path
+(``save()``, ``QuerySet.update()``, ``bulk_create()``) updates it. Other
+database backends fall back to a plain ``icontains`` search.
+"""
+import re
+
+from django.db import connection
+from django.db.models import FloatField, Lookup, Q, TextField
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+FTS_TABLE = "core_petition_fts"
+
+# Control characters mark the snippet highlight boundaries until the snippet
+# has been escaped. User text could contain them too, so ``highlight`` only
+# honours complete pairs and drops any stray ones.
+_MARK_START = "\x02"
+_MARK_END = "\x03"
+_MARKED_RE = re.compile(f"{_MARK_START}([^{_MARK_START}{_MARK_END}]*){_MARK_END}")
+_STRAY_MARK_RE = re.compile(f"[{_MARK_START}{_MARK_END}]")
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+# Title matches weigh more than description or category matches.
+_RANK_SQL = f"bm25({FTS_TABLE}, 10.0, 1.0, 2.0)"
+
+# Sort key of ranked results, used by keyset pagination.
+RANK_ORDERING = ("search_rank", "id")
+
+
+class FullTextField(TextField):
+    """
+    The hidden column an FTS5 table has under its own name, the left-hand
+    side of ``MATCH`` (see ``PetitionSearchEntry``).
+    """
+
+
+@FullTextField.register_lookup
+class Match(Lookup):
+    lookup_name = "match"
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f"{lhs} MATCH {rhs}", [*lhs_params, *rhs_params]
+
+
+_INSTALL_SQL = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        title, description, category,
+        content='core_petition', content_rowid='id',
+        tokenize='porter unicode61'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON core_petition BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, description, category)
+        VALUES (new.id, new.title, new.description, new.category);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON core_petition BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description, category)
+        VALUES ('delete', old.id, old.title, old.description, old.category);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF title, description, category ON core_petition
+    WHEN old.title IS NOT new.title
+      OR old.description IS NOT new.description
+      OR old.category IS NOT new.category
+    BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description, category)
+        VALUES ('delete', old.id, old.title, old.description, old.category);
+        INSERT INTO {FTS_TABLE}(rowid, title, description, category)
+        VALUES (new.id, new.title, new.description, new.category);
+    END
+    """,
+]
+
+
+def is_supported(conn=None):
+    return (conn or connection).vendor == "sqlite"
+
+
+def install(conn=None, rebuild=False):
+    """
+    Create the FTS table and its sync triggers if they are missing.
+
+    SQLite drops triggers whenever a migration rebuilds ``core_petition``,
+    so this runs after every ``migrate`` (see ``CoreConfig.ready``) rather
+    than once from a migration. The index is rebuilt from the petition table
+    when it is first created or when ``rebuild`` is requested.
+    """
+    conn = conn or connection
+    if not is_supported(conn):
+        return
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE name = %s", [FTS_TABLE])
+        created = cursor.fetchone() is None
+        for statement in _INSTALL_SQL:
+            cursor.execute(statement)
+        if created or rebuild:
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def build_match_query(query):
+    """
+    Turn free text into a safe FTS5 MATCH expression.
+
+    Every word is quoted so operators and stray quotes in user input cannot
+    raise syntax errors, and the last word is a prefix match so results
+    update while the user is still typing.
+    """
+    tokens = _TOKEN_RE.findall(query or "")
+    if not tokens:
+        return ""
+    terms = [f'"{token}"' for token in tokens]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+def search_petitions(queryset, query):
+    """
+    Filter a petition queryset down to rows matching ``query``.
+
+    On SQLite the result is ordered by BM25 relevance (best first) and every
+    row carries ``search_rank`` and a raw ``search_snippet``; pass the latter
+    through :func:`highlight` before rendering it.
+    """
+    query = (query or "").strip()
+    if not query:
+        return queryset
+
+    if not is_supported():
+        return queryset.filter(
+            Q(title__icontains=query)
+            | Q(description__icontains=query)
+            | Q(category__icontains=query)
+        )
+
+    match = build_match_query(query)
+    if not match:
+        return queryset.none()
+
+    # The FTS table is joined through PetitionSearchEntry, so bm25() and
+    # snippet() can name it.
+    return (
+        queryset.filter(search_entry__document__match=match)
+        .annotate(
+            search_rank=RawSQL(_RANK_SQL, [], output_field=FloatField()),
+            search_snippet=RawSQL(
+                f"snippet({FTS_TABLE}, 1, '{_MARK_START}', '{_MARK_END}', '…', 24)", [], output_field=TextField()
+            ),
+        )
+        .order_by("search_rank", "id")
+    )
+
+
+def is_ranked(queryset):
+    return "search_rank" in queryset.query.annotations
+
+
+def seek(queryset, position):
+    """
+    Filter ranked results to rows after ``position`` (a ``[rank, id]`` pair).
+    """
+    rank, pk = float(position[0]), int(position[1])
+    return queryset.filter(Q(search_rank__gt=rank) | Q(search_rank=rank, id__gt=pk))
+
+
+def highlight(snippet):
+    """
+    Escape a raw FTS snippet and wrap the matched terms in ``<mark>``.
+    """
+    if not snippet:
+        return ""
+    # Odd parts are the marked terms; stray markers elsewhere are dropped.
+    parts = _MARKED_RE.split(snippet)
+    html = "".join(
+        f"<mark>{escape(part)}</mark>" if index % 2 else escape(_STRAY_MARK_RE.sub("", part))
+        for index, part in enumerate(parts)
+    )
+    return mark_safe(html)
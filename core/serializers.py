@@ -1,5 +1,7 @@
+from django.urls import reverse
 from rest_framework import serializers
-from .models import User, Evidence, Petition, ConsultationSlot, ConsultationBooking, Deposition
+from .models import User, Evidence, Petition, ConsultationSlot, ConsultationBooking, Deposition, UploadSession
+from .search import highlight
 
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
@@ -21,12 +23,34 @@ class RegisterSerializer(serializers.ModelSerializer):
         u.save()
         return u
 
+class EvidenceFileField(serializers.FileField):
+    """
+    Takes the uploaded file, but shows the authenticated download URL
+    instead of where the file is stored.
+    """
+
+    def to_representation(self, value):
+        if not value:
+            return None
+        url = reverse("evidence_download", args=[value.instance.pk])
+        request = self.context.get("request")
+        return request.build_absolute_uri(url) if request is not None else url
+
 class EvidenceSerializer(serializers.ModelSerializer):
     uploader = UserSerializer(read_only=True)
+    file = EvidenceFileField()
     class Meta:
         model = Evidence
-        fields = "__all__"
-        read_only_fields = ("uploader","uploaded_at","size_bytes")
+        # Nested in the public petition API, so processing output (metadata,
+        # preview) and storage details (blob) stay out.
+        fields = ("id","uploader","file","title","file_type","case_tag","uploaded_at","size_bytes","verification_status")
+        read_only_fields = ("uploader","uploaded_at","size_bytes","verification_status")
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = UploadSession
+        fields = ("id", "title", "file_type", "case_tag", "filename", "total_size", "offset", "sha256", "evidence", "created_at")
+        read_only_fields = ("offset", "sha256", "evidence", "created_at")
 
 class PetitionSerializer(serializers.ModelSerializer):
     creator = UserSerializer(read_only=True)
@@ -39,13 +63,20 @@ class PetitionSerializer(serializers.ModelSerializer):
 class PetitionCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Petition
-        fields = ("title","description","category","visibility")
+        fields = ("id","title","description","category","visibility")
 
 class ConsultationSlotSerializer(serializers.ModelSerializer):
     class Meta:
         model = ConsultationSlot
         fields = "__all__"
 
+class AvailableSlotSerializer(serializers.ModelSerializer):
+    lawyer = UserSerializer(read_only=True)
+
+    class Meta:
+        model = ConsultationSlot
+        fields = ("id", "lawyer", "start_time", "duration_minutes")
+
 class ConsultationBookingSerializer(serializers.ModelSerializer):
     class Meta:
         model = ConsultationBooking
@@ -59,7 +90,15 @@ class DepositionSerializer(serializers.ModelSerializer):
 class PetitionListSerializer(serializers.ModelSerializer):
     creator = UserSerializer(read_only=True)
     evidences = EvidenceSerializer(many=True, read_only=True)
+    # Annotated by counters.with_live_counts in PetitionViewSet.get_queryset.
+    supporter_count = serializers.IntegerField(source="live_supporter_count", read_only=True)
+    search_snippet = serializers.SerializerMethodField()
 
     class Meta:
         model = Petition
-        fields = ("id", "title", "description", "category", "visibility", "status", "creator", "supporter_count", "evidences")
+        fields = ("id", "title", "description", "category", "visibility", "status", "creator", "supporter_count", "evidences", "search_snippet")
+
+    def get_search_snippet(self, obj):
+        # Only present on rows returned by a ?search= query.
+        snippet = getattr(obj, "search_snippet", None)
+        return str(highlight(snippet)) if snippet else None
@@ -0,0 +1,79 @@
+"""
+Signal handlers for the core app, connected in ``CoreConfig.ready``.
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import blobs, board_cache, summary
+from .counters import supporter_counts_flushed
+from .models import ConsultationSlot, Evidence, Petition
+
+
+# Connected before invalidate_board_on_save, which records the new status.
+@receiver(post_save, sender=Petition)
+def count_petition_on_save(sender, instance, created, **kwargs):
+    if created:
+        summary.petition_changed(instance.creator_id, None, instance.status)
+    elif getattr(instance, "_loaded_status", None) is not None:
+        summary.petition_changed(instance.creator_id, instance._loaded_status, instance.status)
+
+
+@receiver(post_save, sender=Petition)
+def invalidate_board_on_save(sender, instance, created, **kwargs):
+    # Publishing, editing a published petition and unpublishing all change the board.
+    was_published = getattr(instance, "_loaded_status", None) == "published"
+    if instance.status == "published" or was_published:
+        transaction.on_commit(board_cache.invalidate)
+    instance._loaded_status = instance.status
+
+
+@receiver(post_delete, sender=Petition)
+def invalidate_board_on_delete(sender, instance, **kwargs):
+    if instance.status == "published":
+        transaction.on_commit(board_cache.invalidate)
+    summary.petition_changed(instance.creator_id, getattr(instance, "_loaded_status", None) or instance.status, None)
+
+
+@receiver(supporter_counts_flushed)
+def invalidate_board_on_count_drift(sender, changes, **kwargs):
+    board_cache.record_supporter_changes(changes)
+
+
+@receiver(post_delete, sender=Evidence)
+def release_evidence_blob(sender, instance, **kwargs):
+    if instance.blob_id:
+        blobs.release(instance.blob_id)
+
+
+@receiver(post_save, sender=Evidence)
+def count_evidence_on_save(sender, instance, created, **kwargs):
+    if created:
+        summary.evidence_changed(instance.uploader_id, None, instance.verification_status)
+    elif getattr(instance, "_loaded_verification_status", None) is not None:
+        summary.evidence_changed(
+            instance.uploader_id, instance._loaded_verification_status, instance.verification_status
+        )
+    instance._loaded_verification_status = instance.verification_status
+
+
+@receiver(post_delete, sender=Evidence)
+def count_evidence_on_delete(sender, instance, **kwargs):
+    state = getattr(instance, "_loaded_verification_status", None) or instance.verification_status
+    summary.evidence_changed(instance.uploader_id, state, None)
+
+
+@receiver(post_save, sender=ConsultationSlot)
+def count_slot_on_save(sender, instance, created, **kwargs):
+    state = (instance.lawyer_id, instance.start_time, instance.is_booked)
+    if created:
+        summary.slots_changed(after=[state])
+    elif getattr(instance, "_loaded_slot", state) != state:
+        summary.slots_changed(before=[instance._loaded_slot], after=[state])
+    instance._loaded_slot = state
+
+
+@receiver(post_delete, sender=ConsultationSlot)
+def count_slot_on_delete(sender, instance, **kwargs):
+    state = getattr(instance, "_loaded_slot", (instance.lawyer_id, instance.start_time, instance.is_booked))
+    summary.slots_changed(before=[state])
@@ -0,0 +1,130 @@
+"""
+Consultation availability search and recurring slot generation.
+
+``available_slots`` answers "which slots are free between these times" with
+a range scan on the ``(is_booked, start_time, lawyer)`` index, merged with
+the few slots whose hold expired (from the partial ``held_until`` index).
+The database narrows by start time. Whether each slot also *ends* inside the window
+depends on its own ``duration_minutes``, so that check runs on the few rows
+the range returns.
+
+``generate_recurring`` expands a weekly schedule ("weekdays 10:00-16:00 in
+30 minute slots") into slots, skips any that would overlap slots the lawyer
+already has, and writes the rest with ``bulk_create``, moving the lawyer's
+dashboard counts (core/summary.py) in the same transaction.
+"""
+import bisect
+import heapq
+from datetime import datetime, timedelta
+
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from . import summary
+from .bookings import claimable
+from .models import ConsultationSlot
+
+MAX_WINDOW = timedelta(days=31)
+MAX_RESULTS = 500
+MAX_SCHEDULE_DAYS = 366
+BULK_BATCH_SIZE = 500
+
+
+def available_slots(start, end, lawyer=None, min_duration=None, now=None):
+    """
+    Free slots that start and finish within ``[start, end)``, earliest first.
+    """
+    now = now or timezone.now()
+    start = max(start, now)
+    if end <= start:
+        return []
+
+    def matching(condition):
+        slots = (
+            ConsultationSlot.objects.filter(condition, start_time__gte=start, start_time__lt=end)
+            .select_related("lawyer")
+            .order_by("start_time", "id")
+        )
+        if lawyer is not None:
+            slots = slots.filter(lawyer=lawyer)
+        if min_duration:
+            slots = slots.filter(duration_minutes__gte=min_duration)
+        return slots.iterator(chunk_size=MAX_RESULTS)
+
+    results = []
+    merged = heapq.merge(*map(matching, claimable(now)), key=lambda slot: (slot.start_time, slot.pk))
+    for slot in merged:
+        if slot.start_time + timedelta(minutes=slot.duration_minutes) <= end:
+            results.append(slot)
+            if len(results) == MAX_RESULTS:
+                break
+    return results
+
+
+def _merged(intervals):
+    # Union of overlapping (start, end) intervals, sorted by start.
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start < merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def generate_recurring(lawyer, first_day, last_day, weekdays, day_start, day_end, minutes, tz=None):
+    """
+    Create ``minutes``-long slots for ``lawyer`` on each of ``weekdays``
+    (Monday is 0) between ``first_day`` and ``last_day`` inclusive, from
+    ``day_start`` to ``day_end`` local time in ``tz``. Slots that would
+    overlap an existing slot of the lawyer, or that already started, are
+    skipped. Returns ``(created, skipped)``.
+    """
+    tz = tz or timezone.get_current_timezone()
+    length = timedelta(minutes=minutes)
+    if minutes <= 0 or not (day_start < day_end):
+        raise ValueError("The day must start before it ends and slots need a positive length.")
+    if (last_day - first_day).days > MAX_SCHEDULE_DAYS:
+        raise ValueError(f"Schedules are limited to {MAX_SCHEDULE_DAYS} days.")
+
+    candidates = []
+    day = first_day
+    while day <= last_day:
+        if day.weekday() in weekdays:
+            slot_start = timezone.make_aware(datetime.combine(day, day_start), tz)
+            day_close = timezone.make_aware(datetime.combine(day, day_end), tz)
+            while slot_start + length <= day_close:
+                candidates.append(slot_start)
+                slot_start += length
+        day += timedelta(days=1)
+    if not candidates:
+        return 0, 0
+
+    # One query for everything that could overlap the schedule.
+    existing_slots = ConsultationSlot.objects.filter(lawyer=lawyer)
+    longest = existing_slots.aggregate(longest=Max("duration_minutes"))["longest"] or 0
+    existing = _merged(
+        (slot_start, slot_start + timedelta(minutes=duration))
+        for slot_start, duration in existing_slots.filter(
+            start_time__gte=candidates[0] - timedelta(minutes=longest),
+            start_time__lt=candidates[-1] + length,
+        ).values_list("start_time", "duration_minutes")
+    )
+    starts = [interval[0] for interval in existing]
+
+    now = timezone.now()
+    new_slots = []
+    for slot_start in candidates:
+        slot_end = slot_start + length
+        # Merged intervals don't overlap, so only the one starting just
+        # before slot_end can collide.
+        i = bisect.bisect_left(starts, slot_end)
+        if slot_start <= now or (i and existing[i - 1][1] > slot_start):
+            continue
+        new_slots.append(ConsultationSlot(lawyer=lawyer, start_time=slot_start, duration_minutes=minutes))
+
+    with transaction.atomic():
+        ConsultationSlot.objects.bulk_create(new_slots, batch_size=BULK_BATCH_SIZE)
+        summary.slots_changed(after=[(lawyer.pk, slot.start_time, False) for slot in new_slots])
+    return len(new_slots), len(candidates) - len(new_slots)
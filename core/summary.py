@@ -0,0 +1,249 @@
+"""
+Materialized dashboard counters.
+
+The dashboards show per-user and site-wide numbers:
+- petitions per status
+- evidence per verification state
+- upcoming consultation slots, open and booked
+- the size of the moderation queue, which is the site-wide pending petitions
+
+Counting querysets for these on every page load grows with the data. Instead
+each number is a ``DashboardCounter`` row, moved by a delta whenever the
+underlying rows change. Every delta applies to the owner's row and to the
+site-wide row, in one transaction.
+
+Model saves and deletes are covered by signal handlers (core/signals.py),
+which compare against the state the instance was loaded with. Code that
+changes rows with ``QuerySet.update()`` or ``bulk_create()`` calls the hooks
+here directly: the booking steps in core/bookings.py and recurring slot
+generation in core/slots.py. Slot counters are kept per local day, so
+"upcoming" is simply the days from today on. A read costs one indexed query
+for a handful of rows, however large the tables or the queue get.
+
+``reconcile`` rebuilds every counter from the source tables and drops past
+days. It runs from ``manage.py reconcile_dashboard_counters`` and as a
+recurring background job every ``DASHBOARD_RECONCILE_INTERVAL`` seconds,
+which ``run_jobs`` queues at startup. It repairs anything the hooks missed
+(raw SQL, bulk loads, crashes mid-request).
+"""
+from collections import Counter
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from . import jobs
+from .models import ConsultationSlot, DashboardCounter, Evidence, Job, Petition
+
+PETITION_STATUSES = ("draft", "pending", "published", "rejected")
+EVIDENCE_STATES = ("pending", "verified", "rejected")
+RECONCILE_JOB = "reconcile_dashboard_counters"
+
+
+def reconcile_interval():
+    return getattr(settings, "DASHBOARD_RECONCILE_INTERVAL", 3600)
+
+
+def petition_key(status):
+    return f"petitions.{status}"
+
+
+def evidence_key(state):
+    return f"evidence.{state}"
+
+
+def slot_key(is_booked, start_time):
+    day = timezone.localdate(start_time) if timezone.is_aware(start_time) else start_time.date()
+    return f"slots.{'booked' if is_booked else 'open'}.{day.isoformat()}"
+
+
+def apply(changes):
+    """
+    Add ``{(user_id, key): delta}`` to the owners' counters and the same
+    deltas to the site-wide ones, in at most two upserts.
+    """
+    totals = Counter()
+    for (user_id, key), delta in changes.items():
+        totals[(user_id, key)] += delta
+        if user_id is not None:
+            totals[(None, key)] += delta
+    site_rows = sorted((key, delta) for (user_id, key), delta in totals.items() if user_id is None and delta)
+    user_rows = sorted((user_id, key, delta) for (user_id, key), delta in totals.items() if user_id is not None and delta)
+    table = DashboardCounter._meta.db_table
+    # Inside a caller's transaction this adds no savepoint.
+    with transaction.atomic(savepoint=False), connection.cursor() as cursor:
+        if site_rows:
+            cursor.execute(
+                f"INSERT INTO {table} (user_id, key, value) VALUES "
+                + ", ".join(["(NULL, %s, %s)"] * len(site_rows))
+                + f" ON CONFLICT (key) WHERE user_id IS NULL DO UPDATE SET value = {table}.value + excluded.value",
+                [param for row in site_rows for param in row],
+            )
+        if user_rows:
+            cursor.execute(
+                f"INSERT INTO {table} (user_id, key, value) VALUES "
+                + ", ".join(["(%s, %s, %s)"] * len(user_rows))
+                + f" ON CONFLICT (user_id, key) DO UPDATE SET value = {table}.value + excluded.value",
+                [param for row in user_rows for param in row],
+            )
+
+
+def petition_changed(creator_id, old_status, new_status):
+    """
+    A petition was created (``old_status`` None), deleted (``new_status``
+    None) or moved between statuses.
+    """
+    if old_status == new_status:
+        return
+    changes = Counter()
+    if old_status is not None:
+        changes[(creator_id, petition_key(old_status))] -= 1
+    if new_status is not None:
+        changes[(creator_id, petition_key(new_status))] += 1
+    apply(changes)
+
+
+def petitions_moved(moved, new_status):
+    """
+    Several petitions moved to ``new_status`` in one UPDATE. ``moved`` holds
+    ``(creator_id, old_status)`` for each of them.
+    """
+    changes = Counter()
+    for creator_id, old_status in moved:
+        if old_status != new_status:
+            changes[(creator_id, petition_key(old_status))] -= 1
+            changes[(creator_id, petition_key(new_status))] += 1
+    apply(changes)
+
+
+def evidence_changed(uploader_id, old_state, new_state):
+    """
+    Evidence was uploaded (``old_state`` None), deleted (``new_state`` None)
+    or verified / rejected.
+    """
+    if old_state == new_state:
+        return
+    changes = Counter()
+    if old_state is not None:
+        changes[(uploader_id, evidence_key(old_state))] -= 1
+    if new_state is not None:
+        changes[(uploader_id, evidence_key(new_state))] += 1
+    apply(changes)
+
+
+def slots_changed(before=(), after=()):
+    """
+    Move slot counts from the ``(lawyer_id, start_time, is_booked)`` states
+    in ``before`` to those in ``after``. A created slot only has an
+    ``after``, a deleted one only a ``before``.
+    """
+    changes = Counter()
+    for lawyer_id, start_time, is_booked in before:
+        changes[(lawyer_id, slot_key(is_booked, start_time))] -= 1
+    for lawyer_id, start_time, is_booked in after:
+        changes[(lawyer_id, slot_key(is_booked, start_time))] += 1
+    apply(changes)
+
+
+def _read(rows, today):
+    summary = {
+        "petitions": dict.fromkeys(PETITION_STATUSES, 0),
+        "evidence": dict.fromkeys(EVIDENCE_STATES, 0),
+        "slots": {"open": 0, "booked": 0},
+    }
+    today = today.isoformat()
+    for key, value in rows:
+        kind, name, *day = key.split(".")
+        if kind == "slots":
+            if day and day[0] >= today:
+                summary["slots"][name] = summary["slots"].get(name, 0) + value
+        elif kind in summary:
+            summary[kind][name] = value
+    return summary
+
+
+def for_user(user, today=None):
+    """
+    The counts for ``user``'s own petitions, evidence and slots.
+    """
+    rows = DashboardCounter.objects.filter(user=user).values_list("key", "value")
+    return _read(rows, today or timezone.localdate())
+
+
+def site(today=None):
+    """
+    The site-wide counts, including the moderation queue.
+    """
+    rows = DashboardCounter.objects.filter(user__isnull=True).values_list("key", "value")
+    summary = _read(rows, today or timezone.localdate())
+    summary["moderation_queue"] = summary["petitions"]["pending"]
+    return summary
+
+
+def _expected(today):
+    expected = Counter()
+
+    def add(owner, key, count):
+        expected[(owner, key)] += count
+        expected[(None, key)] += count
+
+    for creator_id, status, count in (
+        Petition.objects.values_list("creator", "status").annotate(n=Count("id")).order_by()
+    ):
+        add(creator_id, petition_key(status), count)
+    for uploader_id, state, count in (
+        Evidence.objects.values_list("uploader", "verification_status").annotate(n=Count("id")).order_by()
+    ):
+        add(uploader_id, evidence_key(state), count)
+    slots = (
+        ConsultationSlot.objects.filter(start_time__date__gte=today)
+        .annotate(day=TruncDate("start_time"))
+        .values_list("lawyer", "is_booked", "day")
+        .annotate(n=Count("id"))
+        .order_by()
+    )
+    for lawyer_id, is_booked, day, count in slots:
+        add(lawyer_id, f"slots.{'booked' if is_booked else 'open'}.{day.isoformat()}", count)
+    return expected
+
+
+def reconcile(today=None):
+    """
+    Rebuild every counter from the source tables and drop the ones for past
+    days or at zero. Returns how many counters were changed, not counting
+    zero ones that were only pruned.
+    """
+    today = today or timezone.localdate()
+    with transaction.atomic():
+        expected = _expected(today)
+        stored = {
+            (user_id, key): (pk, value)
+            for pk, user_id, key, value in DashboardCounter.objects.values_list("pk", "user", "key", "value")
+        }
+        stale = [(pk, value) for scope, (pk, value) in stored.items() if not expected.get(scope)]
+        changed = [
+            DashboardCounter(pk=stored[scope][0], value=value)
+            for scope, value in expected.items()
+            if scope in stored and value and stored[scope][1] != value
+        ]
+        missing = [
+            DashboardCounter(user_id=user_id, key=key, value=value)
+            for (user_id, key), value in expected.items()
+            if value and (user_id, key) not in stored
+        ]
+        for start in range(0, len(stale), 500):
+            DashboardCounter.objects.filter(pk__in=[pk for pk, _ in stale[start:start + 500]]).delete()
+        DashboardCounter.objects.bulk_update(changed, ["value"], batch_size=500)
+        DashboardCounter.objects.bulk_create(missing, batch_size=500)
+    # Rows that counted down to zero are pruned but weren't wrong.
+    return sum(1 for _, value in stale if value) + len(changed) + len(missing)
+
+
+def schedule_reconcile():
+    """
+    Queue the next reconcile job, unless one is already waiting.
+    """
+    if not Job.objects.filter(name=RECONCILE_JOB, status="queued").exists():
+        jobs.enqueue(RECONCILE_JOB, delay=reconcile_interval())
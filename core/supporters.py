@@ -0,0 +1,57 @@
+"""
+Supporting and un-supporting petitions.
+
+Each operation is one atomic insert-or-ignore (or delete) on ``Support``
+plus a sharded counter update (see ``core.counters``) that only runs when a
+row actually changed, so concurrent joins can neither double count nor
+contend on the petition row.
+"""
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import counters
+from .db import retry_on_busy
+from .models import Petition, Support
+
+
+@retry_on_busy
+def add_support(petition_id, user_id):
+    """
+    Record ``user_id`` as a supporter of ``petition_id``.
+
+    Returns True if a new support row was inserted and False if the user
+    already supported the petition or the petition does not exist.
+    """
+    now = connection.ops.adapt_datetimefield_value(timezone.now())
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            # INSERT ... SELECT skips a separate existence check for the petition.
+            cursor.execute(
+                f"INSERT INTO {Support._meta.db_table} (petition_id, user_id, created_at) "
+                f"SELECT id, %s, %s FROM {Petition._meta.db_table} WHERE id = %s "
+                f"ON CONFLICT (petition_id, user_id) DO NOTHING",
+                [user_id, now, petition_id],
+            )
+            inserted = cursor.rowcount == 1
+        if inserted:
+            counters.increment(petition_id, 1)
+    return inserted
+
+
+@retry_on_busy
+def remove_support(petition_id, user_id):
+    """
+    Withdraw ``user_id``'s support. Returns True if a support row was deleted.
+    """
+    with transaction.atomic():
+        deleted, _ = Support.objects.filter(petition_id=petition_id, user_id=user_id).delete()
+        if deleted:
+            counters.increment(petition_id, -1)
+    return bool(deleted)
+
+
+def supporter_count(petition_id):
+    """
+    Up-to-date count for a petition, including changes not yet flushed.
+    """
+    return counters.live_count(petition_id)
@@ -0,0 +1,40 @@
+"""
+Handlers for background jobs (see core/jobs.py). Imported by
+``CoreConfig.ready`` so every process knows them.
+"""
+from . import bookings, counters, depositions, jobs, processing, summary
+from .models import Deposition
+
+
+@jobs.handler("process_evidence")
+def process_evidence(evidence_id):
+    processing.process_evidence(evidence_id)
+
+
+@jobs.handler(counters.FLUSH_JOB)
+def flush_supporter_counts():
+    counters.flush()
+
+
+@jobs.handler("reconcile_supporter_counts", max_attempts=3)
+def reconcile_supporter_counts():
+    counters.reconcile()
+
+
+@jobs.handler("compile_deposition")
+def compile_deposition(deposition_id):
+    deposition = Deposition.objects.filter(pk=deposition_id).first()
+    if deposition is not None:
+        depositions.compile_deposition(deposition)
+
+
+@jobs.handler(bookings.RELEASE_JOB)
+def release_expired_holds():
+    bookings.release_expired_holds()
+    bookings.schedule_release()
+
+
+@jobs.handler(summary.RECONCILE_JOB, max_attempts=3)
+def reconcile_dashboard_counters():
+    summary.reconcile()
+    summary.schedule_reconcile()
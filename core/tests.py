@@ -1,3 +1,1904 @@
-from django.test import TestCase
+import base64
+import csv
+import hashlib
+import importlib
+import io
+import json
+import os
+import re
+import runpy
+import shutil
+import tempfile
+import threading
+import uuid
+from datetime import date, datetime, timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import CommandError, call_command
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, OperationalError, connection, connections
+from django.db.utils import ConnectionHandler
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from loadtest.report import compare, percentile, summarize
+
+from . import (
+    audit, audit_archive, blobs, board_cache, bookings, counters, dataset, depositions, jobs, metrics, processing,
+    revisions, summary, tasks,
+)
+from .models import (
+    AuditArchive, AuditLog, AuditRollup, ConsultationSlot, DashboardCounter, Deposition, DepositionEvidence,
+    DepositionRevision, Evidence, EvidenceBlob, EvidenceFragment, Job, Petition, Support, SupporterCountShard,
+    UploadSession, User,
+)
+from .pagination import InvalidCursor, decode_cursor, encode_cursor, paginate
+from .db import READ_ALIAS, ReadWriteRouter, retry_on_busy
+from .search import highlight, search_petitions
+from .slots import available_slots
+from .supporters import add_support, remove_support
+
+# A plan step that reads a whole table without any index, e.g.
+# "SCAN core_petition" (but not "SCAN core_petition USING INDEX ...").
+FULL_SCAN_RE = re.compile(r"^SCAN (\w+)(?: AS \w+)?$")
+# A plan step that sorts the rows it found, e.g. "USE TEMP B-TREE FOR ORDER BY"
+# or "... FOR RIGHT PART OF ORDER BY".
+TEMP_SORT_RE = re.compile(r"^USE TEMP B-TREE FOR (?:RIGHT PART OF |LAST \d+ TERMS OF )?ORDER BY$")
+
+TEST_STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+}
+
+
+@override_settings(STORAGES=TEST_STORAGES, SUPPORTER_COUNT_MAX_LAG=10 ** 9)
+class QueryPlanTests(TestCase):
+    """
+    Every SELECT a view runs, checked with EXPLAIN QUERY PLAN against a
+    seeded dataset, must reach its rows through an index.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        cls.admin = User.objects.create_user("admin", password="x", role="admin")
+        citizens = User.objects.bulk_create(
+            [User(username=f"citizen{i}", role="citizen") for i in range(50)]
+        )
+        lawyers = User.objects.bulk_create([User(username=f"lawyer{i}", role="lawyer") for i in range(10)])
+        cls.citizen, cls.lawyer = citizens[0], lawyers[0]
+
+        statuses = ["published", "published", "pending", "draft", "rejected"]
+        Petition.objects.bulk_create(
+            [
+                Petition(
+                    creator=citizens[i % len(citizens)],
+                    title=f"Petition {i} about water",
+                    description="Clean water for every district.",
+                    status=statuses[i % len(statuses)],
+                    visibility="private" if i % 7 == 0 else "public",
+                )
+                for i in range(3000)
+            ],
+            batch_size=500,
+        )
+        Evidence.objects.bulk_create(
+            [
+                Evidence(uploader=citizens[i % len(citizens)], file=f"evidence/e{i}.pdf", title=f"Exhibit {i}")
+                for i in range(3000)
+            ],
+            batch_size=500,
+        )
+        ConsultationSlot.objects.bulk_create(
+            [
+                ConsultationSlot(
+                    lawyer=lawyers[i % len(lawyers)],
+                    start_time=now + timedelta(minutes=30 * i),
+                    duration_minutes=30,
+                    is_booked=i % 3 == 0,
+                )
+                for i in range(2000)
+            ],
+            batch_size=500,
+        )
+        published = list(Petition.objects.filter(status="published").values_list("id", flat=True)[:200])
+        Support.objects.bulk_create(
+            [Support(petition_id=pid, user=user) for pid in published for user in citizens[:10]],
+            batch_size=500,
+        )
+        cls.petition = Petition.objects.filter(status="published", visibility="public").first()
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+    def setUp(self):
+        for alias in ("default", "board"):
+            caches[alias].clear()
+
+    def full_scans(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute("EXPLAIN QUERY PLAN " + sql)
+            plan = [row[-1] for row in cursor.fetchall()]
+        scans = [step for step in plan if FULL_SCAN_RE.match(step)]
+        # A page has to come off an index in order; sorting every matching
+        # row to return the first few undoes keyset pagination. Search
+        # results are ranked by relevance, which no index can provide.
+        if " LIMIT " in sql and " MATCH " not in sql:
+            scans += [step for step in plan if TEMP_SORT_RE.match(step)]
+        return scans
+
+    def assertIndexed(self, url, user=None, **params):
+        if user is not None:
+            self.client.force_login(user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertLess(response.status_code, 400, url)
+        selects = [q["sql"] for q in queries.captured_queries if q["sql"].lstrip().upper().startswith("SELECT")]
+        self.assertTrue(selects, f"{url} ran no queries")
+        for sql in selects:
+            self.assertEqual(self.full_scans(sql), [], f"{url} scans or sorts without an index:\n{sql}")
+        return response
+
+    def test_public_board(self):
+        self.assertIndexed("/justice-index/")
+
+    def test_public_board_next_page(self):
+        response = self.assertIndexed("/justice-index/")
+        cursor = response.context["petitions"].next_cursor
+        self.assertIndexed("/justice-index/", cursor=cursor)
+
+    def test_public_board_search(self):
+        self.assertIndexed("/justice-index/", q="water")
+
+    def test_petition_detail(self):
+        self.assertIndexed(f"/petitions/{self.petition.pk}/", user=self.citizen)
+
+    def test_api_list_anonymous(self):
+        self.assertIndexed("/api/petitions/")
+
+    def test_api_list_citizen(self):
+        self.assertIndexed("/api/petitions/", user=self.citizen)
+
+    def test_api_retrieve(self):
+        self.assertIndexed(f"/api/petitions/{self.petition.pk}/")
+
+    def test_citizen_dashboards(self):
+        self.assertIndexed("/dashboard/", user=self.citizen)
+        self.assertIndexed("/dashboard2/", user=self.citizen)
+
+    def test_lawyer_dashboards(self):
+        self.assertIndexed("/dashboard/", user=self.lawyer)
+        self.assertIndexed("/dashboard2/", user=self.lawyer)
+
+    def test_moderation_queue(self):
+        response = self.assertIndexed("/dashboard2/", user=self.admin)
+        self.assertIndexed("/dashboard2/", cursor=response.context["petitions"].next_cursor)
+
+    def test_petition_list(self):
+        self.assertIndexed("/petitions/", user=self.citizen)
+
+    def test_evidence_list(self):
+        self.assertIndexed("/evidences/", user=self.citizen)
+
+    def test_available_slots(self):
+        start = timezone.now() + timedelta(days=1)
+        self.assertIndexed(
+            "/api/slots/available/",
+            user=self.citizen,
+            start=start.isoformat(),
+            end=(start + timedelta(hours=6)).isoformat(),
+        )
+
+    def test_available_slots_without_statistics(self):
+        # A database nobody ran ANALYZE on still picks the indexes.
+        with connection.cursor() as cursor:
+            cursor.execute("DELETE FROM sqlite_stat1")
+            cursor.execute("ANALYZE sqlite_schema")
+        self.test_available_slots()
+
+
+@override_settings(STORAGES=TEST_STORAGES, SUPPORTER_COUNT_MAX_LAG=10 ** 9, AUDIT_FLUSH_INTERVAL=3600)
+class QueryBudgetTests(TestCase):
+    """
+    Every view and API action runs at most a fixed number of SQL queries.
+    Each page here is full, so a query per row (a template or serializer
+    following ``p.creator`` without ``select_related``, say) goes well over
+    budget. Budgets include the session and user lookups of logged-in
+    requests.
+    """
+
+    ROWS = 30  # more than a page (DEFAULT_PAGE_SIZE)
+
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        cls.admin = User.objects.create_user("admin", password="x", role="admin")
+        cls.lawyer = User.objects.create_user("lawyer", password="x", role="lawyer")
+        citizens = User.objects.bulk_create([User(username=f"citizen{i}", role="citizen") for i in range(5)])
+        cls.citizen = citizens[0]
+
+        petitions = Petition.objects.bulk_create(
+            [
+                Petition(
+                    creator=cls.citizen if i % 2 else citizens[i % len(citizens)],
+                    title=f"Petition {i} about water",
+                    description="Clean water for every district.",
+                    status=status,
+                    published_at=now if status == "published" else None,
+                )
+                for status in ("published", "pending", "draft")
+                for i in range(cls.ROWS)
+            ]
+        )
+        evidences = Evidence.objects.bulk_create(
+            [
+                Evidence(uploader=cls.citizen, file=f"evidence/e{i}.pdf", title=f"Exhibit {i}")
+                for i in range(cls.ROWS)
+            ]
+        )
+        ConsultationSlot.objects.bulk_create(
+            [
+                ConsultationSlot(lawyer=cls.lawyer, start_time=now + timedelta(hours=i + 1), duration_minutes=30)
+                for i in range(cls.ROWS)
+            ]
+        )
+        published = [p for p in petitions if p.status == "published"]
+        for petition in published:
+            petition.evidences.add(*evidences[:5])
+        Support.objects.bulk_create(
+            [Support(petition=petition, user=user) for petition in published for user in citizens[1:]]
+        )
+        cls.published = published[0]
+        cls.pending = next(p for p in petitions if p.status == "pending")
+        cls.draft = next(p for p in petitions if p.status == "draft" and p.creator_id == cls.citizen.pk)
+
+    def setUp(self):
+        for alias in ("default", "board"):
+            caches[alias].clear()
+
+    def tearDown(self):
+        # Write buffered audit events inside the test transaction, so none
+        # are left for the exit-time flush to write to the real database.
+        audit.flush()
+
+    def assertQueryBudget(self, budget, method, url, user=None, **kwargs):
+        if user is not None:
+            self.client.force_login(user)
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(url, **kwargs)
+        self.assertLess(response.status_code, 400, url)
+        self.assertLessEqual(
+            len(queries),
+            budget,
+            f"{method.upper()} {url} ran {len(queries)} queries, budget {budget}:\n"
+            + "\n".join(q["sql"] for q in queries.captured_queries),
+        )
+
+    def test_dashboard(self):
+        self.assertQueryBudget(4, "get", "/dashboard/", user=self.citizen)
+        self.assertQueryBudget(3, "get", "/dashboard/", user=self.lawyer)
+        self.assertQueryBudget(3, "get", "/dashboard/", user=self.admin)
+
+    def test_dashboard2(self):
+        self.assertQueryBudget(5, "get", "/dashboard2/", user=self.citizen)
+        self.assertQueryBudget(4, "get", "/dashboard2/", user=self.lawyer)
+        self.assertQueryBudget(4, "get", "/dashboard2/", user=self.admin)
+
+    def test_petition_list(self):
+        self.assertQueryBudget(5, "get", "/petitions/", user=self.citizen)
+        self.assertQueryBudget(3, "get", "/petitions/", user=self.admin)
+
+    def test_petition_create_form(self):
+        self.assertQueryBudget(3, "get", "/petitions/create/", user=self.citizen)
+
+    def test_justice_index(self):
+        # The page plus the board cache generation (see core/board_cache.py).
+        self.assertQueryBudget(2, "get", "/justice-index/")
+        self.assertQueryBudget(2, "get", "/justice-index/", q="water")
+        self.assertQueryBudget(3, "get", "/justice-index/", user=self.citizen)
+
+    def test_petition_detail(self):
+        self.assertQueryBudget(6, "get", f"/petitions/{self.published.pk}/", user=self.citizen)
+
+    def test_join_petition(self):
+        # Includes queueing the supporter count flush (see core/counters.py).
+        self.assertQueryBudget(9, "post", f"/api/petition/{self.published.pk}/join/", user=self.citizen)
+
+    def test_submit_for_review(self):
+        self.assertQueryBudget(7, "post", f"/api/petition/{self.draft.pk}/submit-for-review/", user=self.citizen)
+
+    def test_approve_petition(self):
+        self.assertQueryBudget(8, "post", f"/api/petition/{self.pending.pk}/approve/", user=self.admin)
+
+    def test_moderate_petitions(self):
+        # The same eight queries for one petition or a full page of them.
+        pending = list(Petition.objects.filter(status="pending").values_list("pk", flat=True))
+        self.assertQueryBudget(
+            8,
+            "post",
+            "/api/petition/moderate/",
+            user=self.admin,
+            data={"action": "approve", "ids": pending},
+            content_type="application/json",
+        )
+
+    def test_api_list(self):
+        self.assertQueryBudget(2, "get", "/api/petitions/")
+        self.assertQueryBudget(2, "get", "/api/petitions/", search="water")
+        self.assertQueryBudget(4, "get", "/api/petitions/", user=self.citizen)
+
+    def test_api_retrieve(self):
+        self.assertQueryBudget(4, "get", f"/api/petitions/{self.published.pk}/", user=self.citizen)
+
+    def test_api_create(self):
+        self.assertQueryBudget(
+            5,
+            "post",
+            "/api/petitions/",
+            user=self.citizen,
+            data={"title": "New", "description": "Details", "category": "general", "visibility": "public"},
+            content_type="application/json",
+        )
+
+
+@override_settings(STORAGES=TEST_STORAGES, AUDIT_FLUSH_INTERVAL=3600)
+class DashboardSummaryTests(TestCase):
+    """
+    The materialized dashboard counters follow saves, deletes and the
+    bookings' bulk updates, and ``reconcile`` agrees with them.
+    """
+
+    def setUp(self):
+        self.citizen = User.objects.create_user("citizen", password="x", role="citizen")
+        self.lawyer = User.objects.create_user("lawyer", password="x", role="lawyer")
+
+    def tearDown(self):
+        audit.flush()
+
+    def test_petitions_and_evidence(self):
+        petition = Petition.objects.create(creator=self.citizen, title="Water", description="Clean water.")
+        petition.status = "pending"
+        petition.save()
+        self.assertEqual(summary.site()["moderation_queue"], 1)
+        petition = Petition.objects.get(pk=petition.pk)
+        petition.status = "published"
+        petition.save()
+        evidence = Evidence.objects.create(uploader=self.citizen, file="evidence/e.pdf", title="Exhibit")
+        evidence.verification_status = "verified"
+        evidence.save()
+        Petition.objects.create(creator=self.citizen, title="Roads", description="Fix them.").delete()
+
+        counts = summary.for_user(self.citizen)
+        self.assertEqual(counts["petitions"], {"draft": 0, "pending": 0, "published": 1, "rejected": 0})
+        self.assertEqual(counts["evidence"], {"pending": 0, "verified": 1, "rejected": 0})
+        self.assertEqual(summary.site()["moderation_queue"], 0)
+        self.assertEqual(summary.reconcile(), 0)
+
+    def test_slots_follow_bookings(self):
+        start = timezone.now() + timedelta(days=1)
+        slot = ConsultationSlot.objects.create(lawyer=self.lawyer, start_time=start)
+        ConsultationSlot.objects.create(lawyer=self.lawyer, start_time=start + timedelta(hours=1))
+        booking = bookings.hold(slot.pk, self.citizen)
+        self.assertEqual(summary.for_user(self.lawyer)["slots"], {"open": 1, "booked": 1})
+        bookings.cancel(booking)
+        self.assertEqual(summary.for_user(self.lawyer)["slots"], {"open": 2, "booked": 0})
+
+        bookings.hold(slot.pk, self.citizen)
+        ConsultationSlot.objects.filter(pk=slot.pk).update(held_until=timezone.now() - timedelta(seconds=1))
+        bookings.release_expired_holds()
+        self.assertEqual(summary.for_user(self.lawyer)["slots"], {"open": 2, "booked": 0})
+        self.assertEqual(summary.reconcile(), 0)
+
+    def test_reconcile_repairs_drift(self):
+        Petition.objects.bulk_create(
+            [Petition(creator=self.citizen, title=f"P{i}", description="d", status="pending") for i in range(3)]
+        )
+        DashboardCounter.objects.create(user=self.lawyer, key="slots.open.2000-01-01", value=4)
+        self.assertEqual(summary.site()["moderation_queue"], 0)
+        self.assertEqual(summary.reconcile(), 3)
+        self.assertEqual(summary.site()["moderation_queue"], 3)
+        self.assertEqual(summary.for_user(self.citizen)["petitions"]["pending"], 3)
+        self.assertFalse(DashboardCounter.objects.filter(key__endswith="2000-01-01").exists())
+
+
+@override_settings(STORAGES=TEST_STORAGES, AUDIT_FLUSH_INTERVAL=3600)
+class ModerationTests(TestCase):
+    """
+    Bulk moderation moves only pending petitions and reports what happened
+    to each requested id.
+    """
+
+    def setUp(self):
+        caches["board"].clear()
+        self.admin = User.objects.create_user("admin", password="x", role="admin")
+        self.citizen = User.objects.create_user("citizen", password="x", role="citizen")
+        self.petitions = Petition.objects.bulk_create(
+            [
+                Petition(creator=self.citizen, title=f"P{i}", description="d", status="pending", category=category)
+                for i, category in enumerate(("legal", "legal", "welfare"))
+            ]
+        )
+        summary.reconcile()
+        self.client.force_login(self.admin)
+
+    def tearDown(self):
+        audit.flush()
+
+    def moderate(self, **data):
+        return self.client.post("/api/petition/moderate/", data, content_type="application/json")
+
+    def test_outcomes_per_id(self):
+        first, second, _ = self.petitions
+        Petition.objects.filter(pk=second.pk).update(status="rejected")
+        response = self.moderate(action="approve", ids=[first.pk, second.pk, 999999])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json()["results"],
+            [
+                {"id": first.pk, "outcome": "approved"},
+                {"id": second.pk, "outcome": "skipped", "status": "rejected"},
+                {"id": 999999, "outcome": "not_found"},
+            ],
+        )
+        first.refresh_from_db()
+        self.assertEqual(first.status, "published")
+        self.assertIsNotNone(first.published_at)
+
+        # A second admin approving the same petition gets a conflict.
+        response = self.client.post(f"/api/petition/{first.pk}/approve/")
+        self.assertEqual(response.status_code, 409)
+
+    def test_approve_single_petition(self):
+        first, second, _ = self.petitions
+        response = self.client.post(f"/api/petition/{first.pk}/approve/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"message": "✅ Petition approved successfully!"})
+        first.refresh_from_db()
+        self.assertEqual(first.status, "published")
+
+        # Approving again, or approving a rejected petition, changes nothing.
+        Petition.objects.filter(pk=second.pk).update(status="rejected")
+        for petition, current in ((first, "published"), (second, "rejected")):
+            response = self.client.post(f"/api/petition/{petition.pk}/approve/")
+            self.assertEqual(response.status_code, 409)
+            self.assertEqual(response.json(), {"error": f"This petition is already {current}."})
+        second.refresh_from_db()
+        self.assertEqual(second.status, "rejected")
+        self.assertEqual(self.client.post("/api/petition/999999/approve/").status_code, 404)
+
+    def test_filter_and_side_effects(self):
+        generation = board_cache.generation()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.moderate(action="approve", filter={"category": "legal"})
+        self.assertEqual(response.json()["moved"], 2)
+        self.assertEqual(board_cache.generation(), generation + 1)
+        self.assertEqual(summary.site()["moderation_queue"], 1)
+        self.assertEqual(summary.for_user(self.citizen)["petitions"]["published"], 2)
+
+        self.moderate(action="reject", filter={})
+        self.assertEqual(Petition.objects.filter(status="rejected").count(), 1)
+        self.assertEqual(summary.reconcile(), 0)
+        audit.flush()
+        self.assertEqual(AuditLog.objects.filter(action__startswith="petition.bulk_").count(), 2)
+
+    def test_bad_requests(self):
+        self.assertEqual(self.moderate(action="publish", ids=[1]).status_code, 400)
+        self.assertEqual(self.moderate(action="approve").status_code, 400)
+        self.assertEqual(self.moderate(action="approve", ids=["x"]).status_code, 400)
+        self.assertEqual(self.moderate(action="approve", filter={"status": "draft"}).status_code, 400)
+        self.client.force_login(self.citizen)
+        self.assertEqual(self.moderate(action="approve", ids=[self.petitions[0].pk]).status_code, 403)
+
+
+@override_settings(STORAGES=TEST_STORAGES, SUPPORTER_COUNT_SHARDS=4, SUPPORTER_COUNT_MAX_LAG=0)
+class SupporterCounterTests(TestCase):
+    """
+    Joins go to shard rows, a queued job folds them into the petition and
+    reads never write.
+    """
+
+    def setUp(self):
+        caches["board"].clear()
+        self.citizen = User.objects.create_user("citizen", password="x", role="citizen")
+        self.petition = Petition.objects.create(
+            creator=self.citizen, title="Water", description="d", status="published"
+        )
+        self.users = User.objects.bulk_create([User(username=f"supporter{i}") for i in range(6)])
+
+    def join(self, *users):
+        for user in users:
+            add_support(self.petition.pk, user.pk)
+
+    def test_joins_go_to_shards(self):
+        self.join(*self.users)
+        self.join(self.users[0])
+        remove_support(self.petition.pk, self.users[1].pk)
+        self.petition.refresh_from_db()
+        self.assertEqual(self.petition.supporter_count, 0)
+        shards = SupporterCountShard.objects.filter(petition=self.petition)
+        self.assertLessEqual(shards.count(), 4)
+        self.assertEqual(sum(shards.values_list("delta", flat=True)), 5)
+        self.assertEqual(counters.live_count(self.petition.pk), 5)
+
+    def test_one_flush_job_is_queued(self):
+        self.join(*self.users)
+        self.assertEqual(Job.objects.filter(name=counters.FLUSH_JOB, status="queued").count(), 1)
+
+    def test_flush_folds_shards(self):
+        self.join(*self.users)
+        changes = counters.flush()
+        self.assertEqual(changes, {self.petition.pk: 6})
+        self.petition.refresh_from_db()
+        self.assertEqual(self.petition.supporter_count, 6)
+        self.assertFalse(SupporterCountShard.objects.exists())
+        self.assertEqual(counters.flush(), {})
+
+    def test_reconcile_rebuilds_counts(self):
+        self.join(*self.users)
+        Petition.objects.filter(pk=self.petition.pk).update(supporter_count=40)
+        self.assertEqual(counters.reconcile(), 1)
+        self.petition.refresh_from_db()
+        self.assertEqual(self.petition.supporter_count, 6)
+        self.assertFalse(SupporterCountShard.objects.exists())
+        self.assertEqual(counters.reconcile(), 0)
+
+    def test_reads_do_not_write(self):
+        self.join(*self.users)
+        for path in ("/justice-index/", f"/petitions/{self.petition.pk}/", "/api/petitions/"):
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.client.get(path).status_code, 200)
+            writes = [q["sql"] for q in queries if not q["sql"].startswith("SELECT")]
+            self.assertEqual(writes, [], path)
+        self.assertTrue(SupporterCountShard.objects.filter(petition=self.petition).exists())
+
+    def test_reads_show_unflushed_joins(self):
+        # No job worker runs here, so the count only reaches the pages
+        # through the shard sum.
+        self.join(*self.users)
+        remove_support(self.petition.pk, self.users[0].pk)
+        self.assertEqual(self.client.get(f"/api/petitions/{self.petition.pk}/").json()["supporter_count"], 5)
+        self.assertEqual(self.client.get("/api/petitions/").json()["results"][0]["supporter_count"], 5)
+        self.assertContains(self.client.get(f"/petitions/{self.petition.pk}/"), "Supporters:</strong> 5")
+        self.assertContains(self.client.get("/justice-index/"), "5 supporters")
+        self.client.force_login(self.citizen)
+        self.assertContains(self.client.get("/petitions/"), "5 supporters")
+        self.petition.refresh_from_db()
+        self.assertEqual(self.petition.supporter_count, 0)
+
+        counters.flush()
+        self.assertEqual(self.client.get(f"/api/petitions/{self.petition.pk}/").json()["supporter_count"], 5)
+
+
+class SearchTests(TestCase):
+    """
+    Full-text search ranks title matches first, pages by rank and renders
+    highlights that user text cannot unbalance.
+    """
+
+    def setUp(self):
+        self.citizen = User.objects.create_user("citizen", password="x", role="citizen")
+
+    def petition(self, title, description="d"):
+        return Petition.objects.create(creator=self.citizen, title=title, description=description, status="published")
+
+    def test_title_matches_rank_first(self):
+        in_description = self.petition("Roads", "More water for the district.")
+        in_title = self.petition("Water supply")
+        self.petition("Schools")
+        results = list(search_petitions(Petition.objects.all(), "water"))
+        self.assertEqual([p.pk for p in results], [in_title.pk, in_description.pk])
+
+    def test_pages_by_rank(self):
+        matches = {self.petition(f"Water {i}").pk for i in range(5)}
+        queryset = search_petitions(Petition.objects.all(), "water")
+        seen, cursor = [], None
+        while True:
+            page = paginate(queryset, cursor=cursor, page_size=2)
+            seen += [p.pk for p in page]
+            if not page.has_next:
+                break
+            cursor = page.next_cursor
+        self.assertEqual(len(seen), 5)
+        self.assertEqual(set(seen), matches)
+
+    def test_marker_characters_in_text(self):
+        self.petition("Water \x03 supply \x02", "Clean <b>water</b> \x02for all")
+        (result,) = search_petitions(Petition.objects.all(), "water")
+        html = highlight(result.search_snippet)
+        self.assertNotIn("\x02", html)
+        self.assertNotIn("\x03", html)
+        self.assertNotIn("<b>", html)
+        self.assertEqual(html.count("<mark>"), html.count("</mark>"))
+        self.assertEqual(highlight("a \x02b\x03 \x02c \x03\x03d"), "a <mark>b</mark> <mark>c </mark>d")
+
+
+class EvidenceMetadataTests(TestCase):
+    """
+    Processing keeps descriptive EXIF only, and the public API never shows
+    processing output.
+    """
+
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        self.enterContext(override_settings(STORAGES=TEST_STORAGES, MEDIA_ROOT=self.media))
+        caches["board"].clear()
+        self.citizen = User.objects.create_user("citizen", password="x", role="citizen")
+
+    def photo_with_location(self):
+        from PIL import ExifTags, Image
+
+        exif = Image.Exif()
+        exif[0x010F] = "Acme"  # Make
+        exif.get_ifd(ExifTags.IFD.Exif)[0xA431] = "SN-123456"  # BodySerialNumber
+        gps = exif.get_ifd(ExifTags.IFD.GPSInfo)
+        gps[1], gps[2] = "N", (12.0, 34.0, 56.0)
+        buffer = io.BytesIO()
+        Image.new("RGB", (40, 30), "red").save(buffer, "JPEG", exif=exif)
+        os.makedirs(os.path.join(self.media, "evidence"))
+        with open(os.path.join(self.media, "evidence", "photo.jpg"), "wb") as fh:
+            fh.write(buffer.getvalue())
+        return Evidence.objects.create(uploader=self.citizen, file="evidence/photo.jpg", title="Photo")
+
+    def test_location_and_serials_are_dropped(self):
+        evidence = self.photo_with_location()
+        processing.process_evidence(evidence.pk)
+        evidence.refresh_from_db()
+        self.assertEqual(evidence.metadata["exif"], {"Make": "Acme"})
+
+    def test_api_does_not_return_metadata(self):
+        evidence = self.photo_with_location()
+        Evidence.objects.filter(pk=evidence.pk).update(metadata={"exif": {"GPSInfo": {"2": [12.0, 34.0, 56.0]}}})
+        petition = Petition.objects.create(
+            creator=self.citizen, title="Water", description="d", status="published", published_at=timezone.now()
+        )
+        petition.evidences.add(evidence)
+        response = self.client.get("/api/petitions/")
+        self.assertEqual(response.status_code, 200)
+        shown = response.json()["results"][0]["evidences"][0]
+        self.assertEqual(shown["title"], "Photo")
+        for field in ("metadata", "blob", "preview", "processed_at"):
+            self.assertNotIn(field, shown)
+        self.assertNotIn(b"GPS", response.content)
+
+
+class AvailableSlotsTests(TestCase):
+    """
+    Availability merges free slots and expired holds in start order, and
+    leaves out live holds and confirmed bookings.
+    """
+
+    def test_merges_free_and_expired_holds(self):
+        lawyer = User.objects.create_user("lawyer", password="x", role="lawyer")
+        now = timezone.now()
+        start = now + timedelta(days=1)
+
+        def slot(hours, **fields):
+            return ConsultationSlot.objects.create(lawyer=lawyer, start_time=start + timedelta(hours=hours), **fields)
+
+        free = slot(2)
+        expired = slot(1, is_booked=True, held_until=now - timedelta(minutes=1))
+        slot(3, is_booked=True, held_until=now + timedelta(minutes=5))
+        slot(4, is_booked=True)
+        later_free = slot(5)
+        found = available_slots(start, start + timedelta(hours=8), now=now)
+        self.assertEqual(found, [expired, free, later_free])
+
+
+class ResumableUploadTests(TestCase):
+    """
+    Chunks only land at the session's offset, one request at a time, and
+    finalize stores the file under the digest of what is on disk.
+    """
+
+    DATA = b"evidence bytes " * 1000
+
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        self.enterContext(override_settings(STORAGES=TEST_STORAGES, MEDIA_ROOT=self.media, AUDIT_FLUSH_INTERVAL=3600))
+        self.addCleanup(audit.flush)
+        self.client.force_login(User.objects.create_user("citizen", password="x", role="citizen"))
+        response = self.client.post(
+            "/api/uploads/",
+            {"title": "Video", "filename": "clip.mp4", "total_size": len(self.DATA), "file_type": "video"},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 201)
+        self.url = f"/api/uploads/{response.json()['id']}/"
+
+    def patch(self, offset, chunk):
+        return self.client.patch(
+            self.url, chunk, content_type="application/offset+octet-stream", HTTP_UPLOAD_OFFSET=str(offset)
+        )
+
+    def finalize(self, **data):
+        return self.client.post(self.url + "finalize/", data, content_type="application/json")
+
+    def test_resume_after_offset_mismatch(self):
+        half = len(self.DATA) // 2
+        self.assertEqual(self.patch(0, self.DATA[:half]).json()["offset"], half)
+        # A retried first chunk is refused with the offset to resume from.
+        response = self.patch(0, self.DATA[:half])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response["Upload-Offset"], str(half))
+        self.assertEqual(self.client.get(self.url)["Upload-Offset"], str(half))
+        self.assertEqual(self.patch(half, self.DATA[half:]).status_code, 200)
+
+        response = self.finalize(sha256=hashlib.sha256(self.DATA).hexdigest())
+        self.assertEqual(response.status_code, 201)
+        evidence = Evidence.objects.get(pk=response.json()["id"])
+        with evidence.file.open("rb") as fh:
+            self.assertEqual(fh.read(), self.DATA)
+
+    def test_checksum_mismatch(self):
+        self.patch(0, self.DATA)
+        self.assertEqual(self.finalize(sha256="0" * 64).status_code, 422)
+        self.assertFalse(Evidence.objects.exists())
+        # Nothing was lost; the upload can still be finalized.
+        self.assertEqual(self.finalize().status_code, 201)
+
+    def test_digest_is_computed_from_the_file(self):
+        self.patch(0, self.DATA)
+        session = UploadSession.objects.get()
+        with open(os.path.join(self.media, "evidence", "partial", f"{session.pk}.part"), "r+b") as fh:
+            fh.write(b"X")  # a stray write after the chunk was accepted
+        stored = b"X" + self.DATA[1:]
+        self.assertEqual(self.finalize().status_code, 201)
+        session.refresh_from_db()
+        self.assertEqual(session.sha256, hashlib.sha256(stored).hexdigest())
+
+    def test_double_finalize(self):
+        self.patch(0, self.DATA)
+        first = self.finalize()
+        second = self.finalize()
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.json()["id"], first.json()["id"])
+        self.assertEqual(Evidence.objects.count(), 1)
+
+    def test_claimed_session_refuses_other_requests(self):
+        claim = {"claim": uuid.uuid4(), "claimed_until": timezone.now() + timedelta(minutes=5)}
+        UploadSession.objects.update(**claim)
+        response = self.patch(0, self.DATA)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response["Upload-Offset"], "0")
+
+        UploadSession.objects.update(offset=len(self.DATA))
+        self.assertEqual(self.finalize().status_code, 409)
+        # A lapsed claim (its request died) no longer blocks the upload.
+        UploadSession.objects.update(offset=0, claimed_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(self.patch(0, self.DATA).status_code, 200)
+        self.assertEqual(self.finalize().status_code, 201)
+
+
+@override_settings(STORAGES=TEST_STORAGES, SUPPORTER_COUNT_MAX_LAG=10 ** 9, BOARD_CACHE_SUPPORTER_THRESHOLD=5)
+class BoardCacheTests(TestCase):
+    """
+    A page cached in one process is dropped by an invalidation made in any
+    other, whatever cache backend that process uses.
+    """
+
+    def setUp(self):
+        caches["board"].clear()
+        citizen = User.objects.create_user("citizen", password="x", role="citizen")
+        Petition.objects.create(
+            creator=citizen, title="Water", description="d", status="published", published_at=timezone.now()
+        )
+
+    def get(self):
+        return self.client.get("/justice-index/")["X-Board-Cache"]
+
+    def test_invalidation_from_another_process(self):
+        self.assertEqual(self.get(), "miss")
+        self.assertEqual(self.get(), "hit")
+        # Another worker has its own local-memory cache.
+        other = LocMemCache("other-worker", {})
+        with mock.patch.object(board_cache, "_cache", return_value=other):
+            board_cache.invalidate()
+        self.assertEqual(self.get(), "miss")
+
+    def test_supporter_drift_accumulates_across_flushes(self):
+        generation = board_cache.generation()
+        board_cache.record_supporter_changes({1: 3})
+        self.assertEqual(board_cache.generation(), generation)
+        board_cache.record_supporter_changes({2: -2})
+        self.assertEqual(board_cache.generation(), generation + 1)
+
+
+@override_settings(AUDIT_FLUSH_INTERVAL=3600)
+class SupportTests(TestCase):
+    """
+    Supporting twice changes nothing, and withdrawing takes the support away.
+    """
+
+    def setUp(self):
+        self.addCleanup(audit.flush)
+        self.citizen = User.objects.create_user("citizen", password="x", role="citizen")
+        self.petition = Petition.objects.create(
+            creator=self.citizen, title="Water", description="d", status="published"
+        )
+        self.client.force_login(self.citizen)
+
+    def post(self, action, pk=None):
+        return self.client.post(f"/api/petition/{pk or self.petition.pk}/{action}/")
+
+    def test_double_support_is_a_no_op(self):
+        first = self.post("join")
+        self.assertEqual(first.json()["supporters"], 1)
+        second = self.post("join")
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.json(), {"message": "You already supported this petition."})
+        self.assertEqual(Support.objects.filter(petition=self.petition).count(), 1)
+
+    def test_unsupport_decrements(self):
+        self.post("join")
+        response = self.post("unsupport")
+        self.assertEqual(response.json()["supporters"], 0)
+        self.assertFalse(Support.objects.filter(petition=self.petition).exists())
+        again = self.post("unsupport")
+        self.assertEqual(again.json(), {"message": "You have not supported this petition."})
+        self.assertEqual(self.post("join").json()["supporters"], 1)
+
+    def test_missing_petition(self):
+        self.assertEqual(self.post("join", pk=999999).status_code, 404)
+        self.assertEqual(self.post("unsupport", pk=999999).status_code, 404)
+
+
+class BlobStorageTests(TestCase):
+    """
+    Identical content is stored once, and garbage collection only removes
+    blobs that nothing references.
+    """
+
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        self.enterContext(override_settings(MEDIA_ROOT=self.media))
+        self.citizen = User.objects.create_user("citizen", password="x", role="citizen")
+
+    def evidence(self, data):
+        blob = blobs.store(ContentFile(data), hashlib.sha256(data).hexdigest(), len(data), "note.txt")
+        evidence = Evidence(uploader=self.citizen, title="Note")
+        blobs.attach(evidence, blob)
+        evidence.save()
+        return evidence
+
+    def test_same_content_is_stored_once(self):
+        first, second = self.evidence(b"same"), self.evidence(b"same")
+        self.assertEqual(first.blob_id, second.blob_id)
+        first.blob.refresh_from_db()
+        self.assertEqual(first.blob.ref_count, 2)
+
+    def test_garbage_collection_keeps_referenced_blobs(self):
+        kept, other = self.evidence(b"kept"), self.evidence(b"kept")
+        orphan = self.evidence(b"orphan")
+        other.delete()
+        orphan.delete()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(blobs.collect_garbage(), 1)
+        kept.blob.refresh_from_db()
+        self.assertEqual(kept.blob.ref_count, 1)
+        self.assertTrue(default_storage.exists(kept.blob.file.name))
+        self.assertFalse(default_storage.exists(orphan.blob.file.name))
+        self.assertFalse(EvidenceBlob.objects.filter(pk=orphan.blob_id).exists())
+
+    def test_garbage_collection_skips_drifted_counts(self):
+        evidence = self.evidence(b"drifted")
+        EvidenceBlob.objects.filter(pk=evidence.blob_id).update(ref_count=0)
+        self.assertEqual(blobs.collect_garbage(), 0)
+        self.assertTrue(default_storage.exists(evidence.blob.file.name))
+        self.assertEqual(blobs.recount(), 1)
+
+
+class EvidenceDownloadTests(TestCase):
+    """
+    Downloads honour single byte ranges and If-Range, and answer 416 for
+    ranges outside the file.
+    """
+
+    DATA = bytes(range(256)) * 4
+
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        self.enterContext(override_settings(MEDIA_ROOT=self.media))
+        citizen = User.objects.create_user("citizen", password="x", role="citizen")
+        digest = hashlib.sha256(self.DATA).hexdigest()
+        evidence = Evidence(uploader=citizen, title="Clip")
+        blobs.attach(evidence, blobs.store(ContentFile(self.DATA), digest, len(self.DATA), "clip.bin"))
+        evidence.save()
+        self.evidence = evidence
+        self.etag = f'"{digest}"'
+        self.url = f"/evidences/{evidence.pk}/download/"
+        self.client.force_login(citizen)
+
+    def test_api_links_the_download_not_the_file(self):
+        petition = Petition.objects.create(
+            creator=self.evidence.uploader, title="Water", description="d", status="published"
+        )
+        petition.evidences.add(self.evidence)
+        (listed,) = self.client.get(f"/api/petitions/{petition.pk}/").json()["evidences"]
+        self.assertEqual(listed["file"], f"http://testserver{self.url}")
+        self.assertNotIn(self.evidence.file.name, json.dumps(listed))
+
+    def body(self, response):
+        return b"".join(response.streaming_content)
+
+    def test_partial_content(self):
+        response = self.client.get(self.url, HTTP_RANGE="bytes=10-19")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response["Content-Range"], f"bytes 10-19/{len(self.DATA)}")
+        self.assertEqual(response["Content-Length"], "10")
+        self.assertEqual(self.body(response), self.DATA[10:20])
+
+    def test_suffix_and_open_ranges(self):
+        size = len(self.DATA)
+        response = self.client.get(self.url, HTTP_RANGE="bytes=-5")
+        self.assertEqual(response["Content-Range"], f"bytes {size - 5}-{size - 1}/{size}")
+        self.assertEqual(self.body(response), self.DATA[-5:])
+        response = self.client.get(self.url, HTTP_RANGE="bytes=1000-")
+        self.assertEqual(response["Content-Range"], f"bytes 1000-{size - 1}/{size}")
+        self.assertEqual(self.body(response), self.DATA[1000:])
+
+    def test_unsatisfiable_range(self):
+        response = self.client.get(self.url, HTTP_RANGE=f"bytes={len(self.DATA)}-")
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response["Content-Range"], f"bytes */{len(self.DATA)}")
+
+    def test_whole_file(self):
+        for headers in ({}, {"HTTP_RANGE": "bytes=0-1,5-6"}, {"HTTP_RANGE": "bytes=0-9", "HTTP_IF_RANGE": '"old"'}):
+            response = self.client.get(self.url, **headers)
+            self.assertEqual(response.status_code, 200, headers)
+            self.assertNotIn("Content-Range", response)
+            self.assertEqual(self.body(response), self.DATA)
+
+    def test_if_range_matches(self):
+        response = self.client.get(self.url, HTTP_RANGE="bytes=0-9", HTTP_IF_RANGE=self.etag)
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(self.body(response), self.DATA[:10])
+
+    def test_not_modified(self):
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=self.etag)
+        self.assertEqual(response.status_code, 304)
+
+
+class BookingHoldTests(TestCase):
+    """
+    A live hold keeps the slot, an expired one can be taken over, and only a
+    hold that is still live can be confirmed.
+    """
+
+    def setUp(self):
+        lawyer = User.objects.create_user("lawyer", password="x", role="lawyer")
+        self.first = User.objects.create_user("first", password="x", role="citizen")
+        self.second = User.objects.create_user("second", password="x", role="citizen")
+        self.slot = ConsultationSlot.objects.create(lawyer=lawyer, start_time=timezone.now() + timedelta(days=1))
+
+    def expire_hold(self):
+        ConsultationSlot.objects.filter(pk=self.slot.pk).update(held_until=timezone.now() - timedelta(seconds=1))
+
+    def test_live_hold_cannot_be_claimed(self):
+        bookings.hold(self.slot.pk, self.first)
+        with self.assertRaises(bookings.SlotUnavailable):
+            bookings.hold(self.slot.pk, self.second)
+
+    def test_expired_hold_can_be_claimed(self):
+        stale = bookings.hold(self.slot.pk, self.first)
+        self.expire_hold()
+        booking = bookings.hold(self.slot.pk, self.second)
+        self.slot.refresh_from_db()
+        self.assertEqual(self.slot.held_by, self.second)
+        self.assertEqual(list(self.slot.bookings.all()), [booking])
+        with self.assertRaises(bookings.HoldExpired):
+            bookings.confirm(stale)
+
+    def test_confirmed_booking_cannot_be_claimed(self):
+        bookings.confirm(bookings.hold(self.slot.pk, self.first))
+        with self.assertRaises(bookings.SlotUnavailable):
+            bookings.hold(self.slot.pk, self.second)
+
+    def test_one_release_job_is_queued(self):
+        later = ConsultationSlot.objects.create(lawyer=self.slot.lawyer, start_time=self.slot.start_time)
+        bookings.hold(self.slot.pk, self.first)
+        bookings.hold(later.pk, self.second)
+        queued = Job.objects.filter(name=bookings.RELEASE_JOB, status="queued")
+        self.assertEqual(queued.count(), 1)
+        self.slot.refresh_from_db()
+        self.assertEqual(queued.get().run_at, self.slot.held_until + timedelta(seconds=1))
+
+        # A run queues the next one for the holds that are left.
+        queued.update(status="done")
+        self.expire_hold()
+        tasks.release_expired_holds()
+        later.refresh_from_db()
+        self.assertEqual(queued.get().run_at, later.held_until + timedelta(seconds=1))
+
+    def test_release_expired_holds(self):
+        bookings.hold(self.slot.pk, self.first)
+        self.expire_hold()
+        self.assertEqual(bookings.release_expired_holds(), 1)
+        self.slot.refresh_from_db()
+        self.assertFalse(self.slot.is_booked)
+        self.assertFalse(self.slot.bookings.exists())
+
+
+@override_settings(AUDIT_FLUSH_INTERVAL=3600)
+class AuditBufferTests(TestCase):
+    """
+    Events wait in the buffer until a flush, a failed write keeps them, and
+    shutdown stops the flusher thread before the final flush.
+    """
+
+    def setUp(self):
+        audit.flush()
+        self.addCleanup(audit.flush)
+        AuditLog.objects.all().delete()
+
+    def test_flush_writes_buffered_events(self):
+        for i in range(3):
+            audit.record("test.event", number=i)
+        self.assertEqual(audit.pending(), 3)
+        self.assertFalse(AuditLog.objects.exists())
+        self.assertEqual(audit.flush(), 3)
+        self.assertEqual(audit.pending(), 0)
+        self.assertEqual(sorted(AuditLog.objects.values_list("meta__number", flat=True)), [0, 1, 2])
+        self.assertEqual(audit.flush(), 0)
+
+    def test_failed_write_keeps_events(self):
+        audit.record("test.event")
+        with self.assertLogs("core.audit", "ERROR"), mock.patch.object(
+            AuditLog.objects, "bulk_create", side_effect=DatabaseError
+        ):
+            self.assertEqual(audit.flush(), 0)
+        self.assertEqual(audit.pending(), 1)
+        self.assertEqual(audit.flush(), 1)
+        self.assertEqual(AuditLog.objects.count(), 1)
+
+    def test_shutdown_joins_flusher_before_final_flush(self):
+        # Start a flusher thread of our own, as a freshly forked worker would.
+        with mock.patch.object(audit, "_pid", None):
+            audit.record("test.event")
+            flusher = audit._flusher
+        self.addCleanup(setattr, audit, "_pid", None)
+        calls = []
+        with mock.patch.object(audit, "flush", side_effect=lambda: calls.append(threading.current_thread())):
+            audit.shutdown()
+        self.assertFalse(flusher.is_alive())
+        self.assertIsNone(audit._flusher)
+        self.assertEqual(calls[-1], threading.current_thread())
+        self.assertIn(flusher, calls[:-1])
+        self.assertEqual(audit.pending(), 1)
+
+
+@override_settings(AUDIT_HOT_MONTHS=3, AUDIT_ARCHIVE_CHUNK_SIZE=2, AUDIT_FLUSH_INTERVAL=3600)
+class AuditArchiveTests(TestCase):
+    """
+    Old months move into compressed chunks with their counts rolled up, and
+    exports read archived and hot events alike.
+    """
+
+    NOW = timezone.make_aware(datetime(2026, 6, 15, 12))
+
+    def setUp(self):
+        self.addCleanup(audit.flush)
+        self.admin = User.objects.create_user("admin", password="x", role="admin")
+        self.citizen = User.objects.create_user("citizen", password="x", role="citizen")
+
+        def event(month, day, action, user):
+            moment = timezone.make_aware(datetime(2026, month, day, 10))
+            return AuditLog(user=user, action=action, timestamp=moment, meta={"day": f"{month}-{day}"})
+
+        AuditLog.objects.bulk_create(
+            [
+                event(1, 5, "petition.join", self.citizen),
+                event(1, 6, "petition.join", self.citizen),
+                event(1, 7, "petition.create", self.admin),
+                event(2, 3, "petition.join", self.citizen),
+                event(5, 2, "petition.join", self.citizen),
+                event(5, 9, "petition.create", self.admin),
+            ]
+        )
+
+    def test_compact_archives_old_months(self):
+        self.assertEqual(audit_archive.compact(self.NOW), 4)
+        self.assertEqual(
+            list(AuditArchive.objects.order_by("month", "chunk").values_list("month__month", "chunk", "count")),
+            [(1, 1, 2), (1, 2, 1), (2, 1, 1)],
+        )
+        self.assertEqual(sorted(AuditLog.objects.values_list("timestamp__month", flat=True)), [5, 5])
+        days = AuditRollup.objects.filter(period="day", action="petition.join", user=self.citizen)
+        self.assertEqual(sum(days.values_list("count", flat=True)), 4)
+        self.assertEqual(audit_archive.compact(self.NOW), 0)
+
+    def test_events_span_archive_and_hot_rows(self):
+        audit_archive.compact(self.NOW)
+        start, end = timezone.make_aware(datetime(2026, 1, 6)), timezone.make_aware(datetime(2026, 6, 1))
+        events = list(audit_archive.iter_events(start, end))
+        self.assertEqual([e["meta"]["day"] for e in events], ["1-6", "1-7", "2-3", "5-2", "5-9"])
+        joins = list(audit_archive.iter_events(start, end, user_id=self.citizen.pk, action="petition.join"))
+        self.assertEqual([e["meta"]["day"] for e in joins], ["1-6", "2-3", "5-2"])
+        self.assertEqual({e["username"] for e in joins}, {"citizen"})
+
+    def export(self, **params):
+        return self.client.get("/audit/export/", {"start": "2026-01-01", "end": "2026-06-01", **params})
+
+    def test_export(self):
+        audit_archive.compact(self.NOW)
+        self.client.force_login(self.admin)
+        response = self.export(action="petition.create")
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        self.assertEqual(response["Content-Disposition"], 'attachment; filename="audit-20260101-20260601.ndjson"')
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line)["meta"] for line in lines], [{"day": "1-7"}, {"day": "5-9"}])
+
+        response = self.export(format="csv", user=self.citizen.pk)
+        rows = list(csv.reader(io.StringIO(b"".join(response.streaming_content).decode())))
+        self.assertEqual(rows[0], list(audit_archive.FIELDS))
+        self.assertEqual([row[5] for row in rows[1:]], ['{"day": "1-5"}', '{"day": "1-6"}', '{"day": "2-3"}', '{"day": "5-2"}'])
+
+    def test_export_checks_access_and_range(self):
+        self.client.force_login(self.citizen)
+        self.assertEqual(self.export().status_code, 403)
+        self.client.force_login(self.admin)
+        self.assertEqual(self.export(end="2025-12-01").status_code, 400)
+        self.assertEqual(self.export(start="soon").status_code, 400)
+
+
+@override_settings(JOB_LOCK_TIMEOUT=60)
+class JobQueueTests(TestCase):
+    """
+    Workers claim each job once, in priority then run_at order, retry failures
+    with backoff, bury jobs that run out of attempts and recover jobs whose
+    worker died.
+    """
+
+    JOB = "test_job"
+
+    def setUp(self):
+        self.calls = []
+        self.failures = 0
+        jobs.handler(self.JOB, max_attempts=3)(self.record)
+        self.addCleanup(jobs._handlers.pop, self.JOB)
+
+    def record(self, n=0):
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("handler failed")
+        self.calls.append(n)
+
+    def make_ready(self, job):
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+
+    def test_two_workers_cannot_claim_the_same_job(self):
+        first, second = jobs.enqueue(self.JOB), jobs.enqueue(self.JOB)
+        claimed = {}
+
+        def candidates_then_race(queryset):
+            # Worker b has read the candidates; worker a claims before b updates.
+            ids = [*queryset]
+            if not claimed:
+                claimed["a"] = None
+                claimed["a"] = jobs.claim("worker-a")
+            return ids
+
+        with mock.patch("core.jobs.list", side_effect=candidates_then_race, create=True):
+            claimed["b"] = jobs.claim("worker-b")
+        self.assertEqual((claimed["a"].pk, claimed["b"].pk), (first.pk, second.pk))
+        self.assertEqual(claimed["a"].locked_by, "worker-a")
+        self.assertEqual(claimed["b"].locked_by, "worker-b")
+        self.assertEqual([claimed["a"].attempts, claimed["b"].attempts], [1, 1])
+        self.assertIsNone(jobs.claim("worker-c"))
+
+    def test_claims_by_priority_then_run_at(self):
+        now = timezone.now()
+        late = jobs.enqueue(self.JOB, run_at=now - timedelta(seconds=10))
+        early = jobs.enqueue(self.JOB, run_at=now - timedelta(seconds=20))
+        urgent = jobs.enqueue(self.JOB, priority=5, run_at=now - timedelta(seconds=5))
+        jobs.enqueue(self.JOB, priority=9, delay=60)
+        order = [jobs.claim("worker").pk for _ in range(3)]
+        self.assertEqual(order, [urgent.pk, early.pk, late.pk])
+        self.assertIsNone(jobs.claim("worker"))
+
+    def test_failed_job_is_retried_with_backoff(self):
+        self.failures = 1
+        job = jobs.enqueue(self.JOB, {"n": 7})
+        with mock.patch("core.jobs.random.uniform", return_value=1.0), self.assertLogs("core.jobs", "WARNING"):
+            before = timezone.now()
+            self.assertFalse(jobs.run(jobs.claim("worker")))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.locked_by), ("queued", 1, ""))
+        self.assertIn("handler failed", job.last_error)
+        self.assertGreaterEqual(job.run_at, before + timedelta(seconds=jobs.BACKOFF_BASE))
+        self.assertIsNone(jobs.claim("worker"))
+
+        self.make_ready(job)
+        self.assertTrue(jobs.run(jobs.claim("worker")))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ("done", 2))
+        self.assertEqual(self.calls, [7])
+
+    def test_backoff_doubles_up_to_the_cap(self):
+        with mock.patch("core.jobs.random.uniform", return_value=1.0):
+            delays = [jobs.backoff(attempts) for attempts in (1, 2, 3, 4, 20)]
+        self.assertEqual(delays, [5, 10, 20, 40, jobs.BACKOFF_CAP])
+
+    def test_job_is_dead_after_max_attempts(self):
+        self.failures = 5
+        job = jobs.enqueue(self.JOB)
+        with self.assertLogs("core.jobs", "WARNING") as logs:
+            for _ in range(3):
+                self.make_ready(job)
+                self.assertFalse(jobs.run(jobs.claim("worker")))
+        self.assertEqual([record.levelname for record in logs.records], ["WARNING", "WARNING", "ERROR"])
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ("dead", 3))
+        self.assertIsNotNone(job.finished_at)
+        self.assertIn("RuntimeError: handler failed", job.last_error)
+        self.make_ready(job)
+        self.assertIsNone(jobs.claim("worker"))
+
+    def test_unknown_job_is_dead_at_once(self):
+        job = jobs.enqueue("no_such_job")
+        with self.assertLogs("core.jobs", "ERROR"):
+            self.assertFalse(jobs.run(jobs.claim("worker")))
+        job.refresh_from_db()
+        self.assertEqual(job.status, "dead")
+        self.assertIn("No handler registered", job.last_error)
+
+    def test_requeue_stale_recovers_a_dead_workers_job(self):
+        job = jobs.enqueue(self.JOB, {"n": 1})
+        orphan = jobs.claim("dead-worker")
+        self.assertEqual(jobs.requeue_stale(), 0)
+
+        Job.objects.filter(pk=job.pk).update(locked_at=timezone.now() - timedelta(seconds=61))
+        self.assertEqual(jobs.requeue_stale(), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.locked_by, job.last_error), ("queued", "", jobs.STALE_ERROR))
+
+        self.assertTrue(jobs.run(jobs.claim("worker")))
+        # The original worker waking up late does not touch the finished job.
+        self.assertFalse(jobs._owned(orphan).exists())
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ("done", 2))
+        self.assertEqual(self.calls, [1])
+
+    def test_requeue_stale_buries_jobs_out_of_attempts(self):
+        job = jobs.enqueue(self.JOB, max_attempts=1)
+        jobs.claim("dead-worker")
+        Job.objects.filter(pk=job.pk).update(locked_at=timezone.now() - timedelta(seconds=61))
+        self.assertEqual(jobs.requeue_stale(), 0)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.last_error), ("dead", jobs.STALE_ERROR))
+
+    def test_burst_worker_drains_ready_jobs(self):
+        for n in range(3):
+            jobs.enqueue(self.JOB, {"n": n})
+        jobs.enqueue(self.JOB, {"n": 9}, delay=60)
+        jobs.work(threading.Event(), burst=True)
+        self.assertEqual(self.calls, [0, 1, 2])
+        self.assertEqual(Job.objects.filter(status="done").count(), 3)
+
+    def test_run_jobs_queues_the_dashboard_reconcile_once(self):
+        for _ in range(2):
+            call_command("run_jobs", workers=1, burst=True)
+        reconcile = Job.objects.get(name=summary.RECONCILE_JOB)
+        self.assertEqual(reconcile.status, "queued")
+        self.assertGreater(reconcile.run_at, timezone.now())
+
+    def test_metrics(self):
+        now = timezone.now()
+        jobs.enqueue(self.JOB, run_at=now - timedelta(seconds=30))
+        jobs.enqueue("other_job", run_at=now - timedelta(seconds=5))
+        jobs.enqueue(self.JOB, delay=60)
+        Job.objects.create(name=self.JOB, status="running", locked_by="w", locked_at=now)
+        Job.objects.create(name=self.JOB, status="done", finished_at=now - timedelta(seconds=10))
+        Job.objects.create(name=self.JOB, status="done", finished_at=now - timedelta(seconds=20))
+        Job.objects.create(name=self.JOB, status="done", finished_at=now - timedelta(hours=1))
+        Job.objects.create(name=self.JOB, status="dead", finished_at=now - timedelta(seconds=10))
+
+        stats = jobs.metrics(window=60)
+        self.assertEqual(stats["by_status"], {"queued": 3, "running": 1, "done": 3, "dead": 1})
+        self.assertEqual(stats["ready"], 2)
+        self.assertEqual(stats["ready_by_name"], {self.JOB: 1, "other_job": 1})
+        self.assertGreaterEqual(stats["lag_seconds"], 30)
+        self.assertLess(stats["lag_seconds"], 40)
+        self.assertEqual(stats["done_per_minute"], 2.0)
+        self.assertEqual(stats["dead_in_window"], 1)
+
+    def test_metrics_when_idle(self):
+        stats = jobs.metrics()
+        self.assertEqual(stats["ready"], 0)
+        self.assertEqual(stats["lag_seconds"], 0.0)
+        self.assertEqual(stats["by_status"], {"queued": 0, "running": 0, "done": 0, "dead": 0})
+
+
+class GenerateDatasetTests(TestCase):
+    """
+    generate_dataset writes the same rows on every run, only inside its id
+    range, and leaves data created through the app alone.
+    """
+
+    OPTIONS = {
+        "users": 120,
+        "petitions": 40,
+        "supports": 150,
+        "evidence": 15,
+        "slots_per_lawyer": 3,
+        "anchor": date(2026, 1, 5),
+        "workers": 0,
+        "batch_size": 25,
+        "id_offset": 1000,
+        "id_range": 1000,
+    }
+
+    def generate(self, **options):
+        out = io.StringIO()
+        call_command("generate_dataset", stdout=out, **{**self.OPTIONS, **options})
+        return out.getvalue()
+
+    def snapshot(self, lookup):
+        return {
+            kind: list(model.objects.filter(**lookup).order_by("pk").values_list())
+            for kind, (model, _) in dataset.BUILDERS.items()
+        }
+
+    def test_rerun_changes_nothing(self):
+        citizen = User.objects.create_user("citizen", password="x", role="citizen")
+        Petition.objects.create(creator=citizen, title="Water", description="d", status="published")
+        app_rows = self.snapshot({"pk__lte": 1000})
+
+        output = self.generate()
+        generated = self.snapshot({"pk__gt": 1000})
+        self.assertEqual(len(generated["users"]), 120)
+        self.assertEqual(len(generated["petitions"]), 40)
+        self.assertTrue(generated["supports"])
+        self.assertIn("petitions            40 row(s) in the generated id range", output)
+
+        self.generate()
+        self.assertEqual(self.snapshot({"pk__gt": 1000}), generated)
+        self.assertEqual(self.snapshot({"pk__lte": 1000}), app_rows)
+
+    def test_app_rows_go_above_the_range(self):
+        self.generate()
+        citizen = User.objects.create_user("citizen", password="x", role="citizen")
+        petition = Petition.objects.create(creator=citizen, title="Water", description="d")
+        self.assertEqual((citizen.pk, petition.pk), (2001, 2001))
+
+        output = self.generate(petitions=60)
+        self.assertIn("petitions            60 row(s) in the generated id range", output)
+        self.assertEqual(Petition.objects.filter(pk__gt=2000).get(), petition)
+
+    def test_volumes_must_fit_the_range(self):
+        with self.assertRaisesMessage(CommandError, "--id-range must be at least"):
+            self.generate(id_range=100)
+
+
+@override_settings(DEPOSITION_SNAPSHOT_INTERVAL=3)
+class DepositionRevisionTests(TestCase):
+    """
+    Autosave applies splices against the version they were made on, keeps
+    snapshots at the root and every interval, and rebuilds any version.
+    """
+
+    def setUp(self):
+        self.citizen = User.objects.create_user("citizen", password="x", role="citizen")
+        self.deposition = Deposition.objects.create(created_by=self.citizen, title="Statement", content="hello world")
+        self.client.force_login(self.citizen)
+
+    def save(self, *ops):
+        self.deposition.refresh_from_db()
+        return revisions.autosave(self.deposition.pk, self.deposition.version, list(ops), author=self.citizen)
+
+    def test_apply_ops(self):
+        ops = [[0, 5, "goodbye"], [8, 0, "cruel "]]
+        self.assertEqual(revisions.apply_ops("hello world", ops), "goodbye cruel world")
+        self.assertEqual(revisions.apply_ops("héllo", [[5, 0, "!"], [1, 1, "e"]]), "hello!")
+        self.assertEqual(revisions.apply_ops("abc", []), "abc")
+
+    def test_apply_ops_rejects_bad_splices(self):
+        bad = [
+            "not a list",
+            [[0, 0]],
+            [["0", 0, "x"]],
+            [[0, 0, 1]],
+            [[-1, 0, "x"]],
+            [[0, -1, "x"]],
+            [[4, 0, "x"]],
+            [[2, 2, ""]],
+            # Later splices see the text the earlier ones left.
+            [[0, 3, ""], [1, 0, "x"]],
+            [[0, 0, "x"]] * (revisions.MAX_OPS + 1),
+        ]
+        for ops in bad:
+            with self.subTest(ops=ops), self.assertRaises(revisions.DeltaError):
+                revisions.apply_ops("abc", ops)
+
+    def test_stale_base_version_conflicts(self):
+        self.assertEqual(self.save([0, 5, "goodbye"]), 1)
+        with self.assertRaises(revisions.EditConflict) as caught:
+            revisions.autosave(self.deposition.pk, 0, [[0, 0, "!"]])
+        self.assertEqual(caught.exception.version, 1)
+
+        response = self.client.patch(
+            f"/api/depositions/{self.deposition.pk}/content/",
+            {"version": 0, "ops": [[0, 0, "!"]]},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()["version"], 1)
+        self.deposition.refresh_from_db()
+        self.assertEqual((self.deposition.content, self.deposition.version), ("goodbye world", 1))
+
+    def test_snapshots_at_root_and_every_interval(self):
+        for n in range(7):
+            self.save([0, 0, str(n)])
+        rows = DepositionRevision.objects.filter(deposition=self.deposition).order_by("version")
+        self.assertEqual([row.version for row in rows], list(range(8)))
+        self.assertEqual([row.version for row in rows if row.snapshot is not None], [0, 3, 6])
+        self.assertIsNone(rows[0].delta)
+        self.assertTrue(all(row.delta is not None for row in rows[1:]))
+
+    def test_rebuild_every_version(self):
+        contents = [self.deposition.content]
+        for n in range(7):
+            self.save([len(contents[-1]), 0, f" {n}"])
+            contents.append(f"{contents[-1]} {n}")
+        for version, content in enumerate(contents):
+            self.assertEqual(revisions.rebuild(self.deposition.pk, version), content)
+        # Version 5 is two deltas past the snapshot at 3.
+        with CaptureQueriesContext(connection) as queries:
+            revisions.rebuild(self.deposition.pk, 5)
+        self.assertEqual(len(queries), 2)
+
+        response = self.client.get(f"/api/depositions/{self.deposition.pk}/versions/5/")
+        self.assertEqual(response.json(), {"version": 5, "content": contents[5]})
+        self.assertEqual(self.client.get(f"/api/depositions/{self.deposition.pk}/versions/8/").status_code, 404)
+
+    def test_rebuild_after_outside_edit_conflicts(self):
+        self.save([0, 0, ">"])
+        # An edit that bypasses autosave leaves the history behind.
+        Deposition.objects.filter(pk=self.deposition.pk).update(content=">hello world, and more")
+        self.save([17, 5, "less"])
+        with self.assertRaises(revisions.DeltaError):
+            revisions.rebuild(self.deposition.pk, 2)
+        response = self.client.get(f"/api/depositions/{self.deposition.pk}/versions/2/")
+        self.assertEqual(response.status_code, 409)
+
+    def test_reorder_exhibits(self):
+        evidence = [
+            Evidence.objects.create(uploader=self.citizen, file=f"evidence/e{n}.pdf", title=f"Exhibit {n}")
+            for n in range(3)
+        ]
+        for n, item in enumerate(evidence):
+            DepositionEvidence.objects.create(deposition=self.deposition, evidence=item, order=n)
+        new_order = [evidence[2].pk, evidence[0].pk, evidence[1].pk]
+        with self.assertNumQueries(2):
+            self.assertEqual(revisions.reorder_exhibits(self.deposition, new_order), 3)
+        placed = DepositionEvidence.objects.filter(deposition=self.deposition).order_by("order")
+        self.assertEqual(list(placed.values_list("evidence_id", flat=True)), new_order)
+
+        for ids in (new_order[:2], new_order + [new_order[0]], [*new_order[:2], 10 ** 6]):
+            with self.subTest(ids=ids), self.assertRaises(ValueError):
+                revisions.reorder_exhibits(self.deposition, ids)
+        response = self.client.post(
+            f"/api/depositions/{self.deposition.pk}/reorder/",
+            {"evidence": new_order[:2]},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(
+            f"/api/depositions/{self.deposition.pk}/reorder/",
+            {"evidence": list(reversed(new_order))},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(placed.values_list("evidence_id", flat=True)), list(reversed(new_order)))
+
+
+class DepositionCompileTests(TestCase):
+    """
+    Compiling renders only exhibits whose content changed, and the export
+    numbers exhibits in their current order.
+    """
+
+    def setUp(self):
+        self.citizen = User.objects.create_user("citizen", password="x", role="citizen")
+        self.deposition = Deposition.objects.create(created_by=self.citizen, title="Statement", content="Narrative")
+        self.evidence = [
+            Evidence.objects.create(uploader=self.citizen, file=f"evidence/e{n}.pdf", title=f"Exhibit title {n}")
+            for n in range(3)
+        ]
+        for n, item in enumerate(self.evidence):
+            DepositionEvidence.objects.create(deposition=self.deposition, evidence=item, order=n)
+
+    def fragments(self):
+        rows = DepositionEvidence.objects.filter(deposition=self.deposition).order_by("order")
+        return list(rows.values_list("fragment_id", flat=True))
+
+    def export(self):
+        return "".join(depositions.stream_html(self.deposition))
+
+    def test_recompile_renders_nothing(self):
+        self.assertEqual(depositions.compile_deposition(self.deposition), 3)
+        first = self.fragments()
+        self.assertNotIn(None, first)
+        self.assertEqual(depositions.compile_deposition(self.deposition), 0)
+        self.assertEqual(self.fragments(), first)
+
+    def test_changed_evidence_renders_one_fragment(self):
+        depositions.compile_deposition(self.deposition)
+        before = self.fragments()
+        self.evidence[1].title = "Renamed"
+        self.evidence[1].save()
+        with mock.patch("core.depositions.render_fragment", wraps=depositions.render_fragment) as render:
+            self.assertEqual(depositions.compile_deposition(self.deposition), 1)
+        self.assertEqual([call.args[0].pk for call in render.call_args_list], [self.evidence[1].pk])
+        after = self.fragments()
+        self.assertEqual((after[0], after[2]), (before[0], before[2]))
+        self.assertNotEqual(after[1], before[1])
+        # The old fragment is no longer placed anywhere.
+        self.assertFalse(EvidenceFragment.objects.filter(pk=before[1]).exists())
+        self.assertIn("Renamed", self.export())
+
+    def test_export_numbers_exhibits_in_order(self):
+        revisions.reorder_exhibits(self.deposition, [item.pk for item in reversed(self.evidence)])
+        html = self.export()
+        numbered = re.findall(r"<h2>Exhibit (\d+)</h2>\s*<h3>Exhibit title (\d+)</h3>", html)
+        self.assertEqual(numbered, [("1", "2"), ("2", "1"), ("3", "0")])
+        self.assertIn("Narrative", html)
+
+    def test_export_renders_missing_fragments(self):
+        depositions.compile_deposition(self.deposition)
+        DepositionEvidence.objects.filter(evidence=self.evidence[0]).update(fragment=None)
+        with mock.patch("core.depositions.compile_deposition"):
+            html = self.export()
+        self.assertNotIn("None", html)
+        self.assertIn("Exhibit title 0", html)
+        self.assertEqual(len(re.findall(r"<h2>Exhibit \d+</h2>", html)), 3)
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class RequestMetricsTests(TestCase):
+    """
+    The middleware files each request under its view, /metrics serves
+    cumulative Prometheus histograms to allowed addresses only, and the
+    whole thing can be switched off.
+    """
+
+    def setUp(self):
+        metrics.reset()
+        self.addCleanup(metrics.reset)
+        caches["board"].clear()
+        citizen = User.objects.create_user("citizen", password="x", role="citizen")
+        Petition.objects.bulk_create([
+            Petition(creator=citizen, title=f"Petition {n}", description="d", status="published") for n in range(3)
+        ])
+
+    def scrape(self):
+        response = self.client.get("/metrics")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/plain; version=0.0.4; charset=utf-8")
+        return response.content.decode()
+
+    def series(self, text, name, view):
+        # {le: cumulative count} for the buckets, plus "sum" and "count".
+        pattern = re.compile(rf'^{name}_(bucket|sum|count){{view="{view}"(?:,le="([^"]+)")?}} (\S+)$', re.M)
+        return {le or kind: float(value) for kind, le, value in pattern.findall(text)}
+
+    def test_metrics_only_for_allowed_addresses(self):
+        self.scrape()
+        self.assertEqual(self.client.get("/metrics", REMOTE_ADDR="10.0.0.8").status_code, 404)
+        with override_settings(METRICS_ALLOWED_IPS=["10.0.0.8"]):
+            self.assertEqual(self.client.get("/metrics").status_code, 404)
+            self.assertEqual(self.client.get("/metrics", REMOTE_ADDR="10.0.0.8").status_code, 200)
+
+    def test_requests_are_labelled_by_view(self):
+        self.client.get("/justice-index/")
+        self.client.get("/justice-index/", {"q": "petition"})
+        self.client.get("/api/petitions/")
+        self.client.get("/no-such-page/")
+        text = self.scrape()
+        self.assertIn('justice_requests_total{view="justice_index",method="GET",status="200"} 2', text)
+        self.assertIn('justice_requests_total{view="petition-list",method="GET",status="200"} 1', text)
+        self.assertIn('justice_requests_total{view="unresolved",method="GET",status="404"} 1', text)
+        # The query string never becomes a label.
+        self.assertNotIn("q=", text)
+
+        queries = self.series(text, "justice_request_sql_queries", "petition-list")
+        rows = self.series(text, "justice_request_sql_rows", "petition-list")
+        self.assertEqual(queries["count"], 1)
+        self.assertGreaterEqual(rows["sum"], 3)
+        template = self.series(text, "justice_request_template_seconds", "justice_index")
+        self.assertEqual(template["count"], 2)
+        self.assertGreater(template["sum"], 0)
+
+    def test_histograms_are_cumulative(self):
+        for value in (0, 1, 3, 3, 50, 5000):
+            stats = metrics.RequestStats()
+            stats.queries = value
+            metrics.record("probe", "GET", 200, stats)
+        buckets = self.series(metrics.render(), "justice_request_sql_queries", "probe")
+        self.assertEqual(
+            buckets,
+            {
+                "0": 1, "1": 2, "2": 2, "5": 4, "10": 4, "20": 4, "50": 5, "100": 5, "200": 5, "500": 5,
+                "1000": 5, "+Inf": 6, "sum": 5057, "count": 6,
+            },
+        )
+        text = metrics.render()
+        self.assertIn('justice_request_duration_seconds_bucket{view="probe",le="0.001"} 6', text)
+        # Streaming responses without a length have no size to observe.
+        self.assertNotIn('justice_response_size_bytes_count{view="probe"}', text)
+        self.assertIn("# TYPE justice_request_sql_queries histogram", text)
+
+    def test_streamed_rows_are_counted(self):
+        stats = metrics.RequestStats()
+        token = metrics._current.set(stats)
+        try:
+            with connection.execute_wrapper(metrics._sql_timer):
+                self.assertEqual(len(list(Petition.objects.iterator(chunk_size=2))), 3)
+                self.assertEqual(Petition.objects.count(), 3)
+        finally:
+            metrics._current.reset(token)
+        self.assertEqual((stats.queries, stats.rows), (2, 4))
+
+    def test_disabled(self):
+        with override_settings(REQUEST_METRICS_ENABLED=False):
+            with self.assertRaises(MiddlewareNotUsed):
+                metrics.RequestMetricsMiddleware(lambda request: None)
+            client = self.client_class()
+            self.assertEqual(client.get("/justice-index/").status_code, 200)
+            self.assertEqual(client.get("/metrics").content.decode().count("justice_requests_total{"), 0)
+
+
+class DatabaseRoutingTests(SimpleTestCase):
+    """
+    Reads go to the read-only replica unless a transaction is open on
+    default, and writes that hit a locked database are retried.
+    """
+
+    # test_wal_mode_connections opens connections of its own.
+    databases = "__all__"
+
+    def setUp(self):
+        self.router = ReadWriteRouter()
+        self.sleep = self.enterContext(mock.patch("core.db.time.sleep"))
+
+    def test_reads_go_to_the_replica_outside_transactions(self):
+        self.enterContext(mock.patch.dict(connections.settings, {READ_ALIAS: connections.settings[DEFAULT_DB_ALIAS]}))
+        self.assertEqual(self.router.db_for_read(Petition), READ_ALIAS)
+        self.assertEqual(self.router.db_for_write(Petition), DEFAULT_DB_ALIAS)
+        with mock.patch.object(connections[DEFAULT_DB_ALIAS], "in_atomic_block", True):
+            self.assertEqual(self.router.db_for_read(Petition), DEFAULT_DB_ALIAS)
+        self.assertTrue(self.router.allow_migrate(DEFAULT_DB_ALIAS, "core"))
+        self.assertFalse(self.router.allow_migrate(READ_ALIAS, "core"))
+
+    def test_reads_stay_on_default_without_a_replica(self):
+        self.enterContext(mock.patch.dict(connections.settings))
+        connections.settings.pop(READ_ALIAS, None)
+        self.assertEqual(self.router.db_for_read(Petition), DEFAULT_DB_ALIAS)
+
+    def flaky(self, *errors):
+        calls = []
+
+        @retry_on_busy
+        def write():
+            calls.append(None)
+            if len(calls) <= len(errors):
+                raise errors[len(calls) - 1]
+            return "written"
+
+        return write, calls
+
+    def test_retries_when_locked(self):
+        write, calls = self.flaky(OperationalError("database is locked"), OperationalError("database is busy"))
+        self.assertEqual(write(), "written")
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(self.sleep.call_count, 2)
+
+    def test_gives_up_after_the_last_attempt(self):
+        write, calls = self.flaky(*[OperationalError("database is locked")] * 5)
+        with self.assertRaisesMessage(OperationalError, "database is locked"):
+            write()
+        self.assertEqual(len(calls), 5)
+
+    def test_other_errors_are_not_retried(self):
+        write, calls = self.flaky(OperationalError("no such table: core_petition"))
+        with self.assertRaisesMessage(OperationalError, "no such table"):
+            write()
+        self.assertEqual(len(calls), 1)
+        self.sleep.assert_not_called()
+
+    def test_no_retry_inside_a_transaction(self):
+        write, calls = self.flaky(OperationalError("database is locked"))
+        with mock.patch.object(connections[DEFAULT_DB_ALIAS], "in_atomic_block", True):
+            with self.assertRaises(OperationalError):
+                write()
+        self.assertEqual(len(calls), 1)
+
+    def test_wal_mode_connections(self):
+        # The test run points replica at default, so build both aliases from
+        # a fresh read of the settings and open them on a scratch file.
+        with mock.patch.dict(os.environ, {"DJANGO_DB_MODE": "sqlite-wal"}):
+            databases = runpy.run_path(importlib.import_module(settings.SETTINGS_MODULE).__file__)["DATABASES"]
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        path = os.path.join(directory, "db.sqlite3")
+        handler = ConnectionHandler({alias: {**databases[alias], "NAME": path} for alias in databases})
+        self.addCleanup(handler.close_all)
+        writer, reader = handler[DEFAULT_DB_ALIAS], handler[READ_ALIAS]
+
+        with writer.cursor() as cursor:
+            cursor.execute("CREATE TABLE t (x integer)")
+            cursor.execute("PRAGMA journal_mode")
+            self.assertEqual(cursor.fetchone(), ("wal",))
+        self.assertEqual(writer.transaction_mode, "IMMEDIATE")
+        with reader.cursor() as cursor:
+            cursor.execute("PRAGMA query_only")
+            self.assertEqual(cursor.fetchone(), (1,))
+            cursor.execute("SELECT count(*) FROM t")
+            with self.assertRaisesMessage(OperationalError, "readonly"):
+                cursor.execute("INSERT INTO t VALUES (1)")
+
+
+class LoadtestReportTests(SimpleTestCase):
+    """
+    Load-test samples become per-endpoint percentiles, and a run is flagged
+    against the baseline only for clear regressions.
+    """
+
+    def stats(self, count=100, errors=0, rps=10.0, p95=100.0, p99=200.0):
+        return {
+            "count": count, "errors": errors, "error_rate": round(errors / count, 4), "throughput_rps": rps,
+            "p50_ms": p95 / 2, "p95_ms": p95, "p99_ms": p99, "max_ms": p99,
+        }
+
+    def test_percentile_is_nearest_rank(self):
+        values = list(range(1, 101))
+        self.assertEqual([percentile(values, pct) for pct in (0, 1, 50, 95, 99, 100)], [1, 1, 50, 95, 99, 100])
+        self.assertEqual(percentile([7], 99), 7)
+        self.assertEqual(percentile([1, 2, 3], 50), 2)
+        self.assertEqual(percentile([], 95), 0.0)
+
+    def test_summarize(self):
+        samples = {
+            "GET /b": [(n / 1000, True) for n in range(1, 101)] + [(5.0, False)] * 4,
+            "GET /a": [(0.2, False)],
+        }
+        summary = summarize(samples, elapsed=2.0)
+        self.assertEqual(list(summary["endpoints"]), ["GET /a", "GET /b"])
+        b = summary["endpoints"]["GET /b"]
+        # Failed requests count towards errors and throughput, not latency.
+        self.assertEqual(
+            b,
+            {
+                "count": 104, "errors": 4, "error_rate": 0.0385, "throughput_rps": 52.0,
+                "p50_ms": 50.0, "p95_ms": 95.0, "p99_ms": 99.0, "max_ms": 100.0,
+            },
+        )
+        self.assertEqual(summary["endpoints"]["GET /a"]["p95_ms"], 0.0)
+        self.assertEqual(summary["endpoints"]["GET /a"]["max_ms"], 0.0)
+        self.assertEqual(summary["total"], {"count": 105, "errors": 5, "error_rate": 0.0476, "throughput_rps": 52.5})
+        self.assertEqual(summarize({}, 1.0)["total"]["error_rate"], 0.0)
+
+    def test_compare_flags_regressions(self):
+        baseline = {"endpoints": {"GET /": self.stats(), "GET /gone": self.stats()}}
+        current = {"endpoints": {"GET /": self.stats(p95=125.0, p99=230.0, rps=7.5, errors=3)}}
+        self.assertEqual(
+            compare(current, baseline, tolerance=0.2),
+            [
+                "GET /: p95_ms 100.0 -> 125.0",
+                "GET /: throughput_rps 10.0 -> 7.5",
+                "GET /: error_rate 0.0 -> 0.03",
+                "GET /gone: not exercised in this run",
+            ],
+        )
+
+    def test_compare_tolerates_noise(self):
+        baseline = {"endpoints": {"GET /": self.stats(), "GET /rare": self.stats(count=5)}}
+        current = {
+            "endpoints": {
+                "GET /": self.stats(p95=119.0, p99=239.0, rps=8.1, errors=1),
+                # Too few requests to judge, however slow.
+                "GET /rare": self.stats(count=5, p95=900.0),
+                # New endpoints have nothing to regress from.
+                "GET /new": self.stats(p95=900.0),
+            }
+        }
+        self.assertEqual(compare(current, baseline, tolerance=0.2), [])
+        self.assertEqual(compare(current, baseline, tolerance=0.1)[0], "GET /: p95_ms 100.0 -> 119.0")
+
+    def test_stored_baseline_is_comparable(self):
+        path = os.path.join(settings.BASE_DIR, "loadtest", "baseline.json")
+        with open(path) as stored:
+            baseline = json.load(stored)
+        self.assertEqual(baseline["meta"]["users"], 20)
+        self.assertTrue(baseline["endpoints"])
+        self.assertEqual(compare(baseline, baseline), [])
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class KeysetPaginationTests(TestCase):
+    """
+    Cursors round-trip, pages break ties on created_at by id without gaps or
+    repeats, the last page has no next link and bad cursors are rejected.
+    """
+
+    def setUp(self):
+        caches["board"].clear()
+        citizen = User.objects.create_user("citizen", password="x", role="citizen")
+        self.petitions = Petition.objects.bulk_create([
+            Petition(creator=citizen, title=f"Petition {n}", description="d", status="published") for n in range(7)
+        ])
+        # Three share one timestamp and four another, so most page edges fall inside a tie.
+        older = timezone.make_aware(datetime(2026, 1, 1, 12))
+        Petition.objects.filter(pk__in=[p.pk for p in self.petitions[:3]]).update(created_at=older)
+        Petition.objects.filter(pk__in=[p.pk for p in self.petitions[3:]]).update(created_at=older + timedelta(hours=1))
+        self.newest_first = [p.pk for p in reversed(self.petitions)]
+
+    def pages(self, ordering=("-created_at", "-id"), page_size=2):
+        ids, cursor = [], None
+        while True:
+            page = paginate(Petition.objects.all(), cursor, page_size, ordering)
+            ids.append([p.pk for p in page])
+            if not page.has_next:
+                return ids
+            cursor = page.next_cursor
+
+    def test_cursor_round_trip(self):
+        moment = timezone.make_aware(datetime(2026, 1, 1, 12, 30, 15, 250))
+        cursor = encode_cursor([moment, 42])
+        self.assertNotIn("=", cursor)
+        self.assertEqual(decode_cursor(cursor), [moment.isoformat(), 42])
+
+        page = paginate(Petition.objects.all(), None, 3)
+        last = page.object_list[-1]
+        self.assertEqual(decode_cursor(page.next_cursor), [last.created_at.isoformat(), self.newest_first[2]])
+        self.assertEqual([p.pk for p in paginate(Petition.objects.all(), page.next_cursor, 3)], self.newest_first[3:6])
+
+    def test_ties_on_created_at_break_by_id(self):
+        for page_size in (1, 2, 3, 4, 7):
+            with self.subTest(page_size=page_size):
+                pages = self.pages(page_size=page_size)
+                self.assertEqual(sum(pages, []), self.newest_first)
+                self.assertTrue(all(len(page) == page_size for page in pages[:-1]))
+        self.assertEqual(sum(self.pages(("created_at", "id"), 2), []), list(reversed(self.newest_first)))
+
+    def test_last_page_has_no_next(self):
+        self.assertEqual(len(self.pages(page_size=7)), 1)
+        self.assertEqual(len(self.pages(page_size=6)), 2)
+
+        url, ids = "/api/petitions/?page_size=3", []
+        while url:
+            body = self.client.get(url).json()
+            ids += [row["id"] for row in body["results"]]
+            url = body["next"]
+        self.assertEqual(ids, self.newest_first)
+
+        response = self.client.get("/justice-index/")
+        self.assertIsNone(response.context["petitions"].next_url)
+        self.assertNotContains(response, "Next page")
+
+    def test_invalid_cursors(self):
+        bad = [
+            "%%%",
+            encode_cursor(["2026-01-01T12:00:00+00:00"]),
+            encode_cursor(["yesterday", 1]),
+            encode_cursor(["2026-01-01T12:00:00+00:00", "one"]),
+            base64.urlsafe_b64encode(b'{"created_at": 1}').decode(),
+        ]
+        for cursor in bad:
+            with self.subTest(cursor=cursor):
+                with self.assertRaises(InvalidCursor):
+                    paginate(Petition.objects.all(), cursor, 2)
+                self.assertEqual(self.client.get("/api/petitions/", {"cursor": cursor}).status_code, 404)
+                # The HTML listings fall back to the first page.
+                response = self.client.get("/justice-index/", {"cursor": cursor})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual([p.pk for p in response.context["petitions"]], self.newest_first)
@@ -0,0 +1,245 @@
+"""
+Resumable, chunked evidence uploads.
+
+A client creates an ``UploadSession`` and then PATCHes the file in chunks,
+each tagged with the byte offset it starts at. Every chunk is written
+straight into a partial file next to the final evidence location. If a
+connection drops mid-chunk, the bytes that did arrive are kept. The client
+asks for the current offset and carries on from there. ``finalize`` hashes
+the partial file and stores it as a content-addressed blob (a rename on
+local storage, or nothing at all if the same content is already stored).
+Only then does it create the ``Evidence`` row.
+
+Writing a chunk and finalizing both first claim the session with a
+conditional UPDATE: at the expected offset, not finalized, and not claimed
+by another request. Only the claimant touches the partial file, so two
+requests racing for the same offset, or two finalize calls, can't both
+write. A claim left by a crashed request lapses after
+``EVIDENCE_UPLOAD_CLAIM_TIMEOUT`` seconds. The digest is always computed
+from the file as stored, so a blob's name matches its contents.
+
+Partial files need a storage backend with local paths (``FileSystemStorage``).
+"""
+import os
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import blobs
+from .models import Evidence, UploadSession
+
+READ_BLOCK_SIZE = 64 * 1024
+PARTIAL_DIR = "evidence/partial"
+
+class UploadError(Exception):
+    """
+    A chunk or finalize request that cannot be applied. ``status`` is the
+    HTTP status the API should answer with.
+    """
+
+    def __init__(self, message, status=400, offset=None):
+        super().__init__(message)
+        self.status = status
+        self.offset = offset
+
+
+def max_upload_size():
+    return getattr(settings, "EVIDENCE_UPLOAD_MAX_SIZE", 2 * 1024 ** 3)
+
+
+def max_chunk_size():
+    return getattr(settings, "EVIDENCE_UPLOAD_MAX_CHUNK", 8 * 1024 ** 2)
+
+
+def claim_timeout():
+    return getattr(settings, "EVIDENCE_UPLOAD_CLAIM_TIMEOUT", 600)
+
+
+def partial_path(session):
+    return default_storage.path(f"{PARTIAL_DIR}/{session.pk}.part")
+
+
+def create_session(uploader, title, filename, total_size, file_type="other", case_tag=""):
+    if total_size > max_upload_size():
+        raise UploadError(f"Uploads are limited to {max_upload_size()} bytes.", status=413)
+    session = UploadSession.objects.create(
+        uploader=uploader,
+        title=title,
+        filename=os.path.basename(filename),
+        total_size=total_size,
+        file_type=file_type,
+        case_tag=case_tag,
+    )
+    path = partial_path(session)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open(path, "wb").close()
+    return session
+
+
+def _claim(session, offset):
+    """
+    Claim ``session`` at ``offset`` for this request and return the claim
+    token. Raises a 409 carrying the current offset if the upload has moved
+    on, was finalized, or another request holds it.
+    """
+    token = uuid.uuid4()
+    now = timezone.now()
+    claimed = (
+        UploadSession.objects.filter(pk=session.pk, offset=offset, evidence__isnull=True)
+        .filter(Q(claim__isnull=True) | Q(claimed_until__lt=now))
+        .update(claim=token, claimed_until=now + timedelta(seconds=claim_timeout()))
+    )
+    if not claimed:
+        session.refresh_from_db(fields=["offset", "evidence", "claim", "claimed_until"])
+        if session.offset == offset and session.evidence_id is None:
+            raise UploadError("Another request is writing this upload.", status=409, offset=session.offset)
+        raise UploadError("Offset does not match the upload.", status=409, offset=session.offset)
+    return token
+
+
+def write_chunk(session, offset, stream, length):
+    """
+    Write ``length`` bytes read from ``stream`` at ``offset``.
+
+    Returns the new offset. If the client goes away mid-chunk, the bytes
+    that did arrive are kept and the error is re-raised. Chunks must be sent
+    one at a time; a chunk for a stale offset, or one sent while another is
+    still being written, gets a 409 that carries the current offset.
+    """
+    if offset != session.offset:
+        raise UploadError("Offset does not match the upload.", status=409, offset=session.offset)
+    if length <= 0:
+        raise UploadError("Empty chunk.")
+    if length > max_chunk_size():
+        raise UploadError(f"Chunks are limited to {max_chunk_size()} bytes.", status=413)
+    if offset + length > session.total_size:
+        raise UploadError("Chunk runs past the declared upload size.", status=413)
+
+    token = _claim(session, offset)
+    written = 0
+    error = None
+    try:
+        with open(partial_path(session), "r+b") as fh:
+            fh.seek(offset)
+            try:
+                while written < length:
+                    block = stream.read(min(READ_BLOCK_SIZE, length - written))
+                    if not block:
+                        break
+                    fh.write(block)
+                    written += len(block)
+            except OSError as exc:
+                error = exc
+            fh.truncate(offset + written)
+    finally:
+        # Releases the claim even if the write itself failed.
+        advanced = UploadSession.objects.filter(pk=session.pk, claim=token).update(
+            offset=offset + written, claim=None, claimed_until=None, updated_at=timezone.now()
+        )
+    if not advanced:
+        # The claim lapsed and another request took the session over.
+        session.refresh_from_db(fields=["offset"])
+        raise UploadError("Offset does not match the upload.", status=409, offset=session.offset)
+
+    session.offset = offset + written
+    if error is not None:
+        raise error
+    return session.offset
+
+
+class _PartialFile(File):
+    # FileSystemStorage renames files that expose a temporary path instead
+    # of copying them, so storing a multi-gigabyte upload is instant.
+    def temporary_file_path(self):
+        return self.file.name
+
+
+def finalize(session, expected_sha256=""):
+    """
+    Move a completed upload into evidence storage and create its ``Evidence``.
+    Finalizing an upload that already has one returns it.
+    """
+    if session.evidence_id:
+        return session.evidence
+    if session.offset != session.total_size:
+        raise UploadError(
+            f"Upload is incomplete ({session.offset} of {session.total_size} bytes).",
+            status=409,
+            offset=session.offset,
+        )
+
+    try:
+        token = _claim(session, session.total_size)
+    except UploadError:
+        if session.evidence_id:
+            return session.evidence
+        raise UploadError("This upload is already being finalized.", status=409, offset=session.offset)
+
+    try:
+        with open(partial_path(session), "rb") as fh:
+            digest = blobs.hash_file(fh)
+        if expected_sha256 and expected_sha256.lower() != digest:
+            raise UploadError("Checksum mismatch; the upload is corrupt.", status=422)
+        with open(partial_path(session), "rb") as fh:
+            blob = blobs.store(_PartialFile(fh), digest, session.total_size, session.filename)
+    except BaseException:
+        UploadSession.objects.filter(pk=session.pk, claim=token).update(claim=None, claimed_until=None)
+        raise
+    # Content that was already stored leaves the partial file behind.
+    try:
+        os.remove(partial_path(session))
+    except FileNotFoundError:
+        pass
+
+    evidence = Evidence(
+        uploader=session.uploader,
+        title=session.title,
+        file_type=session.file_type,
+        case_tag=session.case_tag,
+    )
+    blobs.attach(evidence, blob)
+
+    try:
+        with transaction.atomic():
+            evidence.save()
+            finished = UploadSession.objects.filter(pk=session.pk, claim=token).update(
+                sha256=digest, evidence=evidence, claim=None, claimed_until=None, updated_at=timezone.now()
+            )
+            if not finished:
+                # The claim lapsed and another request finalized the upload.
+                raise UploadError("This upload was finalized by another request.", status=409)
+    except UploadError:
+        blobs.release(blob.pk)
+        raise
+    session.sha256 = digest
+    session.evidence = evidence
+    return evidence
+
+
+def abort(session):
+    try:
+        os.remove(partial_path(session))
+    except FileNotFoundError:
+        pass
+    session.delete()
+
+
+def purge_expired(max_age=None):
+    """
+    Delete unfinished sessions (and their partial files) idle for longer
+    than ``EVIDENCE_UPLOAD_SESSION_TTL`` seconds. Returns how many went.
+    """
+    max_age = max_age or getattr(settings, "EVIDENCE_UPLOAD_SESSION_TTL", 24 * 3600)
+    cutoff = timezone.now() - timedelta(seconds=max_age)
+    expired = UploadSession.objects.filter(evidence__isnull=True, updated_at__lt=cutoff)
+    count = 0
+    for session in expired.iterator():
+        abort(session)
+        count += 1
+    return count
@@ -32,6 +32,7 @@ from .views import (
     RegisterAPI,
     EvidenceUploadAPI,
     join_petition,
+    unsupport_petition,
     approve_petition,
     submit_for_review,
     petition_detail,     # ✅ add this line
@@ -50,6 +51,10 @@ urlpatterns = [
     path("dashboard/", views.dashboard, name="dashboard"),
     path("justice-index/", views.justice_index, name="justice_index"),
     path("evidences/", views.evidence_list, name="evidence_list"),
+    path("evidences/<int:pk>/download/", views.evidence_download, name="evidence_download"),
+    path("evidences/<int:pk>/preview/", views.evidence_preview, name="evidence_preview"),
+    path("depositions/<int:pk>/export/", views.deposition_export, name="deposition_export"),
+    path("audit/export/", views.audit_export, name="audit_export"),
     path("petitions/", views.petition_list, name="petition_list"),
     path("petitions/create/", views.petition_create, name="petition_create"),
     path("petitions/<int:pk>/", petition_detail, name="petition_detail"),
@@ -58,9 +63,28 @@ urlpatterns = [
     # --- REST API ---
     path("api/register/", RegisterAPI.as_view(), name="api-register"),
     path("api/upload-evidence/", EvidenceUploadAPI.as_view(), name="api-upload-evidence"),
+    path("api/uploads/", views.UploadSessionCreateAPI.as_view(), name="api-upload-sessions"),
+    path("api/uploads/<uuid:pk>/", views.upload_session_detail, name="api-upload-session"),
+    path("api/uploads/<uuid:pk>/finalize/", views.upload_session_finalize, name="api-upload-session-finalize"),
     path("api/petition/<int:pk>/join/", join_petition, name="api-join-petition"),
+    path("api/petition/<int:pk>/unsupport/", unsupport_petition, name="api-unsupport-petition"),
     path("api/petition/<int:pk>/approve/", approve_petition, name="api-approve-petition"),
+    path("api/petition/moderate/", views.moderate_petitions, name="api-moderate-petitions"),
     path("api/petition/<int:pk>/submit-for-review/", submit_for_review, name="api-submit-for-review"),
+    path("api/slots/available/", views.available_slots_api, name="api-available-slots"),
+    path("api/slots/generate/", views.generate_slots, name="api-generate-slots"),
+    path("api/slots/<int:pk>/book/", views.book_slot, name="api-book-slot"),
+    path("api/bookings/<int:pk>/confirm/", views.confirm_booking, name="api-confirm-booking"),
+    path("api/bookings/<int:pk>/cancel/", views.cancel_booking, name="api-cancel-booking"),
+    path("api/board-cache/stats/", views.board_cache_stats, name="api-board-cache-stats"),
+    path("api/depositions/<int:pk>/compile/", views.compile_deposition, name="api-compile-deposition"),
+    path("api/depositions/<int:pk>/content/", views.deposition_content, name="api-deposition-content"),
+    path("api/depositions/<int:pk>/versions/", views.deposition_versions, name="api-deposition-versions"),
+    path("api/depositions/<int:pk>/versions/<int:version>/", views.deposition_version, name="api-deposition-version"),
+    path("api/depositions/<int:pk>/reorder/", views.reorder_deposition, name="api-reorder-deposition"),
+    path("api/jobs/metrics/", views.job_metrics, name="api-job-metrics"),
+    path("api/dashboard/summary/", views.dashboard_summary, name="api-dashboard-summary"),
+    path("metrics", views.request_metrics, name="metrics"),
 
     path("api/", include(router.urls)),
 ]
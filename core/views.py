@@ -1,20 +1,38 @@
+from datetime import timedelta
+
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import login, authenticate, logout
 from django.contrib.auth.decorators import login_required
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework import viewsets, permissions, generics, status
 from rest_framework.response import Response
-from .models import Evidence, Petition, ConsultationSlot, Deposition
+from .models import Evidence, Petition, ConsultationSlot, ConsultationBooking, Deposition, DepositionRevision, UploadSession
+from .search import search_petitions, highlight
+from .pagination import paginate_request
+from .supporters import add_support, remove_support, supporter_count
+from .audit import audited
+from .downloads import visible_evidence
+from .slots import MAX_WINDOW, available_slots, generate_recurring
+from . import audit, audit_archive, blobs, board_cache, bookings, counters, depositions, downloads, jobs, metrics, moderation, processing, revisions, summary, uploads
 from .serializers import (
+    AvailableSlotSerializer,
     PetitionListSerializer,
     PetitionCreateSerializer,
     EvidenceSerializer,
     RegisterSerializer,
+    UploadSessionSerializer,
 )
 
 from django.contrib import messages
 from django.views.decorators.csrf import csrf_exempt
-from django.db.models import Q
+from django.db.models import Prefetch
+from django.core.exceptions import PermissionDenied
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseBadRequest, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime, parse_time
+from django.utils.decorators import method_decorator
+from django.utils.text import slugify
+from django.views.decorators.http import require_safe
 
 
 def home(request):
@@ -29,6 +47,7 @@ def register_page(request):
         if User.objects.filter(username=username).exists():
             return render(request, "register.html", {"error": "Username already exists"})
         u = User.objects.create_user(username=username, password=password, role=role)
+        audit.record("user.register", u, object=u.pk)
         login(request, u)
         return redirect("dashboard")
     return render(request, "register.html")
@@ -58,6 +77,69 @@ def evidence_list(request):
     evidences = Evidence.objects.filter(uploader=request.user)
     return render(request, "evidence_list.html", {"evidences": evidences})
 
+@login_required
+@require_safe
+def evidence_download(request, pk):
+    """
+    Serve an evidence file to users allowed to see it, with Range and ETag
+    support (see core/downloads.py). Anything else is a 404.
+    """
+    evidence = get_object_or_404(visible_evidence(request.user).select_related("blob"), pk=pk)
+    return downloads.serve(request, evidence)
+
+@login_required
+@require_safe
+def evidence_preview(request, pk):
+    evidence = get_object_or_404(visible_evidence(request.user).exclude(preview=""), pk=pk)
+    return downloads.serve_preview(request, evidence)
+
+def _own_deposition(user, pk):
+    queryset = Deposition.objects.select_related("created_by")
+    if user.role != "admin":
+        queryset = queryset.filter(created_by=user)
+    return get_object_or_404(queryset, pk=pk)
+
+@login_required
+@require_safe
+def deposition_export(request, pk):
+    """
+    Stream a compiled deposition as HTML, or as a PDF with ?format=pdf.
+    """
+    deposition = _own_deposition(request.user, pk)
+    if request.GET.get("format") == "pdf":
+        pdf = depositions.export_pdf(deposition)
+        filename = f"{slugify(deposition.title) or 'deposition'}.pdf"
+        return FileResponse(pdf, as_attachment=True, filename=filename, content_type="application/pdf")
+    return StreamingHttpResponse(depositions.stream_html(deposition), content_type="text/html; charset=utf-8")
+
+@login_required
+@require_safe
+def audit_export(request):
+    """
+    Admins stream audit events between ?start= and ?end= (ISO dates or
+    times) as NDJSON, or as CSV with ?format=csv. ?user= (an id) and
+    ?action= narrow it down. Archived months are included.
+    """
+    if request.user.role != "admin" and not request.user.is_superuser:
+        raise PermissionDenied
+    try:
+        start = _parse_moment(request.GET.get("start"), "start")
+        end = _parse_moment(request.GET.get("end"), "end")
+        user_id = int(request.GET["user"]) if request.GET.get("user") else None
+    except ValueError as exc:
+        return HttpResponseBadRequest(str(exc))
+    if end <= start:
+        return HttpResponseBadRequest("end must be after start.")
+    events = audit_archive.iter_events(start, end, user_id=user_id, action=request.GET.get("action") or None)
+    if request.GET.get("format") == "csv":
+        body, content_type, extension = audit_archive.export_csv(events), "text/csv; charset=utf-8", "csv"
+    else:
+        body, content_type, extension = audit_archive.export_ndjson(events), "application/x-ndjson", "ndjson"
+    response = StreamingHttpResponse(body, content_type=content_type)
+    filename = f"audit-{start:%Y%m%d}-{end:%Y%m%d}.{extension}"
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
 @login_required
 def petition_list(request):
     """
@@ -65,7 +147,9 @@ def petition_list(request):
     """
     from .models import Petition, Evidence
 
-    petitions = Petition.objects.filter(creator=request.user).prefetch_related("evidences")
+    petitions = paginate_request(
+        request, counters.with_live_counts(Petition.objects.filter(creator=request.user)).prefetch_related("evidences")
+    )
     evidences = Evidence.objects.filter(uploader=request.user)
 
     # Define these choices manually since they're not in the model
@@ -96,7 +180,16 @@ def petition_list(request):
 
 @login_required
 def consultation_list(request):
-    slots = ConsultationSlot.objects.filter(lawyer=request.user) if request.user.role == "lawyer" else ConsultationSlot.objects.all()
+    now = timezone.now()
+    if request.user.role == "lawyer":
+        slots = (
+            ConsultationSlot.objects.filter(lawyer=request.user, start_time__gte=now)
+            .select_related("lawyer")
+            .order_by("start_time", "id")
+        )
+    else:
+        # Citizens see what they can book over the next two weeks.
+        slots = available_slots(now, now + timedelta(days=14))
     return render(request, "consultation_list.html", {"slots": slots})
 
 @login_required
@@ -107,42 +200,85 @@ def deposition_list(request):
 @login_required
 def dashboard(request):
     if request.user.role == "admin":
-        petitions = Petition.objects.filter(status="pending")
+        # Moderation queue, oldest submission first.
+        petitions = paginate_request(
+            request,
+            counters.with_live_counts(Petition.objects.filter(status="pending")).select_related("creator"),
+            ordering=("created_at", "id"),
+        )
         return render(request, "dashboard.html", {"admin_view": True, "petitions": petitions})
 
     if request.user.role == "lawyer":
-        slots = ConsultationSlot.objects.filter(lawyer=request.user)
+        slots = paginate_request(
+            request, ConsultationSlot.objects.filter(lawyer=request.user), ordering=("start_time", "id")
+        )
         return render(request, "dashboard.html", {"lawyer_view": True, "slots": slots})
 
-    evidences = Evidence.objects.filter(uploader=request.user)
-    petitions = Petition.objects.filter(creator=request.user)
+    evidences = paginate_request(
+        request,
+        Evidence.objects.filter(uploader=request.user),
+        ordering=("-uploaded_at", "-id"),
+        param="evidence_cursor",
+    )
+    petitions = paginate_request(request, counters.with_live_counts(Petition.objects.filter(creator=request.user)))
     return render(request, "dashboard.html", {"citizen_view": True, "evidences": evidences, "petitions": petitions})
    
 @login_required
 def dashboard2(request):
     if request.user.role == "admin":
-        petitions = Petition.objects.filter(status="pending")
-        return render(request, "dash.html", {"admin_view": True, "petitions": petitions})
+        # Moderation queue, oldest submission first.
+        petitions = paginate_request(
+            request,
+            counters.with_live_counts(Petition.objects.filter(status="pending")).select_related("creator"),
+            ordering=("created_at", "id"),
+        )
+        return render(
+            request, "dash.html", {"admin_view": True, "petitions": petitions, "summary": summary.site()}
+        )
 
     if request.user.role == "lawyer":
-        slots = ConsultationSlot.objects.filter(lawyer=request.user)
-        return render(request, "dash.html", {"lawyer_view": True, "slots": slots})
+        slots = paginate_request(
+            request, ConsultationSlot.objects.filter(lawyer=request.user), ordering=("start_time", "id")
+        )
+        return render(
+            request, "dash.html", {"lawyer_view": True, "slots": slots, "summary": summary.for_user(request.user)}
+        )
 
-    evidences = Evidence.objects.filter(uploader=request.user)
-    petitions = Petition.objects.filter(creator=request.user)
-    return render(request, "dash.html", {"citizen_view": True, "evidences": evidences, "petitions": petitions})
+    evidences = paginate_request(
+        request,
+        Evidence.objects.filter(uploader=request.user),
+        ordering=("-uploaded_at", "-id"),
+        param="evidence_cursor",
+    )
+    petitions = paginate_request(
+        request, counters.with_live_counts(Petition.objects.filter(creator=request.user)).select_related("creator")
+    )
+    return render(request, "dash.html", {
+        "citizen_view": True,
+        "evidences": evidences,
+        "petitions": petitions,
+        "summary": summary.for_user(request.user),
+    })
 
+@board_cache.cache_board_page
 def justice_index(request):
     """
     Public page showing all approved/published petitions.
     """
     query = request.GET.get("q", "").strip()
-    petitions = Petition.objects.filter(status="published").order_by("-created_at")
+    petitions = (
+        counters.with_live_counts(Petition.objects.filter(status="published"))
+        .select_related("creator")
+        .order_by("-created_at")
+    )
 
     if query:
-        petitions = petitions.filter(
-            Q(title__icontains=query) | Q(category__icontains=query)
-        )
+        # Ranked full-text search over title, description and category.
+        petitions = search_petitions(petitions, query)
+
+    petitions = paginate_request(request, petitions)
+    for p in petitions:
+        p.search_snippet = highlight(getattr(p, "search_snippet", ""))
 
     return render(request, "justice_index.html", {
         "petitions": petitions,
@@ -155,9 +291,16 @@ class PetitionViewSet(viewsets.ModelViewSet):
     Citizens can view their own petitions.
     Admin can view all.
     Public can view published ones.
+
+    Queries per action, independent of page size (plus the usual session
+    and user lookups for logged-in requests):
+      list      2 (page of petitions joined to creator, evidences + uploaders)
+      retrieve  2 (same, for one petition)
     """
     queryset = Petition.objects.all().select_related("creator")
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    # Keyset pagination order (see core.pagination); ?search= pages by rank.
+    keyset_ordering = ("-created_at", "-id")
 
     def get_serializer_class(self):
         # Use different serializer for create vs list/detail
@@ -170,21 +313,125 @@ class PetitionViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         user = self.request.user
-        if user.is_authenticated and user.role == "admin":
-            return Petition.objects.all()
-        elif user.is_authenticated:
-            return Petition.objects.filter(creator=user)
-        else:
-            return Petition.objects.filter(status="published", visibility="public")
+        queryset = super().get_queryset()
+        if not user.is_authenticated:
+            queryset = queryset.filter(status="published", visibility="public")
+        elif user.role != "admin":
+            queryset = queryset.filter(creator=user)
 
+        if self.action in ["list", "retrieve"]:
+            # PetitionListSerializer nests evidences and their uploaders and
+            # shows the live supporter count.
+            queryset = counters.with_live_counts(queryset).prefetch_related(
+                Prefetch("evidences", queryset=Evidence.objects.select_related("uploader"))
+            )
+
+        # ?search= runs the same full-text search as the public board.
+        search = self.request.query_params.get("search", "").strip()
+        if search and self.action == "list":
+            queryset = search_petitions(queryset, search)
+        return queryset
+
+@method_decorator(audited("evidence.upload"), name="create")
 class EvidenceUploadAPI(generics.CreateAPIView):
     serializer_class = EvidenceSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def perform_create(self, serializer):
-        serializer.save(uploader=self.request.user)
+        # Identical files share one stored blob (see core/blobs.py).
+        blob = blobs.store_upload(serializer.validated_data["file"])
+        try:
+            evidence = serializer.save(uploader=self.request.user, blob=blob, file=blob.file.name, size_bytes=blob.size_bytes)
+        except Exception:
+            blobs.release(blob.pk)
+            raise
+        processing.schedule(evidence.pk)
+
 
+class UploadSessionCreateAPI(generics.CreateAPIView):
+    """
+    Start a resumable evidence upload. The client then PATCHes chunks to the
+    returned session and finalizes it (see core/uploads.py).
+    """
+    serializer_class = UploadSessionSerializer
+    permission_classes = [permissions.IsAuthenticated]
 
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            session = uploads.create_session(request.user, **serializer.validated_data)
+        except uploads.UploadError as exc:
+            return Response({"error": str(exc)}, status=exc.status)
+        return Response(
+            self.get_serializer(session).data,
+            status=status.HTTP_201_CREATED,
+            headers={"Upload-Offset": "0", "Location": request.build_absolute_uri(f"{session.pk}/")},
+        )
+
+
+def _upload_error(exc):
+    headers = {"Upload-Offset": str(exc.offset)} if exc.offset is not None else {}
+    return Response({"error": str(exc), "offset": exc.offset}, status=exc.status, headers=headers)
+
+
+@api_view(["GET", "PATCH", "DELETE"])
+@permission_classes([permissions.IsAuthenticated])
+def upload_session_detail(request, pk):
+    """
+    GET reports how far an upload got, PATCH appends the chunk in the request
+    body at the offset given in the Upload-Offset header, DELETE aborts.
+    """
+    session = get_object_or_404(UploadSession, pk=pk, uploader=request.user)
+
+    if request.method == "GET":
+        return Response(UploadSessionSerializer(session).data, headers={"Upload-Offset": str(session.offset)})
+
+    if session.evidence_id:
+        return Response({"error": "This upload has already been finalized."}, status=status.HTTP_409_CONFLICT)
+
+    if request.method == "DELETE":
+        uploads.abort(session)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    try:
+        offset = int(request.headers["Upload-Offset"])
+        length = int(request.headers.get("Content-Length") or 0)
+    except (KeyError, ValueError):
+        return Response({"error": "Upload-Offset and Content-Length headers are required."}, status=400)
+
+    try:
+        new_offset = uploads.write_chunk(session, offset, request.stream, length)
+    except uploads.UploadError as exc:
+        return _upload_error(exc)
+    except OSError:
+        # Client went away mid-chunk; what arrived is kept for resuming.
+        return Response({"error": "Chunk was interrupted.", "offset": session.offset}, status=400,
+                        headers={"Upload-Offset": str(session.offset)})
+    return Response({"offset": new_offset}, headers={"Upload-Offset": str(new_offset)})
+
+
+@api_view(["POST"])
+@permission_classes([permissions.IsAuthenticated])
+@audited("evidence.upload")
+def upload_session_finalize(request, pk):
+    """
+    Turn a fully uploaded session into an Evidence record. An optional
+    "sha256" in the body is checked against the digest computed server-side.
+    """
+    session = get_object_or_404(UploadSession, pk=pk, uploader=request.user)
+    if session.evidence_id:
+        # Finalized already (a retried request): nothing new to process.
+        return Response(EvidenceSerializer(session.evidence).data)
+    try:
+        evidence = uploads.finalize(session, request.data.get("sha256", ""))
+    except uploads.UploadError as exc:
+        return _upload_error(exc)
+    processing.schedule(evidence.pk)
+    return Response(EvidenceSerializer(evidence).data, status=status.HTTP_201_CREATED)
+
+
+@method_decorator(audited("user.register"), name="create")
 class RegisterAPI(generics.CreateAPIView):
     """
     Simple API endpoint for user registration (Citizen/Lawyer/Admin)
@@ -209,50 +456,363 @@ class RegisterAPI(generics.CreateAPIView):
 
 @api_view(["POST"])
 @permission_classes([permissions.IsAuthenticated])
+@audited("petition.join")
 def join_petition(request, pk):
     """
     Citizens can support a petition (join).
     """
-    petition = get_object_or_404(Petition, pk=pk)
     user = request.user
 
     # Simple rule: only citizens can join petitions
     if user.role != "citizen":
         return Response({"error": "Only citizens can support petitions."}, status=403)
 
-    # Add the user to supporters if not already
-    if petition.supporters.filter(id=user.id).exists():
+    # Insert-or-ignore; the count only moves when a new row was inserted.
+    if not add_support(pk, user.id):
+        if not Petition.objects.filter(pk=pk).exists():
+            raise Http404("No Petition matches the given query.")
         return Response({"message": "You already supported this petition."})
-    else:
-        petition.supporters.add(user)
-        petition.supporter_count = petition.supporters.count()
-        petition.save()
+
+    return Response(
+        {"message": "You supported this petition!", "supporters": supporter_count(pk)},
+        status=status.HTTP_200_OK,
+    )
+
+
+@api_view(["POST"])
+@permission_classes([permissions.IsAuthenticated])
+def unsupport_petition(request, pk):
+    """
+    Citizens can withdraw their support from a petition.
+    """
+    user = request.user
+
+    if not remove_support(pk, user.id):
+        if not Petition.objects.filter(pk=pk).exists():
+            raise Http404("No Petition matches the given query.")
+        return Response({"message": "You have not supported this petition."})
+
+    return Response(
+        {"message": "You withdrew your support.", "supporters": supporter_count(pk)},
+        status=status.HTTP_200_OK,
+    )
+
+
+@api_view(["POST"])
+@permission_classes([permissions.IsAuthenticated])
+def book_slot(request, pk):
+    """
+    Citizens hold a consultation slot; the hold must be confirmed within
+    CONSULTATION_HOLD_SECONDS. Losing the race for a slot is a 409.
+    """
+    if request.user.role != "citizen":
+        return Response({"error": "Only citizens can book consultations."}, status=403)
+    try:
+        booking = bookings.hold(pk, request.user)
+    except bookings.SlotUnavailable as exc:
+        if not ConsultationSlot.objects.filter(pk=pk).exists():
+            raise Http404("No ConsultationSlot matches the given query.")
+        return Response({"error": str(exc)}, status=status.HTTP_409_CONFLICT)
+    held_until = ConsultationSlot.objects.values_list("held_until", flat=True).get(pk=pk)
+    return Response(
+        {"booking": booking.pk, "slot": pk, "held_until": held_until, "confirmed": False},
+        status=status.HTTP_201_CREATED,
+    )
+
+
+def _parse_moment(value, field):
+    moment = parse_datetime(value) if value else None
+    if moment is None:
+        raise ValueError(f"{field} must be an ISO 8601 date and time.")
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+@api_view(["GET"])
+@permission_classes([permissions.IsAuthenticated])
+def available_slots_api(request):
+    """
+    Free consultation slots that fit in ?start= .. ?end= (at most 31 days),
+    optionally for one ?lawyer= and at least ?minutes= long.
+    """
+    try:
+        start = _parse_moment(request.query_params.get("start"), "start")
+        end = _parse_moment(request.query_params.get("end"), "end")
+        lawyer = request.query_params.get("lawyer")
+        lawyer = int(lawyer) if lawyer else None
+        minutes = int(request.query_params.get("minutes") or 0)
+    except ValueError as exc:
+        return Response({"error": str(exc)}, status=400)
+    if end <= start or end - start > MAX_WINDOW:
+        return Response({"error": f"end must be after start and at most {MAX_WINDOW.days} days later."}, status=400)
+    found = available_slots(start, end, lawyer=lawyer, min_duration=minutes)
+    return Response(AvailableSlotSerializer(found, many=True).data)
+
+
+@api_view(["POST"])
+@permission_classes([permissions.IsAuthenticated])
+def generate_slots(request):
+    """
+    Lawyers create a recurring weekly schedule in one go, e.g.
+    {"start_date": "2026-11-02", "end_date": "2027-01-29", "weekdays": [0, 1, 2, 3, 4],
+    "start": "10:00", "end": "16:00", "minutes": 30}. Slots that would overlap
+    existing ones are skipped.
+    """
+    if request.user.role != "lawyer":
+        return Response({"error": "Only lawyers can create consultation slots."}, status=403)
+    data = request.data
+    try:
+        first_day = parse_date(str(data.get("start_date", "")))
+        last_day = parse_date(str(data.get("end_date", "")))
+        day_start = parse_time(str(data.get("start", "")))
+        day_end = parse_time(str(data.get("end", "")))
+        weekdays = {int(day) for day in data.get("weekdays", range(5))}
+        minutes = int(data.get("minutes", 30))
+    except (TypeError, ValueError):
+        return Response({"error": "Invalid schedule."}, status=400)
+    if None in (first_day, last_day, day_start, day_end) or not weekdays <= set(range(7)):
         return Response(
-            {"message": "You supported this petition!", "supporters": petition.supporter_count},
-            status=status.HTTP_200_OK,
+            {"error": "start_date, end_date (YYYY-MM-DD), start, end (HH:MM) and weekdays (0=Monday..6) are required."},
+            status=400,
+        )
+    if last_day < first_day:
+        return Response({"error": "end_date must not be before start_date."}, status=400)
+    try:
+        created, skipped = generate_recurring(
+            request.user, first_day, last_day, weekdays, day_start, day_end, minutes
         )
+    except ValueError as exc:
+        return Response({"error": str(exc)}, status=400)
+    return Response({"created": created, "skipped": skipped}, status=status.HTTP_201_CREATED)
 
 
 @api_view(["POST"])
 @permission_classes([permissions.IsAuthenticated])
-def approve_petition(request, pk):
+def confirm_booking(request, pk):
+    booking = get_object_or_404(ConsultationBooking, pk=pk, user=request.user)
+    try:
+        bookings.confirm(booking)
+    except bookings.HoldExpired as exc:
+        return Response({"error": str(exc)}, status=status.HTTP_409_CONFLICT)
+    return Response({"booking": booking.pk, "slot": booking.slot_id, "confirmed": True})
+
+
+@api_view(["POST"])
+@permission_classes([permissions.IsAuthenticated])
+def cancel_booking(request, pk):
+    booking = get_object_or_404(ConsultationBooking, pk=pk, user=request.user)
+    bookings.cancel(booking)
+    return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+@api_view(["GET"])
+@permission_classes([permissions.IsAuthenticated])
+def board_cache_stats(request):
     """
-    Admins approve submitted petitions.
+    Admins can see hit/miss counters for the public board cache.
     """
-    petition = get_object_or_404(Petition, pk=pk)
-    user = request.user
+    if request.user.role != "admin":
+        return Response({"error": "Only admins can view cache statistics."}, status=403)
+    return Response(board_cache.stats())
 
-    if user.role != "admin":
+
+@api_view(["POST"])
+@permission_classes([permissions.IsAuthenticated])
+def compile_deposition(request, pk):
+    """
+    Queue a background compile of a deposition's exhibit sections.
+    """
+    deposition = _own_deposition(request.user, pk)
+    job = jobs.enqueue("compile_deposition", {"deposition_id": deposition.pk})
+    return Response({"job": job.pk}, status=status.HTTP_202_ACCEPTED)
+
+
+@api_view(["GET", "PATCH"])
+@permission_classes([permissions.IsAuthenticated])
+def deposition_content(request, pk):
+    """
+    GET returns the content and its version. PATCH autosaves edits sent as
+    {"version": <base version>, "ops": [[position, delete, insert], ...]};
+    a stale base version gets a 409 with the current version.
+    """
+    deposition = _own_deposition(request.user, pk)
+    if request.method == "GET":
+        return Response({"version": deposition.version, "content": deposition.content})
+
+    try:
+        version = revisions.autosave(
+            deposition.pk, int(request.data.get("version", -1)), request.data.get("ops"), author=request.user
+        )
+    except revisions.EditConflict as exc:
+        return Response({"error": str(exc), "version": exc.version}, status=status.HTTP_409_CONFLICT)
+    except (revisions.DeltaError, TypeError, ValueError) as exc:
+        return Response({"error": str(exc)}, status=400)
+    return Response({"version": version})
+
+
+@api_view(["GET"])
+@permission_classes([permissions.IsAuthenticated])
+def deposition_versions(request, pk):
+    """
+    Newest autosaves first; ?before=<version> pages back through history.
+    """
+    deposition = _own_deposition(request.user, pk)
+    history = deposition.revisions.order_by("-version")
+    if request.GET.get("before", "").isdigit():
+        history = history.filter(version__lt=int(request.GET["before"]))
+    rows = history.values("version", "author__username", "created_at")[:100]
+    return Response({"current": deposition.version, "results": list(rows)})
+
+
+@api_view(["GET"])
+@permission_classes([permissions.IsAuthenticated])
+def deposition_version(request, pk, version):
+    deposition = _own_deposition(request.user, pk)
+    try:
+        content = revisions.rebuild(deposition.pk, version)
+    except DepositionRevision.DoesNotExist as exc:
+        return Response({"error": str(exc)}, status=404)
+    except revisions.DeltaError as exc:
+        # The content was changed outside autosave, so the stored edits no
+        # longer fit the snapshot they are replayed on.
+        return Response(
+            {"error": f"Version {version} can't be rebuilt from the history: {exc}"},
+            status=status.HTTP_409_CONFLICT,
+        )
+    return Response({"version": version, "content": content})
+
+
+@api_view(["POST"])
+@permission_classes([permissions.IsAuthenticated])
+def reorder_deposition(request, pk):
+    """
+    Reorder exhibits with {"evidence": [evidence ids in the new order]}.
+    """
+    deposition = _own_deposition(request.user, pk)
+    try:
+        revisions.reorder_exhibits(deposition, [int(eid) for eid in request.data.get("evidence", [])])
+    except (TypeError, ValueError) as exc:
+        return Response({"error": str(exc)}, status=400)
+    return Response({"status": "reordered"})
+
+
+@api_view(["GET"])
+@permission_classes([permissions.IsAuthenticated])
+def job_metrics(request):
+    """
+    Admins can see background job queue depth, lag and throughput.
+    """
+    if request.user.role != "admin":
+        return Response({"error": "Only admins can view job metrics."}, status=403)
+    return Response(jobs.metrics())
+
+
+@api_view(["GET"])
+@permission_classes([permissions.IsAuthenticated])
+def dashboard_summary(request):
+    """
+    Dashboard numbers from the materialized counters: site-wide ones and the
+    moderation queue for admins, the user's own for everyone else.
+    """
+    if request.user.role == "admin":
+        return Response(summary.site())
+    return Response(summary.for_user(request.user))
+
+
+@require_safe
+def request_metrics(request):
+    """
+    Per-view request metrics for a local Prometheus scraper.
+    """
+    if request.META.get("REMOTE_ADDR") not in metrics.allowed_ips():
+        raise Http404
+    return HttpResponse(metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@api_view(["POST"])
+@permission_classes([permissions.IsAuthenticated])
+@audited("petition.approve")
+def approve_petition(request, pk):
+    """
+    Admins approve submitted petitions. A petition that is no longer pending
+    (another admin got to it first) is a 409.
+    """
+    if request.user.role != "admin":
         return Response({"error": "Only admins can approve petitions."}, status=403)
 
-    petition.status = "published"
-    petition.save()
+    _, outcomes = moderation.moderate("approve", ids=[pk])
+    result = outcomes[pk]
+    if result["outcome"] == "not_found":
+        raise Http404("No Petition matches the given query.")
+    if result["outcome"] == "skipped":
+        return Response({"error": f"This petition is already {result['status']}."}, status=status.HTTP_409_CONFLICT)
 
     # ✅ For AJAX: return JSON only
-    return Response(
-        {"message": f"✅ Petition '{petition.title}' approved successfully!"},
-        status=200
+    return Response({"message": "✅ Petition approved successfully!"}, status=200)
+
+
+# Filters the bulk moderation endpoint accepts, and the Petition lookup each maps to.
+MODERATION_FILTERS = {
+    "category": "category",
+    "creator": "creator_id",
+    "created_after": "created_at__gte",
+    "created_before": "created_at__lt",
+}
+
+
+@api_view(["POST"])
+@permission_classes([permissions.IsAuthenticated])
+def moderate_petitions(request):
+    """
+    Admins approve or reject pending petitions in bulk, either by id:
+    {"action": "approve", "ids": [3, 4, 5]}, which reports an outcome per id,
+    or every pending petition matching a filter:
+    {"action": "reject", "filter": {"category": "legal", "created_before": "2026-01-01T00:00"}}.
+    Filters are category, creator, created_after and created_before; an empty
+    filter matches the whole queue. One audit event covers the batch.
+    """
+    if request.user.role != "admin":
+        return Response({"error": "Only admins can moderate petitions."}, status=403)
+    data = request.data
+    action = data.get("action")
+    if action not in moderation.ACTIONS:
+        return Response({"error": "action must be approve or reject."}, status=400)
+    if ("ids" in data) == ("filter" in data):
+        return Response({"error": "Give either ids or filter."}, status=400)
+
+    ids = filters = None
+    try:
+        if "ids" in data:
+            if not isinstance(data["ids"], list):
+                raise ValueError("ids must be a list of petition ids.")
+            ids = list(dict.fromkeys(int(pk) for pk in data["ids"]))
+            if not 0 < len(ids) <= moderation.MAX_IDS:
+                raise ValueError(f"Give between 1 and {moderation.MAX_IDS} ids.")
+        else:
+            if not isinstance(data["filter"], dict) or set(data["filter"]) - MODERATION_FILTERS.keys():
+                raise ValueError(f"filter may only use {', '.join(MODERATION_FILTERS)}.")
+            filters = {}
+            for name, value in data["filter"].items():
+                if name == "creator":
+                    value = int(value)
+                elif name.startswith("created_"):
+                    value = _parse_moment(value, name)
+                filters[MODERATION_FILTERS[name]] = value
+    except (TypeError, ValueError) as exc:
+        return Response({"error": str(exc)}, status=400)
+
+    moved, outcomes = moderation.moderate(action, ids=ids, filters=filters)
+    audit.record(
+        f"petition.bulk_{action}",
+        request.user,
+        moved=moved,
+        **({"requested": len(ids)} if ids is not None else {"filter": data["filter"]}),
     )
+    body = {"action": action, "moved": len(moved), "ids": moved}
+    if outcomes is not None:
+        body["results"] = [{"id": pk, **outcomes[pk]} for pk in ids]
+    return Response(body, status=200)
 
 # @login_required
 # @csrf_exempt
@@ -345,6 +905,7 @@ def petition_create(request):
 
 @api_view(["POST"])
 @permission_classes([permissions.IsAuthenticated])
+@audited("petition.submit_for_review")
 def submit_for_review(request, pk):
     """
     Citizens can submit their petition for admin review.
@@ -386,7 +947,7 @@ def petition_detail(request, pk):
     Public petition detail view — shows full petition info.
     Citizens can also support a petition here.
     """
-    petition = get_object_or_404(Petition, pk=pk, status="published")
+    petition = get_object_or_404(counters.with_live_counts(Petition.objects.all()), pk=pk, status="published")
     user_supported = False
 
     if request.user.is_authenticated:
@@ -12,6 +12,9 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 import os
+
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -51,6 +54,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "core.metrics.RequestMetricsMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware", # CORRECTED: MOVED WHITE_NOISE HERE
@@ -67,7 +71,7 @@ ROOT_URLCONF = 'justice_rollon.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.metrics.TimedDjangoTemplates',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -93,6 +97,32 @@ DATABASES = {
     }
 }
 
+# DJANGO_DB_MODE=sqlite-wal is the production setup for SQLite: WAL journal
+# and SQLITE_PRAGMAS on every connection, writes that take the lock up front
+# (BEGIN IMMEDIATE), and reads sent to a read-only "replica" connection to the
+# same file by core.db.ReadWriteRouter. The OPTIONS below need Django 5.1+.
+# `manage.py bench_sqlite` compares the two setups at the sqlite3 driver level.
+DJANGO_DB_MODE = os.environ.get("DJANGO_DB_MODE", "")
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": int(os.environ.get("SQLITE_CACHE_SIZE", -64000)),  # negative means KiB
+    "mmap_size": int(os.environ.get("SQLITE_MMAP_SIZE", 256 * 1024 ** 2)),
+    "busy_timeout": int(os.environ.get("SQLITE_BUSY_TIMEOUT", 5000)),
+    "temp_store": "MEMORY",
+}
+if DJANGO_DB_MODE == "sqlite-wal":
+    _pragmas = "".join(f"PRAGMA {name}={value};" for name, value in SQLITE_PRAGMAS.items())
+    DATABASES["default"]["OPTIONS"] = {"init_command": _pragmas, "transaction_mode": "IMMEDIATE"}
+    DATABASES["replica"] = {
+        **DATABASES["default"],
+        "OPTIONS": {"init_command": _pragmas + "PRAGMA query_only=1;"},
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_ROUTERS = ["core.db.ReadWriteRouter"]
+elif DJANGO_DB_MODE:
+    raise ImproperlyConfigured(f"Unknown DJANGO_DB_MODE {DJANGO_DB_MODE!r}; use 'sqlite-wal' or leave it unset.")
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -136,6 +166,106 @@ STATIC_URL = 'static/'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 
+REST_FRAMEWORK = {
+    # Keyset pagination on (created_at, id); see core/pagination.py.
+    "DEFAULT_PAGINATION_CLASS": "core.pagination.KeysetCursorPagination",
+    "PAGE_SIZE": 25,
+}
+
+
+# Supporter counts are write-behind (core/counters.py): joins bump one of
+# SUPPORTER_COUNT_SHARDS shard rows and a flush job folds them into
+# Petition.supporter_count SUPPORTER_COUNT_MAX_LAG seconds later.
+SUPPORTER_COUNT_SHARDS = int(os.environ.get("SUPPORTER_COUNT_SHARDS", 8))
+SUPPORTER_COUNT_MAX_LAG = float(os.environ.get("SUPPORTER_COUNT_MAX_LAG", 5))
+
+
+# The "board" cache holds rendered anonymous justice_index pages
+# (core/board_cache.py). Invalidation goes through the database, so it reaches
+# every process with any backend. Local memory renders each page once per
+# worker; BOARD_CACHE_BACKEND=django.core.cache.backends.filebased.FileBasedCache
+# with BOARD_CACHE_LOCATION set to a directory shares them between workers.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "board": {
+        "BACKEND": os.environ.get("BOARD_CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": os.environ.get("BOARD_CACHE_LOCATION", "justice-board"),
+        "TIMEOUT": int(os.environ.get("BOARD_CACHE_TIMEOUT", 300)),
+    },
+}
+BOARD_CACHE_SUPPORTER_THRESHOLD = int(os.environ.get("BOARD_CACHE_SUPPORTER_THRESHOLD", 25))
+
+
+# Resumable evidence uploads (core/uploads.py). Sizes are in bytes; idle
+# unfinished sessions are purged after EVIDENCE_UPLOAD_SESSION_TTL seconds.
+EVIDENCE_UPLOAD_MAX_SIZE = int(os.environ.get("EVIDENCE_UPLOAD_MAX_SIZE", 2 * 1024 ** 3))
+EVIDENCE_UPLOAD_MAX_CHUNK = int(os.environ.get("EVIDENCE_UPLOAD_MAX_CHUNK", 8 * 1024 ** 2))
+EVIDENCE_UPLOAD_SESSION_TTL = int(os.environ.get("EVIDENCE_UPLOAD_SESSION_TTL", 24 * 3600))
+# A chunk write or finalize that hasn't finished after this many seconds is
+# assumed dead, and its upload can be written again.
+EVIDENCE_UPLOAD_CLAIM_TIMEOUT = int(os.environ.get("EVIDENCE_UPLOAD_CLAIM_TIMEOUT", 600))
+
+# How evidence downloads are sent (core/downloads.py): "" streams from Django
+# (os.sendfile under gunicorn), "x-sendfile" hands the path to Apache or
+# lighttpd, "x-accel-redirect" hands it to nginx via an internal location
+# at EVIDENCE_ACCEL_REDIRECT_PREFIX that aliases MEDIA_ROOT.
+EVIDENCE_SENDFILE_BACKEND = os.environ.get("EVIDENCE_SENDFILE_BACKEND", "")
+EVIDENCE_ACCEL_REDIRECT_PREFIX = os.environ.get("EVIDENCE_ACCEL_REDIRECT_PREFIX", "/protected-media/")
+
+# Evidence processing (core/processing.py): worker processes used by the
+# process_evidence command, and the longest side of previews in pixels.
+EVIDENCE_PROCESSING_WORKERS = int(os.environ.get("EVIDENCE_PROCESSING_WORKERS", 2))
+EVIDENCE_PREVIEW_SIZE = int(os.environ.get("EVIDENCE_PREVIEW_SIZE", 320))
+
+# How long a consultation slot stays held for a citizen before an unconfirmed
+# booking lapses and the slot can be booked again (core/bookings.py).
+CONSULTATION_HOLD_SECONDS = int(os.environ.get("CONSULTATION_HOLD_SECONDS", 600))
+
+# Deposition autosave keeps a full snapshot every N versions (core/revisions.py).
+DEPOSITION_SNAPSHOT_INTERVAL = int(os.environ.get("DEPOSITION_SNAPSHOT_INTERVAL", 50))
+
+# Background job queue (core/jobs.py), run with `manage.py run_jobs` (the
+# "worker" process in the Procfile). It has to run alongside the web process,
+# on the same host as the SQLite file: supporter counts, hold releases, evidence
+# processing and deposition builds only happen there. Jobs held longer than
+# JOB_LOCK_TIMEOUT seconds are assumed orphaned and requeued; finished jobs are
+# deleted after JOB_RETENTION seconds.
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", 2))
+JOB_POLL_INTERVAL = float(os.environ.get("JOB_POLL_INTERVAL", 1.0))
+JOB_LOCK_TIMEOUT = int(os.environ.get("JOB_LOCK_TIMEOUT", 600))
+JOB_RETENTION = int(os.environ.get("JOB_RETENTION", 7 * 24 * 3600))
+
+# Audit events (core/audit.py) are buffered in process and written in bulk
+# once AUDIT_BUFFER_SIZE are queued or every AUDIT_FLUSH_INTERVAL seconds.
+AUDIT_BUFFER_SIZE = int(os.environ.get("AUDIT_BUFFER_SIZE", 200))
+AUDIT_FLUSH_INTERVAL = float(os.environ.get("AUDIT_FLUSH_INTERVAL", 2.0))
+# `manage.py compact_audit_log` keeps AUDIT_HOT_MONTHS months in AuditLog and
+# moves older ones into compressed AuditArchive chunks (core/audit_archive.py).
+AUDIT_HOT_MONTHS = int(os.environ.get("AUDIT_HOT_MONTHS", 3))
+AUDIT_ARCHIVE_CHUNK_SIZE = int(os.environ.get("AUDIT_ARCHIVE_CHUNK_SIZE", 50000))
+
+# Per-view request metrics (core/metrics.py), served in Prometheus format at
+# /metrics to METRICS_ALLOWED_IPS only. Behind a reverse proxy every request
+# comes from the proxy's address, so block /metrics there.
+REQUEST_METRICS_ENABLED = os.environ.get("REQUEST_METRICS_ENABLED", "1") == "1"
+METRICS_ALLOWED_IPS = os.environ.get("METRICS_ALLOWED_IPS", "127.0.0.1,::1").split(",")
+
+# Dashboard counters (core/summary.py) are rebuilt from the source tables
+# every DASHBOARD_RECONCILE_INTERVAL seconds by a background job, which
+# `manage.py run_jobs` queues when it starts if none is waiting.
+DASHBOARD_RECONCILE_INTERVAL = int(os.environ.get("DASHBOARD_RECONCILE_INTERVAL", 3600))
+
+
+# Hash uploads while they stream in so evidence can be stored by content
+# digest without re-reading the file (core/blobs.py).
+FILE_UPLOAD_HANDLERS = [
+    "core.blobs.HashingMemoryFileUploadHandler",
+    "core.blobs.HashingTemporaryFileUploadHandler",
+]
+
+
 # Allow WordPress to talk to Django
 CORS_ALLOW_ALL_ORIGINS = False
 
@@ -0,0 +1,40 @@
+"""
+Load tests for the justice app, using only the standard library.
+
+Seed a database, start the app, then run the journeys against it::
+
+    python manage.py generate_dataset
+    gunicorn justice_rollon.wsgi -w 4 -b 127.0.0.1:8000 &
+    python -m loadtest --base-url http://127.0.0.1:8000 --users 20 --duration 60 \
+        --output loadtest-results.json --baseline loadtest/baseline.json
+
+The default logins are the demo accounts ``seed_demo.py`` creates. With
+only generated data, log in as generated users instead, e.g. ``--citizen
+citizen-1:loadtest123 --citizen citizen-2:loadtest123 --admin
+admin-0:loadtest123``.
+
+``--serve`` starts the server itself (gunicorn if installed, otherwise
+``runserver``) and stops it afterwards.
+
+Each virtual user takes a role (anonymous reader, API client, citizen,
+uploader or admin) and repeats that role's journey with random think time
+(see ``journeys.py``). Latencies are recorded per endpoint, with ids replaced
+by ``:id``. The results file has count, errors, throughput, p50/p95/p99 and
+max for every endpoint. With ``--baseline`` the run exits non-zero if any
+endpoint got slower or less reliable than the stored baseline by more than
+``--tolerance``. ``--save-baseline`` stores the current run as the new
+baseline.
+
+``loadtest/baseline.json`` came from a fresh database, on one CPU core with
+``runserver`` (gunicorn was not installed), by::
+
+    export DJANGO_DB_MODE=sqlite-wal
+    python manage.py migrate
+    python manage.py generate_dataset --anchor 2026-10-01 --workers 0
+    python -m loadtest --serve --base-url http://127.0.0.1:8765 --users 20 --duration 60 --seed 1 \
+        --citizen citizen-1:loadtest123 --citizen citizen-2:loadtest123 --admin admin-0:loadtest123 \
+        --baseline loadtest/baseline.json --save-baseline
+
+Compare against it only with the same dataset and settings. Recapture it
+when the machine or the setup changes.
+"""
@@ -0,0 +1,146 @@
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from datetime import datetime, timezone
+from pathlib import Path
+
+from .client import Client, Recorder
+from .journeys import ROLES, Shared, assign_roles, run_user
+from .report import compare, format_table, summarize
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+
+
+def _account(value):
+    username, _, password = value.partition(":")
+    if not username or not password:
+        raise argparse.ArgumentTypeError("accounts are given as username:password")
+    return username, password
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m loadtest", description="Load test a running justice app (see loadtest/__init__.py)."
+    )
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--users", type=int, default=20, help="Concurrent virtual users (default: 20).")
+    parser.add_argument("--duration", type=float, default=60, help="Seconds to run (default: 60).")
+    parser.add_argument("--ramp-up", type=float, default=5, help="Seconds over which users start (default: 5).")
+    parser.add_argument("--think", type=float, default=0.5, help="Longest pause between journeys (default: 0.5).")
+    parser.add_argument("--seed", type=int, default=1, help="Seed for roles and choices (default: 1).")
+    parser.add_argument("--citizen", type=_account, action="append",
+                        help="Citizen account as username:password; repeat for more (default: citizen1:citizen123).")
+    parser.add_argument("--admin", type=_account, action="append",
+                        help="Admin account as username:password (default: admin:admin123).")
+    parser.add_argument("--output", default="loadtest-results.json", help="Where to write the results JSON.")
+    parser.add_argument("--baseline", help="Baseline results JSON to compare against.")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown, 0.2 = 20%% (default).")
+    parser.add_argument("--save-baseline", action="store_true", help="Write this run to --baseline.")
+    parser.add_argument("--serve", action="store_true", help="Start the app on --base-url's port for the run.")
+    parser.add_argument("--server-workers", type=int, default=4, help="gunicorn workers with --serve (default: 4).")
+    return parser.parse_args(argv)
+
+
+def start_server(base_url, workers):
+    port = base_url.rsplit(":", 1)[-1].strip("/")
+    if shutil.which("gunicorn"):
+        command = ["gunicorn", "justice_rollon.wsgi", "-w", str(workers), "-b", f"127.0.0.1:{port}"]
+    else:
+        command = [sys.executable, "manage.py", "runserver", "--noreload", f"127.0.0.1:{port}"]
+    server = subprocess.Popen(command, cwd=PROJECT_DIR, env=os.environ.copy(),
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(base_url.rstrip("/") + "/justice-index/", timeout=2).close()
+            return server
+        except OSError:
+            if server.poll() is not None:
+                break
+            time.sleep(0.25)
+    server.terminate()
+    raise SystemExit(f"Server did not come up: {' '.join(command)}")
+
+
+def run(args):
+    rng = random.Random(args.seed)
+    accounts = {
+        "citizen": args.citizen or [("citizen1", "citizen123")],
+        "admin": args.admin or [("admin", "admin123")],
+    }
+    recorder = Recorder()
+    shared = Shared()
+    stop = threading.Event()
+
+    threads = []
+    for number, role in enumerate(assign_roles(args.users, rng)):
+        kind = ROLES[role][1]
+        account = accounts[kind][number % len(accounts[kind])] if kind else None
+        client = Client(args.base_url, recorder)
+        threads.append(threading.Thread(
+            target=run_user, args=(client, role, account, shared, stop, args.think, rng.randrange(2 ** 32)),
+            name=f"{role}-{number}", daemon=True,
+        ))
+
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+        if args.ramp_up and len(threads) > 1:
+            time.sleep(args.ramp_up / len(threads))
+    stop.wait(max(0.0, args.duration - (time.monotonic() - started)))
+    stop.set()
+    for thread in threads:
+        thread.join(timeout=60)
+    elapsed = time.monotonic() - started
+    return summarize(recorder.samples, elapsed), elapsed
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    server = start_server(args.base_url, args.server_workers) if args.serve else None
+    try:
+        summary, elapsed = run(args)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+
+    summary["meta"] = {
+        "base_url": args.base_url,
+        "users": args.users,
+        "duration_seconds": round(elapsed, 2),
+        "seed": args.seed,
+        "finished_at": datetime.now(timezone.utc).isoformat(),
+    }
+    Path(args.output).write_text(json.dumps(summary, indent=2) + "\n")
+    print(format_table(summary))
+    print(f"\nResults written to {args.output}")
+
+    if args.baseline and args.save_baseline:
+        Path(args.baseline).write_text(json.dumps(summary, indent=2) + "\n")
+        print(f"Baseline saved to {args.baseline}")
+    elif args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        before = baseline.get("meta", {})
+        if (before.get("users"), before.get("seed")) != (args.users, args.seed):
+            print(f"\nNote: the baseline ran with users={before.get('users')} seed={before.get('seed')}; "
+                  "throughput is only comparable between runs with the same settings.")
+        regressions = compare(summary, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) against {args.baseline}:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"\nNo regressions against {args.baseline} (tolerance {args.tolerance:.0%}).")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,136 @@
+"""
+A small cookie-keeping HTTP client that records every request's latency.
+"""
+import http.cookiejar
+import json
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+from collections import defaultdict
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+class Recorder:
+    """
+    Collects ``(latency_seconds, ok)`` samples per endpoint name from every
+    virtual user.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = defaultdict(list)
+
+    def add(self, name, latency, ok):
+        with self._lock:
+            self.samples[name].append((latency, ok))
+
+
+class Response:
+    def __init__(self, status, headers, body):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    def json(self):
+        return json.loads(self.body or b"null")
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    # A redirect is a response worth timing in its own right (e.g. after login).
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+def encode_multipart(fields, files):
+    """
+    ``fields`` is ``{name: value}``, ``files`` is ``{name: (filename, bytes,
+    content_type)}``. Returns ``(body, content_type)``.
+    """
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+        )
+    for name, (filename, content, content_type) in files.items():
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+            f"Content-Type: {content_type}\r\n\r\n".encode() + content + b"\r\n"
+        )
+    parts.append(f"--{boundary}--\r\n".encode())
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+
+class Client:
+    """
+    One virtual user's browser: keeps the session and CSRF cookies and sends
+    the CSRF token with unsafe requests, as the app's own pages do.
+    """
+
+    def __init__(self, base_url, recorder, timeout=30):
+        self.base_url = base_url.rstrip("/")
+        self.recorder = recorder
+        self.timeout = timeout
+        self.cookies = http.cookiejar.CookieJar()
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(self.cookies), _NoRedirect())
+
+    def cookie(self, name):
+        for cookie in self.cookies:
+            if cookie.name == name:
+                return cookie.value
+        return None
+
+    def request(self, method, path, name=None, params=None, form=None, json_body=None, files=None, expect=(200,)):
+        """
+        Send a request and record it under ``name`` (default ``METHOD path``).
+        Responses with a status outside ``expect`` count as errors.
+        """
+        url = self.base_url + path
+        if params:
+            url += "?" + urllib.parse.urlencode(params)
+        headers = {"Accept": "text/html,application/json"}
+        body = None
+        if files is not None:
+            body, headers["Content-Type"] = encode_multipart(form or {}, files)
+        elif json_body is not None:
+            body, headers["Content-Type"] = json.dumps(json_body).encode(), "application/json"
+        elif form is not None:
+            body = urllib.parse.urlencode(form).encode()
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+        if method not in SAFE_METHODS:
+            headers["Referer"] = self.base_url + "/"
+            token = self.cookie("csrftoken")
+            if token:
+                headers["X-CSRFToken"] = token
+
+        request = urllib.request.Request(url, data=body, headers=headers, method=method)
+        started = time.perf_counter()
+        try:
+            with self.opener.open(request, timeout=self.timeout) as raw:
+                response = Response(raw.status, raw.headers, raw.read())
+        except urllib.error.HTTPError as exc:
+            response = Response(exc.code, exc.headers, exc.read())
+        except (urllib.error.URLError, OSError):
+            self.recorder.add(name or f"{method} {path}", time.perf_counter() - started, False)
+            return Response(0, {}, b"")
+        self.recorder.add(name or f"{method} {path}", time.perf_counter() - started, response.status in expect)
+        return response
+
+    def get(self, path, name=None, **kwargs):
+        return self.request("GET", path, name=name, **kwargs)
+
+    def post(self, path, name=None, **kwargs):
+        return self.request("POST", path, name=name, **kwargs)
+
+    def login(self, username, password):
+        self.get("/login/")
+        response = self.post(
+            "/login/",
+            form={"username": username, "password": password, "csrfmiddlewaretoken": self.cookie("csrftoken") or ""},
+            expect=(302,),
+        )
+        return response.status == 302
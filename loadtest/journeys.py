@@ -0,0 +1,160 @@
+"""
+User journeys. Each role logs in once (if it has an account) and then
+repeats its journey until the run ends. ``Shared`` carries ids between
+users. Readers collect published petitions for citizens to join. Citizens
+submit petitions for the admins to approve.
+"""
+import random
+import threading
+from collections import deque
+from urllib.parse import parse_qs, urlsplit
+
+SEARCH_TERMS = ("water", "school", "road", "health", "justice", "housing", "pension", "police")
+CATEGORIES = ("general", "legal", "welfare", "environment", "policy")
+# The smallest file the upload endpoint accepts as a PDF.
+PDF_BYTES = b"%PDF-1.4\n1 0 obj<<>>endobj\ntrailer<<>>\n%%EOF\n"
+
+
+def _query_value(url, name):
+    return parse_qs(urlsplit(url).query).get(name, [""])[0]
+
+
+class Shared:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.published = []
+        self.submitted = deque(maxlen=10000)
+
+    def add_published(self, ids):
+        with self._lock:
+            known = set(self.published)
+            self.published.extend(i for i in ids if i not in known)
+            del self.published[:-5000]
+
+    def random_published(self, rng):
+        with self._lock:
+            return rng.choice(self.published) if self.published else None
+
+    def add_submitted(self, petition_id):
+        with self._lock:
+            self.submitted.append(petition_id)
+
+    def take_submitted(self, count):
+        with self._lock:
+            return [self.submitted.popleft() for _ in range(min(count, len(self.submitted)))]
+
+
+def browse(client, shared, rng):
+    """
+    Anonymous visitor: the public board, a search, the API list and one
+    petition's page.
+    """
+    client.get("/justice-index/")
+    client.get("/justice-index/", name="GET /justice-index/?q", params={"q": rng.choice(SEARCH_TERMS)})
+    page = client.get("/api/petitions/")
+    if page.status == 200:
+        data = page.json()
+        shared.add_published(p["id"] for p in data["results"])
+        if data.get("next") and rng.random() < 0.5:
+            client.get("/api/petitions/", name="GET /api/petitions/?cursor",
+                       params={"cursor": _query_value(data["next"], "cursor")})
+    petition_id = shared.random_published(rng)
+    if petition_id:
+        client.get(f"/petitions/{petition_id}/", name="GET /petitions/:id/")
+
+
+def api(client, shared, rng):
+    """
+    API consumer: search and retrieve through the REST API.
+    """
+    client.get("/api/petitions/", name="GET /api/petitions/?search", params={"search": rng.choice(SEARCH_TERMS)})
+    petition_id = shared.random_published(rng)
+    if petition_id:
+        client.get(f"/api/petitions/{petition_id}/", name="GET /api/petitions/:id/")
+
+
+def citizen(client, shared, rng):
+    """
+    Citizen: dashboard, create a petition, submit it for review, join a
+    published one.
+    """
+    client.get("/dashboard2/")
+    created = client.post(
+        "/api/petitions/",
+        json_body={
+            "title": f"Load test petition {rng.randrange(10 ** 9)}",
+            "description": "Created by the load test. " * rng.randint(1, 20),
+            "category": rng.choice(CATEGORIES),
+            "visibility": "public",
+        },
+        expect=(201,),
+    )
+    if created.status == 201:
+        petition_id = created.json()["id"]
+        submitted = client.post(f"/api/petition/{petition_id}/submit-for-review/",
+                                name="POST /api/petition/:id/submit-for-review/")
+        if submitted.status == 200:
+            shared.add_submitted(petition_id)
+    petition_id = shared.random_published(rng)
+    if petition_id:
+        client.post(f"/api/petition/{petition_id}/join/", name="POST /api/petition/:id/join/")
+
+
+def uploader(client, shared, rng):
+    """
+    Citizen uploading evidence and then looking at their evidence list.
+    """
+    client.post(
+        "/api/upload-evidence/",
+        form={"title": f"Exhibit {rng.randrange(10 ** 9)}", "file_type": "pdf"},
+        # Distinct content each time, so blob deduplication doesn't skip the write.
+        files={"file": ("exhibit.pdf", PDF_BYTES + str(rng.random()).encode(), "application/pdf")},
+        expect=(201,),
+    )
+    client.get("/evidences/")
+
+
+def admin(client, shared, rng):
+    """
+    Admin: the moderation queue, then approve what citizens submitted.
+    """
+    client.get("/dashboard2/")
+    for petition_id in shared.take_submitted(5):
+        client.post(f"/api/petition/{petition_id}/approve/", name="POST /api/petition/:id/approve/")
+
+
+# role -> (journey, account type, share of virtual users)
+ROLES = {
+    "anonymous": (browse, None, 0.45),
+    "api": (api, None, 0.15),
+    "citizen": (citizen, "citizen", 0.25),
+    "uploader": (uploader, "citizen", 0.10),
+    "admin": (admin, "admin", 0.05),
+}
+
+
+def assign_roles(users, rng):
+    """
+    Spread ``users`` virtual users over ``ROLES`` by share, with at least one
+    of each role once there are enough users.
+    """
+    roles = list(ROLES) if users >= len(ROLES) else []
+    weights = [ROLES[role][2] for role in ROLES]
+    roles += rng.choices(list(ROLES), weights=weights, k=users - len(roles))
+    return roles
+
+
+def run_user(client, role, account, shared, stop, think, seed):
+    rng = random.Random(seed)
+    journey = ROLES[role][0]
+    if account and not client.login(*account):
+        return
+    while not stop.is_set():
+        try:
+            journey(client, shared, rng)
+        except (KeyError, TypeError, ValueError):
+            # An unexpected response body; the user carries on with the next journey.
+            client.recorder.add(f"journey {role}", 0.0, False)
+        if think:
+            stop.wait(rng.uniform(0, think))
+
@@ -0,0 +1,84 @@
+"""
+Turning samples into per-endpoint statistics and comparing them with a
+stored baseline.
+"""
+import math
+
+
+def percentile(sorted_values, pct):
+    # Nearest-rank percentile of an already sorted list.
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(samples, elapsed):
+    """
+    ``samples`` maps endpoint name to ``[(latency_seconds, ok), ...]``.
+    Latency percentiles cover successful requests only.
+    """
+    endpoints = {}
+    for name, entries in sorted(samples.items()):
+        latencies = sorted(latency for latency, ok in entries if ok)
+        errors = sum(1 for _, ok in entries if not ok)
+        endpoints[name] = {
+            "count": len(entries),
+            "errors": errors,
+            "error_rate": round(errors / len(entries), 4),
+            "throughput_rps": round(len(entries) / elapsed, 2),
+            "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+            "max_ms": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+        }
+    total = sum(e["count"] for e in endpoints.values())
+    errors = sum(e["errors"] for e in endpoints.values())
+    return {
+        "endpoints": endpoints,
+        "total": {
+            "count": total,
+            "errors": errors,
+            "error_rate": round(errors / total, 4) if total else 0.0,
+            "throughput_rps": round(total / elapsed, 2),
+        },
+    }
+
+
+def compare(current, baseline, tolerance=0.2, min_count=20):
+    """
+    Regressions of ``current`` against ``baseline``: an endpoint whose p95 or
+    p99 grew, or whose throughput fell, by more than ``tolerance``, or whose
+    error rate rose by more than a percentage point. Endpoints with fewer
+    than ``min_count`` requests in either run are too noisy to judge.
+    """
+    regressions = []
+    for name, before in baseline["endpoints"].items():
+        after = current["endpoints"].get(name)
+        if after is None:
+            regressions.append(f"{name}: not exercised in this run")
+            continue
+        if min(before["count"], after["count"]) < min_count:
+            continue
+        for metric in ("p95_ms", "p99_ms"):
+            if before[metric] and after[metric] > before[metric] * (1 + tolerance):
+                regressions.append(f"{name}: {metric} {before[metric]} -> {after[metric]}")
+        if after["throughput_rps"] < before["throughput_rps"] * (1 - tolerance):
+            regressions.append(
+                f"{name}: throughput_rps {before['throughput_rps']} -> {after['throughput_rps']}"
+            )
+        if after["error_rate"] > before["error_rate"] + 0.01:
+            regressions.append(f"{name}: error_rate {before['error_rate']} -> {after['error_rate']}")
+    return regressions
+
+
+def format_table(summary):
+    lines = [f"{'endpoint':<48} {'count':>7} {'err':>5} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8}"]
+    for name, e in summary["endpoints"].items():
+        lines.append(
+            f"{name:<48} {e['count']:>7} {e['errors']:>5} {e['throughput_rps']:>8.2f} "
+            f"{e['p50_ms']:>8.1f} {e['p95_ms']:>8.1f} {e['p99_ms']:>8.1f}"
+        )
+    total = summary["total"]
+    lines.append(f"{'total':<48} {total['count']:>7} {total['errors']:>5} {total['throughput_rps']:>8.2f}")
+    return "\n".join(lines)
@@ -1,133 +1,50 @@
 import os
 import django
-from django.utils import timezone
-from random import choice
-from datetime import timedelta
+from django.core.management import call_command
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "justice_rollon.settings")
 django.setup()
 
-from core.models import User, Petition, Evidence, ConsultationSlot, Deposition
+from core.models import User
 
-# Clear existing data (optional for repeatable runs)
-# User.objects.exclude(is_superuser=True).delete()
-Petition.objects.all().delete()
-Evidence.objects.all().delete()
-ConsultationSlot.objects.all().delete()
-Deposition.objects.all().delete()
-
-print("🧹 Old data cleared...")
+# Nothing is deleted: the demo accounts are created or reset, and the
+# generated rows live in their own id range (see core/dataset.py), so
+# re-running only fills in what is missing.
 
 # --- USERS ---
-admin, _ = User.objects.get_or_create(
-    username="admin",
-    defaults={"email": "admin@test.com", "role": "admin", "is_superuser": True, "is_staff": True}
-)
-admin.set_password("admin123")
-admin.save()
-
-lawyer, _ = User.objects.get_or_create(
-    username="lawyer1",
-    defaults={"email": "lawyer@test.com", "role": "lawyer"}
-)
-lawyer.set_password("lawyer123")
-lawyer.save()
-
-citizen1, _ = User.objects.get_or_create(
-    username="citizen1",
-    defaults={"email": "citizen1@test.com", "role": "citizen"}
-)
-citizen1.set_password("citizen123")
-citizen1.save()
-
-citizen2, _ = User.objects.get_or_create(
-    username="citizen2",
-    defaults={"email": "citizen2@test.com", "role": "citizen"}
-)
-citizen2.set_password("citizen123")
-citizen2.save()
-
-print("👥 Users ready:")
-print(f" - Admin: {admin.username}")
-print(f" - Lawyer: {lawyer.username}")
-print(f" - Citizens: {citizen1.username}, {citizen2.username}")
-
-
-# --- PETITIONS ---
-p1 = Petition.objects.create(
-    title="Clean Water for All",
-    description="Request for ensuring clean water supply in rural areas.",
-    category="Environment",
-    creator=citizen1,
-    visibility="public",
-    status="pending"
-)
-p2 = Petition.objects.create(
-    title="Better Road Safety",
-    description="Petition to improve road lighting and traffic management.",
-    category="Infrastructure",
-    creator=citizen2,
-    visibility="public",
-    status="published",
-    published_at=timezone.now()
+DEMO_ACCOUNTS = [
+    ("admin", "admin123", {"email": "admin@test.com", "role": "admin", "is_superuser": True, "is_staff": True}),
+    ("lawyer1", "lawyer123", {"email": "lawyer@test.com", "role": "lawyer"}),
+    ("citizen1", "citizen123", {"email": "citizen1@test.com", "role": "citizen"}),
+    ("citizen2", "citizen123", {"email": "citizen2@test.com", "role": "citizen"}),
+]
+for username, password, defaults in DEMO_ACCOUNTS:
+    user, _ = User.objects.get_or_create(username=username, defaults=defaults)
+    user.set_password(password)
+    user.save()
+
+print("👥 Users ready:", ", ".join(username for username, _, _ in DEMO_ACCOUNTS))
+
+# --- GENERATED DATA ---
+# A small deterministic dataset; use `manage.py generate_dataset` directly
+# for load-test volumes.
+call_command(
+    "generate_dataset",
+    users=500,
+    petitions=2000,
+    supports=20000,
+    evidence=1000,
+    slots_per_lawyer=20,
+    workers=0,
 )
 
-print("📜 Petitions added:", Petition.objects.count())
-
-# --- EVIDENCES ---
-Evidence.objects.create(
-    title="Water report",
-    file_type="pdf",
-    file="uploads/evidence/water_report.pdf",
-    uploader=citizen1,
-    verification_status="verified",
-    size_bytes=12345
-)
-
-Evidence.objects.create(
-    title="Road accident stats",
-    file_type="csv",
-    file="uploads/evidence/accident_stats.csv",
-    uploader=citizen2,
-    verification_status="pending",
-    size_bytes=23456
-)
-
-print("📁 Evidences added:", Evidence.objects.count())
-
-# --- CONSULTATION SLOTS ---
-for i in range(3):
-    ConsultationSlot.objects.create(
-        lawyer=lawyer,
-        start_time=timezone.now() + timedelta(days=i + 1, hours=10 + i),
-        duration_minutes=30,
-        is_booked=False
-    )
-
-print("📅 Consultation slots created:", ConsultationSlot.objects.count())
-
-# --- DEPOSITIONS ---
-Deposition.objects.create(
-    title="Clean Water Case",
-    content="Deposition prepared for water supply case.",
-    created_by=lawyer,
-    created_at=timezone.now()
-)
-Deposition.objects.create(
-    title="Accident Report",
-    content="Details of road safety petition case.",
-    created_by=citizen1,
-    created_at=timezone.now()
-)
-
-print("🧾 Depositions created:", Deposition.objects.count())
-
 print("\n✅ DEMO DATA SEEDED SUCCESSFULLY!")
 print("Now test these logins:")
 print(" - Admin: admin / admin123")
 print(" - Lawyer: lawyer1 / lawyer123")
 print(" - Citizen1: citizen1 / citizen123")
 print(" - Citizen2: citizen2 / citizen123")
+print(" - Generated users: citizen-1, lawyer-50, admin-0 ... / loadtest123")
 
 print("\n✅ Demo data seeded successfully! You can now:")
 print(" - Login at http://127.0.0.1:8000/login/")